@@ -0,0 +1,187 @@
+"""
+In-process index of the Addresses that each Address is linked to
+
+Most permission checks only need to know whether the requesting User's Address is linked to another Address. Instead
+of a query per check, the ids of the Addresses that an Address is linked to are read once, in one index only scan, and
+held in a bounded LRU per worker. Each set of ids is a sorted `array('q')` searched with bisect, 8 bytes per link, so
+an Address linked to hundreds of thousands of others still takes a few MB and a check is a binary search.
+
+Every Address has a version in the shared Django cache, which `invalidate` changes whenever links from the Address are
+created or deleted. The ids are stored in the shared cache under the version they were read at, so the other workers
+load them from there instead of the database, and an entry is reloaded as soon as its version is out of date. The
+version is read again on each check unless the entry was checked within the last `ADDRESS_LINK_INDEX_MAX_AGE` seconds.
+"""
+# stdlib
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from uuid import uuid4
+# libs
+from django.conf import settings
+from django.core.cache import cache
+# local
+from membership.models import AddressLink
+
+
+__all__ = [
+    'address_link_index',
+    'AddressLinkIndex',
+]
+
+
+class _Entry(NamedTuple):
+    links: array
+    version: str
+    expires: float
+    # When the version was last confirmed to be current
+    checked: float
+
+
+class AddressLinkIndex:
+    """
+    Bounded, thread-safe LRU cache of the ids of the Addresses linked to each Address, with a TTL per entry
+    """
+
+    def __init__(self, max_size: int, ttl: int, max_age: float):
+        """
+        :param max_size: The maximum number of Addresses to hold the links of. 0 disables the index.
+        :param ttl: The number of seconds the links of an Address are held for
+        :param max_age: The number of seconds the links of an Address are used for without reading their version
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_age = max_age
+        self._entries: 'OrderedDict[int, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _version_key(address_id: int) -> str:
+        return f'address_link_version_{address_id}'
+
+    @staticmethod
+    def _links_key(address_id: int, version: str) -> str:
+        return f'address_links_{address_id}_{version}'
+
+    @staticmethod
+    def _read(address_id: int) -> array:
+        # In order from the address_link_live index, so they do not need to be sorted
+        return array('q', AddressLink.objects.linked_address_ids(address_id).order_by(
+            'contra_address_id',
+        ).values_list(
+            'contra_address_id',
+            flat=True,
+        ))
+
+    def _version(self, address_id: int) -> Optional[str]:
+        """
+        The current version of the links of an Address. An Address that has none yet, or whose version was evicted
+        from the cache, is given a new one, so links stored under an old version are never read again.
+        """
+        key = self._version_key(address_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid4().hex, timeout=None)
+            version = cache.get(key)
+        return version
+
+    def links(self, address_id: int) -> array:
+        """
+        The sorted ids of the Addresses that an Address is linked to
+        :param address_id: The id of the Address, usually the requesting User's
+        :return: An array of the ids of its contra Addresses
+        """
+        if self.max_size <= 0:
+            return self._read(address_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(address_id)
+            if entry is not None and entry.expires < now:
+                del self._entries[address_id]
+                entry = None
+            if entry is not None and entry.checked + self.max_age > now:
+                self._entries.move_to_end(address_id)
+                self.hits += 1
+                return entry.links
+
+        # The version must be read before the links, so that links created while they are read change it
+        version = self._version(address_id)
+        if version is None:
+            # There is no shared cache to version the links with
+            with self._lock:
+                self.misses += 1
+            return self._read(address_id)
+
+        with self._lock:
+            if entry is not None and entry.version == version:
+                self._entries[address_id] = entry._replace(checked=now)
+                self._entries.move_to_end(address_id)
+                self.hits += 1
+                return entry.links
+            self.misses += 1
+
+        key = self._links_key(address_id, version)
+        stored = cache.get(key)
+        if stored is not None:
+            links = array('q')
+            links.frombytes(stored)
+        else:
+            links = self._read(address_id)
+            cache.set(key, links.tobytes(), timeout=self.ttl)
+
+        with self._lock:
+            self._entries[address_id] = _Entry(links=links, version=version, expires=now + self.ttl, checked=now)
+            self._entries.move_to_end(address_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return links
+
+    def is_linked(self, address_id: int, contra_address_id: int) -> bool:
+        """
+        Check if there is a live link from one Address to another
+        :param address_id: The id of the Address the link is from, usually the requesting User's
+        :param contra_address_id: The id of the Address the link is to
+        :return: True if the Addresses are linked
+        """
+        links = self.links(address_id)
+        i = bisect_left(links, contra_address_id)
+        return i < len(links) and links[i] == contra_address_id
+
+    def invalidate(self, *address_ids: int):
+        """
+        Forget the links of Addresses, in this process and in every other worker. Call this after the transaction
+        that creates or deletes links from the Addresses has been committed.
+        :param address_ids: The ids of the Addresses whose links have changed
+        """
+        with self._lock:
+            for address_id in address_ids:
+                self._entries.pop(address_id, None)
+        # In one round trip, however many Addresses there are
+        cache.set_many({self._version_key(address_id): uuid4().hex for address_id in address_ids}, timeout=None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters used to size the index
+        :return: The number of hits, misses and evictions, and the current number of entries
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+
+
+address_link_index = AddressLinkIndex(
+    settings.ADDRESS_LINK_INDEX_SIZE,
+    settings.ADDRESS_LINK_INDEX_TTL,
+    settings.ADDRESS_LINK_INDEX_MAX_AGE,
+)
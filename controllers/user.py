@@ -17,6 +17,8 @@ from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from pytz import timezone as get_timezone, UnknownTimeZoneError
 # local
+from membership.address_link_index import address_link_index
+from membership.totp import check_totp, decrypt_secret, encrypt_secret, valid_secret
 from membership.utils import get_minio_client, MinioError
 from membership.models import (
     Address,
@@ -136,18 +138,17 @@ class UserCreateController(ControllerBase):
         except Address.DoesNotExist:
             return 'membership_user_create_102'
         # Check that address is linked to the requesting user's address
-        try:
-            address.link = AddressLink.objects.get(
+        address.link = None
+        if address_link_index.is_linked(self.request.user.address['id'], address.pk):
+            address.link = AddressLink.objects.filter(
                 address_id=self.request.user.address['id'],
                 contra_address=address,
-            )
-        except AddressLink.DoesNotExist:
-            # Check to make sure this is still allowed
+            ).first()
+        if address.link is None:
+            # Check to make sure this is still allowed, in which case it's okay for the link to be None
             if (self.request.user.id != 1 and
                     (self.request.user.member['id'] != address.member_id or not self.request.user.is_global)):
                 return 'membership_user_create_103'
-            # Here it's okay for the link to be None
-            address.link = None  # pragma: no cover
         address.linked = address.link is not None
         # Store the address and member
         self.cleaned_data['address'] = address
@@ -205,7 +206,7 @@ class UserCreateController(ControllerBase):
         except ValidationError:
             return 'membership_user_create_110'
         # Check to make sure that another User with the same email does not exist in the same Member
-        if User.objects.filter(email=email, member=self.cleaned_data['member']).exists():
+        if User.objects.with_email(email).filter(member=self.cleaned_data['member']).exists():
             return 'membership_user_create_111'
         # We don't want case sensitivity, so make it lowercase
         self.cleaned_data['email'] = email.lower()
@@ -586,6 +587,7 @@ class UserUpdateController(ControllerBase):
             'login',
             'otp',
             'first_otp',
+            'otp_secret',
             'robot',
         )
 
@@ -604,18 +606,17 @@ class UserUpdateController(ControllerBase):
         except Address.DoesNotExist:
             return 'membership_user_update_102'
         # Check that address is linked to the requesting user's address
-        try:
-            address.link = AddressLink.objects.get(
+        address.link = None
+        if address_link_index.is_linked(self.request.user.address['id'], address.pk):
+            address.link = AddressLink.objects.filter(
                 address_id=self.request.user.address['id'],
                 contra_address=address,
-            )
-        except AddressLink.DoesNotExist:
-            # Check to make sure this is still allowed
+            ).first()
+        if address.link is None:
+            # Check to make sure this is still allowed, in which case it's okay for the link to be None
             if (self.request.user.id != 1 and
                     (self.request.user.member['id'] != address.member_id or not self.request.user.is_global)):
                 return 'membership_user_update_103'
-            # Here it's okay for the link to be None
-            address.link = None
         address.linked = address.link is not None
         # Check that the user is not changing the member of the address
         if self._instance.member_id != address.member_id:
@@ -696,8 +697,7 @@ class UserUpdateController(ControllerBase):
         except ValidationError:
             return 'membership_user_update_111'
         # Check to make sure that another User with the same email does not exist in the same Address
-        if User.objects.filter(
-            email=email,
+        if User.objects.with_email(email).filter(
             member=address.member,
         ).exclude(
             pk=self._instance.pk,
@@ -1129,6 +1129,59 @@ class UserUpdateController(ControllerBase):
         self.cleaned_data['first_otp'] = first_otp
         return None
 
+    def validate_otp_secret(self, otp_secret: Optional[str]) -> Optional[str]:
+        """
+        description: |
+            The base32 secret from the User's Authenticator App, used to verify their OTP codes in Membership. It can
+            only be set by the User themselves, is stored encrypted, and is never returned. Send an empty string to
+            remove it.
+            A new secret must be sent with `otp_code`, a current code generated from it. Replacing or removing a stored
+            secret also needs `current_otp_code`, a current code generated from the stored one. A User who no longer
+            has the stored secret can ask an administrator of their Member to send them a new `first_otp`, which
+            removes it.
+        type: string
+        required: false
+        """
+        if otp_secret is None:
+            # An administrator resetting the User's OTP with a new first_otp also removes the stored secret, so that
+            # the User can log in with first_otp and store a new one
+            first_otp = self.cleaned_data.get('first_otp')
+            if first_otp is not None and first_otp != self._instance.first_otp:
+                self.cleaned_data['otp_secret'] = None
+            return None
+        if self.request.user.id != self._instance.pk:
+            return 'membership_user_update_147'
+        if not isinstance(otp_secret, str):
+            return 'membership_user_update_148'
+        otp_secret = otp_secret.strip().replace(' ', '')
+        if otp_secret != '':
+            if not valid_secret(otp_secret):
+                return 'membership_user_update_148'
+            # The User's Authenticator App must hold the new secret, or the User could lock themselves out
+            otp_code = self.request.data.get('otp_code')
+            if otp_code is None or not check_totp(otp_secret, otp_code):
+                return 'membership_user_update_150'
+        if self._instance.otp_secret is not None:
+            # Whoever holds the User's token must also hold the stored secret to replace or remove it
+            current_otp_code = self.request.data.get('current_otp_code')
+            current_secret = decrypt_secret(self._instance.otp_secret)
+            if current_otp_code is None or current_secret is None or not check_totp(
+                current_secret,
+                current_otp_code,
+                self._instance.pk,
+            ):
+                return 'membership_user_update_151'
+            # The view records the code as used once the update is saved, so that a failed update doesn't use it up
+            self.cleaned_data['current_otp_code'] = current_otp_code
+        if otp_secret == '':
+            self.cleaned_data['otp_secret'] = None
+            return None
+        try:
+            self.cleaned_data['otp_secret'] = encrypt_secret(otp_secret)
+        except RuntimeError:
+            return 'membership_user_update_149'
+        return None
+
     def validate_robot(self, robot: Optional[bool]) -> Optional[str]:
         """
         description: |
@@ -0,0 +1,166 @@
+"""
+In-process cache of recently verified LDAP credentials
+
+After a successful `ldap_auth`, a keyed hash of the email, the password and the crypted password stored in LDAP is kept
+in a bounded LRU. Repeat logins with the same credentials are verified against that hash without searching LDAP or
+running crypt again.
+
+Entries are dropped when they expire, when the cache is full, or when `invalidate` is called for the email. Invalidation
+also bumps a version key in the shared Django cache so that the other workers drop their copies on their next lookup.
+"""
+# stdlib
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from uuid import uuid4
+# libs
+from django.conf import settings
+from django.core.cache import cache
+
+
+__all__ = [
+    'credential_cache',
+    'CredentialCache',
+]
+
+
+class _Entry(NamedTuple):
+    crypted_password: str
+    digest: bytes
+    expires: float
+    version: Optional[str]
+
+
+class CredentialCache:
+    """
+    Bounded, thread-safe LRU cache of verified credentials with a TTL per entry
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        """
+        :param max_size: The maximum number of emails to hold. 0 disables the cache.
+        :param ttl: The number of seconds a verified credential is trusted for
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # The key only lives in this process, so the digests are useless outside of it
+        self._key = os.urandom(32)
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _version_key(email: str) -> str:
+        return f'ldap_credential_version_{email}'
+
+    def _digest(self, email: str, password: str, crypted_password: str) -> bytes:
+        message = '\0'.join((email, password, crypted_password)).encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def version(self, email: str) -> Optional[str]:
+        """
+        Read the shared version of the credentials for the email.
+        This must be read before LDAP is searched, so that a change made during the search invalidates what is stored.
+        :param email: The email sent by the User
+        :return: The current version of the email's credentials
+        """
+        if self.max_size <= 0:
+            return None
+        return cache.get(self._version_key(email.lower()))
+
+    def check(self, email: str, password: str, version: Optional[str]) -> bool:
+        """
+        Check if the sent credentials match a verified entry in the cache
+        :param email: The email sent by the User
+        :param password: The password sent by the User
+        :param version: The version of the email's credentials, from `version`
+        :return: True if the credentials are known to be valid, False if they need to be checked in LDAP
+        """
+        if self.max_size <= 0:
+            return False
+        email = email.lower()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                self.misses += 1
+                return False
+            if entry.expires < time.monotonic():
+                del self._entries[email]
+                self.misses += 1
+                return False
+
+        # Make sure no other worker has changed or deleted the credentials since the entry was stored
+        if version != entry.version:
+            with self._lock:
+                self._entries.pop(email, None)
+                self.misses += 1
+            return False
+
+        if not hmac.compare_digest(entry.digest, self._digest(email, password, entry.crypted_password)):
+            # Could be a different password to the one that was verified, let LDAP decide
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            if email in self._entries:
+                self._entries.move_to_end(email)
+            self.hits += 1
+        return True
+
+    def store(self, email: str, password: str, crypted_password: str, version: Optional[str]):
+        """
+        Store credentials that have just been verified against LDAP
+        :param email: The email sent by the User
+        :param password: The password sent by the User
+        :param crypted_password: The crypted password that was read from LDAP for the email
+        :param version: The version of the email's credentials, read before LDAP was searched
+        """
+        if self.max_size <= 0:
+            return
+        email = email.lower()
+        entry = _Entry(
+            crypted_password=crypted_password,
+            digest=self._digest(email, password, crypted_password),
+            expires=time.monotonic() + self.ttl,
+            version=version,
+        )
+        with self._lock:
+            self._entries[email] = entry
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        """
+        Forget any verified credentials for the email, in this process and in every other worker
+        :param email: The email whose credentials have changed or been removed
+        """
+        email = email.lower()
+        with self._lock:
+            self._entries.pop(email, None)
+        # Entries older than the TTL are already expired, so the version only needs to outlive them
+        cache.set(self._version_key(email), uuid4().hex, timeout=self.ttl)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters used to size the cache
+        :return: The number of hits, misses and evictions, and the current number of entries
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+
+
+credential_cache = CredentialCache(settings.LDAP_CREDENTIAL_CACHE_SIZE, settings.LDAP_CREDENTIAL_CACHE_TTL)
@@ -7,6 +7,10 @@ membership_address_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+membership_address_list_002 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
 
 # Create
 membership_address_create_101 = 'The "member_id" parameter is invalid. "member_id" is required and must be an integer.'
@@ -143,3 +147,7 @@ membership_verbose_address_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+membership_verbose_address_list_002 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
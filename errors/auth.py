@@ -20,6 +20,9 @@ membership_token_create_006 = (
 )
 membership_token_create_007 = 'One Time Password (otp) is required. Please check your Authenticator App and try again.'
 membership_token_create_008 = 'One Time Password (otp) is invalid. Please check your Authenticator App and try again.'
+membership_token_create_009 = 'Membership is handling too many logins right now. Please try again shortly.'
+membership_token_create_010 = 'Too many login attempts have been made. Please wait a moment and try again.'
+membership_token_create_011 = 'Membership is handling too many requests to LDAP right now. Please try again shortly.'
 # Update
 membership_token_update_001 = (
     'The authentication token used to make this request was already invalid. Please generate a new token from scratch '
@@ -7,6 +7,10 @@ membership_country_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+membership_country_list_002 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
 
 # Read
 membership_country_read_001 = 'The "id" parameter is invalid. "id" does not belong to any valid Country.'
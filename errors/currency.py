@@ -2,5 +2,11 @@
 Error Codes for all of the Methods in the Currency Service
 """
 
+# List
+membership_currency_list_001 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
+
 # Read
 membership_currency_read_001 = 'The "id" parameter is invalid. "id" does not belong to any valid Currency.'
@@ -2,5 +2,11 @@
 Error Codes for all of the Methods in the Language Service
 """
 
+# List
+membership_language_list_001 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
+
 # Read
 membership_language_read_001 = 'The "pk" path parameter is invalid. "pk" must belong to a valid Language record.'
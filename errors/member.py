@@ -7,6 +7,10 @@ membership_member_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+membership_member_list_002 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
 
 # Create
 membership_member_create_101 = 'The "name" parameter is invalid. "name" is required and must be a string.'
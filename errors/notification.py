@@ -10,6 +10,10 @@ membership_notification_list_002 = (
     'The "transaction_type_id" path parameter is invalid. "transaction_type_id" must belong to a valid Transaction Type'
     ' record.'
 )
+membership_notification_list_003 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
 membership_notification_list_201 = (
     'You do not have permission to make this request. Your Address must be linked to the specified Address.'
 )
@@ -10,6 +10,10 @@ membership_subdivision_list_002 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+membership_subdivision_list_003 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
 
 # Read
 membership_subdivision_read_001 = (
@@ -2,6 +2,12 @@
 Error Codes for all of the Methods in the Territory Service
 """
 
+# List
+membership_territory_list_001 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
+
 # Create
 membership_territory_create_101 = 'The "name" parameter is invalid. "name" is required and must be a string.'
 membership_territory_create_102 = 'The "name" parameter is invalid. "name" cannot be longer than 50 characters.'
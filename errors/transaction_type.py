@@ -2,6 +2,12 @@
 Error Codes for all of the Methods in the Transaction Type Service
 """
 
+# List
+membership_transaction_type_list_001 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
+
 # Read
 membership_transaction_type_read_001 = (
     'The "pk" path parameter is invalid. "pk" must belong to a valid Transaction Type record.'
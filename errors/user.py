@@ -7,6 +7,10 @@ membership_user_list_001 = (
     'One or more of the sent search fields contains invalid values. Please check the sent parameters and ensure they '
     'match the required patterns.'
 )
+membership_user_list_002 = (
+    'The "cursor" parameter is invalid. "cursor" must be the "next_cursor" returned by a previous request with the '
+    'same "order".'
+)
 
 # Create
 membership_user_create_001 = (
@@ -16,6 +20,8 @@ membership_user_create_001 = (
 membership_user_create_002 = (
     'Unable to send confirmation email. Please try again later or contact CIX if this continues.'
 )
+membership_user_create_003 = 'Membership is handling too many passwords right now. Please try again shortly.'
+membership_user_create_004 = 'Membership is handling too many requests to LDAP right now. Please try again shortly.'
 membership_user_create_101 = 'The "address_id" parameter is invalid. "address_id" is required and must be an integer.'
 membership_user_create_102 = (
     'The "address_id" parameter is invalid. "address_id" must belong to a valid Address.'
@@ -125,6 +131,16 @@ membership_user_read_204 = (
     'and you are not a global User.'
 )
 
+# Bulk Read
+membership_user_bulk_read_001 = (
+    'The "ids" parameter is invalid. "ids" must be a comma separated list, or a list in the request body, of one or '
+    'more User ids.'
+)
+membership_user_bulk_read_002 = (
+    'The "ids" parameter is invalid. More ids were sent than can be read in one request. Split them into smaller '
+    'requests.'
+)
+
 # Update
 membership_user_update_001 = 'The "pk" path parameter is invalid. "pk" must belong to a valid User record.'
 membership_user_update_002 = (
@@ -134,6 +150,8 @@ membership_user_update_003 = (
     'Unable to update User in LDAP.  An unexpected error occured, please try again later or contact CloudCIX if this '
     'continues.'
 )
+membership_user_update_004 = 'Membership is handling too many passwords right now. Please try again shortly.'
+membership_user_update_005 = 'Membership is handling too many requests to LDAP right now. Please try again shortly.'
 membership_user_update_101 = 'The "address_id" parameter is invalid. "address_id" is required and must be an integer.'
 membership_user_update_102 = 'The "address_id" parameter is invalid. "address_id" must belong to a valid Address.'
 membership_user_update_103 = (
@@ -235,6 +253,21 @@ membership_user_update_144 = (
 )
 membership_user_update_145 = 'The "robot" parameter is invalid. A robot User already exists in the User\'s Address.'
 membership_user_update_146 = 'The "otp" parameter is invalid. OTP cannot be turned on for robot or API users.'
+membership_user_update_147 = 'The "otp_secret" parameter is invalid. Users can only set their own "otp_secret".'
+membership_user_update_148 = (
+    'The "otp_secret" parameter is invalid. "otp_secret" must be a base32 string of at least 16 characters.'
+)
+membership_user_update_149 = (
+    'The "otp_secret" parameter is invalid. Membership is not configured to store OTP secrets.'
+)
+membership_user_update_150 = (
+    'The "otp_code" parameter is invalid. "otp_code" is required with a new "otp_secret" and must be a current code '
+    'generated from it.'
+)
+membership_user_update_151 = (
+    'The "current_otp_code" parameter is invalid. "current_otp_code" is required to replace or remove a stored '
+    '"otp_secret" and must be a current code generated from the stored secret.'
+)
 
 membership_user_update_201 = (
     "You do not have permission to execute this method. Only Member 1 administrator's can change the roles of a User."
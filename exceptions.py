@@ -0,0 +1,36 @@
+"""
+Error responses for status codes that cloudcix_rest.exceptions does not provide.
+They reuse Http400 so that the error_code is looked up and rendered the same way as every other error.
+"""
+# libs
+from cloudcix_rest.exceptions import Http400
+from rest_framework import status
+
+
+__all__ = [
+    'Http429',
+    'Http503',
+]
+
+
+class Http429(Http400):
+    """
+    Too many requests have been sent. The client should wait `retry_after` seconds before trying again.
+    """
+
+    def __init__(self, *args, retry_after: int = 1, **kwargs):
+        super(Http429, self).__init__(*args, **kwargs)
+        self.status_code = status.HTTP_429_TOO_MANY_REQUESTS
+        self['Retry-After'] = str(retry_after)
+
+
+class Http503(Http400):
+    """
+    The service is temporarily unable to handle the request. The client should wait `retry_after` seconds before trying
+    again.
+    """
+
+    def __init__(self, *args, retry_after: int = 1, **kwargs):
+        super(Http503, self).__init__(*args, **kwargs)
+        self.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        self['Retry-After'] = str(retry_after)
@@ -0,0 +1,225 @@
+"""
+Sparse fieldsets and sideloading for the User, Address and Team lists
+
+By default every record is serialized in full, with its related records nested inside it, and the model managers join
+or prefetch all of them. Sending `fields`, `expand` and/or `include` switches a list to sparse output instead;
+
+- `fields` is a comma separated list of the keys to return. All keys are returned if it is not sent.
+- Related records are returned as their id, or a list of ids, unless they are named in `expand`, in which case they
+  are nested in full as before.
+- Related records named in `include` are also returned as ids, and each distinct one is serialized once into the
+  `included` map of the response, keyed by type and then id. A page of Users in the same Member carries that Member
+  once instead of once per User.
+
+The query is pruned to match, so only the joins and prefetches for expanded and included relations, and for fields
+computed from related records such as an Address's `full_address`, are run. A list of Users sent
+`fields=id,first_name,surname,email` is read from the user table alone.
+"""
+# stdlib
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple, Type
+# libs
+import serpy
+from django.db.models import QuerySet
+from rest_framework.request import Request
+# local
+from membership.serializers import AddressSerializer, TeamSerializer, UserSerializer
+
+
+__all__ = [
+    'Fieldset',
+]
+
+
+class Relation(NamedTuple):
+    """
+    A nested serializer field, and what has to be joined or prefetched to serialize it in full
+    """
+    # The key of the related records in the `included` map
+    type: str
+    select: Tuple[str, ...] = ()
+    prefetch: Tuple[str, ...] = ()
+    # A to-many relation, returned as a list of ids when it is not expanded
+    many: bool = False
+
+
+class _IdsField(serpy.Field):
+    """
+    Output the ids of the records in a to-many relation
+    """
+
+    def to_value(self, value):
+        return [obj.pk for obj in value]
+
+
+def _prefixed(prefix: str, paths: Tuple[str, ...]) -> Tuple[str, ...]:
+    return (prefix, *(f'{prefix}__{path}' for path in paths))
+
+
+_ADDRESS_RELATIONS = {
+    'country': Relation('country', select=('country',)),
+    'currency': Relation('currency', select=('currency',)),
+    'language': Relation('language', select=('language',)),
+    'member': Relation('member', select=('member', 'member__currency')),
+    'subdivision': Relation('subdivision', select=('subdivision', 'subdivision__country')),
+}
+_ADDRESS_JOINS = tuple(path for relation in _ADDRESS_RELATIONS.values() for path in relation.select)
+
+_USER_RELATIONS = {
+    'address': Relation('address', select=_prefixed('address', _ADDRESS_JOINS)),
+    'department': Relation('department', select=('department', 'department__member', 'department__member__currency')),
+    'language': Relation('language', select=('language',)),
+    'member': Relation('member', select=('member', 'member__currency')),
+    'profile': Relation('profile', select=('profile', 'profile__member', 'profile__member__currency')),
+}
+_USER_JOINS = tuple(path for relation in _USER_RELATIONS.values() for path in relation.select)
+
+# Map of serializer to the fields in it that can be expanded or included
+RELATIONS: Dict[Type[serpy.Serializer], Dict[str, Relation]] = {
+    AddressSerializer: _ADDRESS_RELATIONS,
+    TeamSerializer: {
+        'member': Relation('member', select=('member', 'member__currency')),
+        'users': Relation('user', prefetch=_prefixed('users', _USER_JOINS), many=True),
+    },
+    UserSerializer: _USER_RELATIONS,
+}
+
+
+# Map of serializer to the fields in it that are computed from related records, and what has to be joined to compute
+# them without a query per record
+COMPUTED: Dict[Type[serpy.Serializer], Dict[str, Tuple[str, ...]]] = {
+    AddressSerializer: {
+        # Address.full_address reads the names of the subdivision and country
+        'full_address': ('country', 'subdivision', 'subdivision__country'),
+        'old_full_address': ('country', 'subdivision', 'subdivision__country'),
+    },
+}
+
+
+def _split(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset(name.strip() for name in (value or '').split(',') if name.strip() != '')
+
+
+def _key(name: str, field: serpy.Field) -> str:
+    """
+    The key a field is output under
+    """
+    return field.label or name
+
+
+@lru_cache(maxsize=128)
+def _sparse_serializer(
+        serializer: Type[serpy.Serializer],
+        keys: FrozenSet[str],
+        expand: FrozenSet[str],
+) -> Type[serpy.Serializer]:
+    """
+    Build a serializer with only the requested fields, and ids in place of the relations that are not expanded
+    """
+    relations = RELATIONS[serializer]
+    fields = {}
+    for name, field in serializer._field_map.items():
+        if _key(name, field) not in keys:
+            continue
+        if name in relations and name not in expand:
+            if relations[name].many:
+                field = _IdsField(attr=field.attr, call=field.call, label=field.label)
+            else:
+                field = serpy.Field(attr=f'{name}_id', label=field.label)
+        fields[name] = field
+    return type(f'Sparse{serializer.__name__}', (serpy.Serializer,), fields)
+
+
+def _related(obj: Any, name: str, field: serpy.Field) -> Iterable[Any]:
+    """
+    The records in a relation of obj, read the same way as the nested serializer field would
+    """
+    value = obj
+    for attr in (field.attr or name).split('.'):
+        value = getattr(value, attr)
+    if field.call:
+        value = value()
+    if value is None:
+        return ()
+    return value if field.many else (value,)
+
+
+class Fieldset:
+    """
+    The fields of a serializer requested with the `fields`, `expand` and `include` parameters. Unknown names are
+    ignored, and a relation that is both expanded and included is expanded.
+    """
+
+    def __init__(self, serializer: Type[serpy.Serializer], request: Request):
+        fields = request.GET.get('fields')
+        expand = request.GET.get('expand')
+        include = request.GET.get('include')
+        self.sparse = fields is not None or expand is not None or include is not None
+        self._serializer = serializer
+        self._relations = RELATIONS[serializer]
+        self.include: FrozenSet[str] = frozenset()
+        if not self.sparse:
+            return
+
+        all_keys = frozenset(_key(name, field) for name, field in serializer._field_map.items())
+        self._keys = _split(fields) & all_keys or all_keys
+        selected = frozenset(
+            name for name in self._relations
+            if _key(name, serializer._field_map[name]) in self._keys
+        )
+        self._expand = _split(expand) & selected
+        self.include = _split(include) & selected - self._expand
+
+    @property
+    def serializer(self) -> Type[serpy.Serializer]:
+        """
+        The serializer to output the requested fields with
+        """
+        if not self.sparse:
+            return self._serializer
+        return _sparse_serializer(self._serializer, self._keys, self._expand)
+
+    def queryset(self, objs: QuerySet) -> QuerySet:
+        """
+        Replace the joins and prefetches of the model manager with the ones needed for the requested fields
+        :param objs: A QuerySet from the model manager, before any view specific prefetches are added
+        :return: The pruned QuerySet
+        """
+        if not self.sparse:
+            return objs
+
+        select = []
+        prefetch = []
+        for name, relation in self._relations.items():
+            if name in self._expand or name in self.include:
+                select.extend(relation.select)
+                prefetch.extend(relation.prefetch)
+            elif relation.many and _key(name, self._serializer._field_map[name]) in self._keys:
+                prefetch.append(name)
+        for name, paths in COMPUTED.get(self._serializer, {}).items():
+            if _key(name, self._serializer._field_map[name]) in self._keys:
+                select.extend(path for path in paths if path not in select)
+
+        objs = objs.select_related(None).prefetch_related(None)
+        if len(select) > 0:
+            objs = objs.select_related(*select)
+        if len(prefetch) > 0:
+            objs = objs.prefetch_related(*prefetch)
+        return objs
+
+    def included(self, objs: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Serialize the included relations of a page of records, once for each distinct related record
+        :param objs: The records in the page
+        :return: Map of type to a map of id to the serialized related record
+        """
+        included: Dict[str, Dict[str, Any]] = {}
+        for name in sorted(self.include):
+            field = self._serializer._field_map[name]
+            serialized = included.setdefault(self._relations[name].type, {})
+            for obj in objs:
+                for related in _related(obj, name, field):
+                    key = str(related.pk)
+                    if key not in serialized:
+                        serialized[key] = type(field)(instance=related).data
+        return included
@@ -0,0 +1,141 @@
+"""
+SHA-512 crypt of LDAP passwords
+
+crypt is CPU bound and holds a gunicorn worker for milliseconds each time it runs. When `LDAP_CRYPT_POOL_WORKERS` is
+set, the work is sent to a bounded process pool instead, and requests fail fast with `CryptPoolSaturated` once the pool
+has as many jobs in flight as it is allowed.
+"""
+# stdlib
+import atexit
+import crypt
+import hmac
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+# libs
+from django.conf import settings
+
+
+__all__ = [
+    'CryptPool',
+    'CryptPoolSaturated',
+    'hash_password',
+    'verify_password',
+]
+
+
+class CryptPoolSaturated(Exception):
+    """
+    Raised when the crypt pool cannot take on any more work
+    """
+    pass
+
+
+class CryptPool:
+    """
+    A process pool for crypt with a limit on the number of jobs that can be queued in it
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        """
+        :param workers: The number of processes to run crypt in
+        :param max_queue: The number of jobs that can wait for a free process before new jobs are rejected
+        :param timeout: The number of seconds to wait for a result before giving up
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _setup(self):
+        """
+        Executors cannot be shared across a fork, so each gunicorn worker creates its own on first use
+        """
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+                self._pid = pid
+        return self._executor, self._slots
+
+    def _rebuild(self, broken: ProcessPoolExecutor):
+        """
+        Replace an executor that can no longer run jobs because one of its processes died, e.g. to the OOM killer. Its
+        jobs have already failed, which released their slots.
+        """
+        with self._lock:
+            if self._executor is broken and self._pid == os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        broken.shutdown(wait=False)
+
+    def _run(self, executor: ProcessPoolExecutor, slots: threading.BoundedSemaphore, word: str, salt: str) -> str:
+        if not slots.acquire(blocking=False):
+            raise CryptPoolSaturated
+        try:
+            future = executor.submit(crypt.crypt, word, salt)
+        except Exception:
+            slots.release()
+            raise
+        # The slot is held until the job finishes, not until this stops waiting for it, so that jobs given up on
+        # still count towards the limit
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise CryptPoolSaturated
+
+    def crypt(self, word: str, salt: str) -> str:
+        """
+        Run crypt.crypt in the pool. If the pool is broken, it is replaced and the job is tried once more.
+        :raises CryptPoolSaturated: If the pool is full, the job did not finish in time, or the pool broke twice
+        """
+        for _ in range(2):
+            executor, slots = self._setup()
+            try:
+                return self._run(executor, slots, word, salt)
+            except BrokenProcessPool:
+                self._rebuild(executor)
+        raise CryptPoolSaturated
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+
+
+if settings.LDAP_CRYPT_POOL_WORKERS > 0:
+    _pool: Optional[CryptPool] = CryptPool(
+        settings.LDAP_CRYPT_POOL_WORKERS,
+        settings.LDAP_CRYPT_POOL_QUEUE,
+        settings.LDAP_CRYPT_POOL_TIMEOUT,
+    )
+    atexit.register(_pool.shutdown)
+else:
+    _pool = None
+
+
+def _crypt(word: str, salt: str, pool: Optional[CryptPool]) -> str:
+    if pool is None:
+        return crypt.crypt(word, salt)
+    return pool.crypt(word, salt)
+
+
+def hash_password(password: str, pool: Optional[CryptPool] = _pool) -> str:
+    """
+    Generate a SHA-512 crypt of the password with a new salt, to store in LDAP
+    :raises CryptPoolSaturated: If the crypt pool is enabled and full
+    """
+    return _crypt(password, crypt.mksalt(crypt.METHOD_SHA512), pool)
+
+
+def verify_password(password: str, crypted_password: str, pool: Optional[CryptPool] = _pool) -> bool:
+    """
+    Check the password against a crypted password read from LDAP
+    :raises CryptPoolSaturated: If the crypt pool is enabled and full
+    """
+    return hmac.compare_digest(crypted_password, _crypt(password, crypted_password, pool))
@@ -0,0 +1,174 @@
+"""
+Write-behind of memberUid changes to LDAP
+
+When `LDAP_WRITE_BEHIND` is set, the User views don't add or remove memberUids in LDAP during the request. They write
+LDAPOutbox rows in the same transaction that saves the User, so the change reaches LDAP if and only if the User change
+is committed, and a slow or failing LDAP server no longer holds up the API. Creating an LDAP entry with a password still
+happens in the request.
+
+`drain` writes the pending rows to LDAP, merging every pending change for an email into a single modify. The database
+is the source of truth: a memberUid is only added if a User with that email is still in the Member, and only removed if
+there no longer is one, so rows can be applied more than once, out of order, or by several drainers without harm. The
+LDAP entry is deleted once no User has the email. Failed rows are retried with an exponential backoff.
+
+No database transaction is open while LDAP is written to. Rows are claimed for LEASE seconds in a short transaction
+first, and the result for each email is saved in a transaction of its own.
+"""
+# stdlib
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+# libs
+import ldap3
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from ldap3.core.results import (
+    RESULT_ATTRIBUTE_OR_VALUE_EXISTS,
+    RESULT_NO_SUCH_ATTRIBUTE,
+    RESULT_NO_SUCH_OBJECT,
+    RESULT_SUCCESS,
+)
+# local
+from membership.credentials import credential_cache
+from membership.models import LDAPOutbox, User
+from membership.utils import ldap_pool
+
+
+__all__ = [
+    'drain',
+    'enqueue',
+]
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between retries of a failing row, in seconds
+MAX_BACKOFF = 3600
+# Seconds that claimed rows are left to the drainer that claimed them, before another drainer may take them
+LEASE = 300
+
+
+def enqueue(action: str, email: str, member_id: int):
+    """
+    Record a memberUid change to be written to LDAP. Call this inside the transaction that saves the User.
+    :param action: LDAPOutbox.ADD or LDAPOutbox.REMOVE
+    :param email: The email of the LDAP entry
+    :param member_id: The id of the Member to add to or remove from the entry
+    """
+    LDAPOutbox.objects.create(action=action, email=email, member_id=member_id)
+
+
+def _apply(email: str, rows: Iterable[LDAPOutbox]) -> Optional[str]:
+    """
+    Bring the memberUids of the LDAP entry for an email in line with the database, for the Members in the rows
+    :return: None if the entry was updated, otherwise the error
+    """
+    member_ids: Set[int] = set(User.objects.with_email(email).values_list('member_id', flat=True))
+    adds = sorted({row.member_id for row in rows if row.action == LDAPOutbox.ADD and row.member_id in member_ids})
+    removes = sorted({
+        row.member_id for row in rows if row.action == LDAPOutbox.REMOVE and row.member_id not in member_ids
+    })
+    cn = f'cn={email},{settings.LDAP_DOMAIN_CONTROLLER}'
+
+    with ldap_pool.connection() as conn:
+        if len(member_ids) == 0:
+            # No User has this email anymore so the entry goes
+            conn.delete(cn)
+            result_code = conn.result['result']
+            credential_cache.invalidate(email)
+            if result_code in (RESULT_SUCCESS, RESULT_NO_SUCH_OBJECT):
+                return None
+            return f'Could not delete {cn}: {conn.last_error}'
+
+        changes: List[tuple] = []
+        if len(adds) > 0:
+            changes.append((ldap3.MODIFY_ADD, adds))
+        if len(removes) > 0:
+            changes.append((ldap3.MODIFY_DELETE, removes))
+        if len(changes) == 0:
+            return None
+
+        conn.modify(cn, {'memberUid': changes})
+        result_code = conn.result['result']
+        if result_code == RESULT_SUCCESS:
+            return None
+        if result_code == RESULT_NO_SUCH_OBJECT:
+            if len(adds) > 0:
+                # The entry can only be created with a password, which is not kept anywhere
+                return f'{cn} does not exist so MemberUIDs {adds} cannot be added'
+            return None
+        if result_code not in (RESULT_ATTRIBUTE_OR_VALUE_EXISTS, RESULT_NO_SUCH_ATTRIBUTE):
+            return f'Could not modify {cn}: {conn.last_error}'
+
+        # Some of the changes were already applied, which fails the whole modify. Apply them one at a time instead.
+        for operation, values in changes:
+            for member_id in values:
+                conn.modify(cn, {'memberUid': (operation, [member_id])})
+                result_code = conn.result['result']
+                if result_code not in (RESULT_SUCCESS, RESULT_ATTRIBUTE_OR_VALUE_EXISTS, RESULT_NO_SUCH_ATTRIBUTE):
+                    return f'Could not modify MemberUID {member_id} of {cn}: {conn.last_error}'
+    return None
+
+
+def _claim(batch_size: int) -> List[LDAPOutbox]:
+    """
+    Take up to batch_size pending rows for this drainer, by moving their next attempt LEASE seconds ahead.
+    Rows are locked with SKIP LOCKED only for this short transaction, so several drainers can claim at once without
+    taking the same rows, and no lock is held while LDAP is written to.
+    """
+    now = timezone.now()
+    with transaction.atomic(using='membership'):
+        rows = list(
+            LDAPOutbox.objects.select_for_update(skip_locked=True).filter(
+                completed__isnull=True,
+                next_attempt__lte=now,
+                attempts__lt=settings.LDAP_OUTBOX_MAX_ATTEMPTS,
+            ).order_by('id')[:batch_size],
+        )
+        LDAPOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(next_attempt=now + timedelta(seconds=LEASE))
+    return rows
+
+
+def drain(batch_size: int) -> Dict[str, int]:
+    """
+    Write up to batch_size pending rows to LDAP.
+    The rows are claimed first, then written to LDAP outside of any transaction, and the result for each email is saved
+    in a transaction of its own. Rows claimed by a drainer that stops before saving their result are retried once the
+    lease runs out.
+    :return: The number of rows and emails processed, and the number of rows that failed
+    """
+    rows = _claim(batch_size)
+    by_email: Dict[str, List[LDAPOutbox]] = defaultdict(list)
+    for row in rows:
+        by_email[row.email].append(row)
+
+    failed = 0
+    for email, email_rows in by_email.items():
+        ids = [row.pk for row in email_rows]
+        try:
+            error = _apply(email, email_rows)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        if error is None:
+            with transaction.atomic(using='membership'):
+                LDAPOutbox.objects.filter(pk__in=ids).update(completed=timezone.now())
+            continue
+
+        failed += len(ids)
+        attempts = max(row.attempts for row in email_rows) + 1
+        if attempts >= settings.LDAP_OUTBOX_MAX_ATTEMPTS:
+            logger.error(f'Giving up on LDAP outbox rows {ids} after {attempts} attempts. ERROR: {error}')
+        with transaction.atomic(using='membership'):
+            LDAPOutbox.objects.filter(pk__in=ids).update(
+                attempts=F('attempts') + 1,
+                last_error=error,
+                next_attempt=timezone.now() + timedelta(seconds=min(2 ** attempts, MAX_BACKOFF)),
+            )
+
+    return {
+        'rows': len(rows),
+        'emails': len(by_email),
+        'failed': failed,
+    }
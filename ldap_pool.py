@@ -0,0 +1,197 @@
+"""
+Pool of bound LDAP connections
+
+ldap3 connections are not safe to use from more than one thread at a time, so sharing a single connection serialises
+every LDAP call in a worker behind the slowest one. The pool holds up to `size` connections, each checked out by one
+thread at a time. Connections are opened on first use, checked before reuse if they have been idle for a while, and
+replaced if an LDAP call on them fails with a connection error.
+"""
+# stdlib
+import contextlib
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+# libs
+import ldap3
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPSessionTerminatedByServerError, LDAPSocketOpenError
+
+
+__all__ = [
+    'LDAPConnectionPool',
+    'LDAPPoolExhausted',
+]
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection is broken, rather than the operation being rejected
+CONNECTION_ERRORS = (LDAPCommunicationError, LDAPSessionTerminatedByServerError, LDAPSocketOpenError)
+
+
+class LDAPPoolExhausted(Exception):
+    """
+    Raised when no LDAP connection became free within the checkout timeout
+    """
+    pass
+
+
+class _Slot:
+    """
+    A place in the pool and the connection currently in it, if one has been opened
+    """
+
+    def __init__(self, number: int):
+        self.number = number
+        self.connection: Optional[ldap3.Connection] = None
+        self.last_used = 0.0
+        self.opened = 0
+        self.uses = 0
+
+
+class LDAPConnectionPool:
+    """
+    A fixed size, thread-safe pool of LDAP connections
+    """
+
+    def __init__(
+            self,
+            factory: Callable[[], ldap3.Connection],
+            size: int,
+            timeout: float,
+            health_check_interval: float,
+            health_check: Optional[Callable[[ldap3.Connection], bool]] = None,
+    ):
+        """
+        :param factory: Creates a new bound connection
+        :param size: The number of connections to hold
+        :param timeout: The number of seconds to wait for a free connection before raising LDAPPoolExhausted
+        :param health_check_interval: Connections idle for longer than this many seconds are checked before reuse
+        :param health_check: Returns whether a connection is still usable. Defaults to a search for the bound DN.
+        """
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.health_check = health_check or self._ping
+        self._slots: List[_Slot] = [_Slot(number) for number in range(size)]
+        self._free: 'queue.LifoQueue[_Slot]' = queue.LifoQueue()
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.exhausted = 0
+        self.replaced = 0
+        self.wait_time = 0.0
+
+    @staticmethod
+    def _ping(conn: ldap3.Connection) -> bool:
+        """
+        Any reply from the server shows the connection still works, whether or not the search matches anything
+        """
+        conn.search(conn.user, '(objectClass=*)', search_scope=ldap3.BASE, attributes=['1.1'])
+        return conn.result is not None
+
+    def _setup(self) -> 'queue.LifoQueue[_Slot]':
+        """
+        Sockets cannot be shared across a fork, so each gunicorn worker starts with an empty pool of its own
+        """
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid:
+                self._slots = [_Slot(number) for number in range(self.size)]
+                self._free = queue.LifoQueue()
+                for slot in self._slots:
+                    self._free.put(slot)
+                self._pid = pid
+        return self._free
+
+    def _close(self, slot: _Slot):
+        if slot.connection is None:
+            return
+        try:
+            slot.connection.unbind()
+        except Exception:  # pragma: no cover
+            pass
+        slot.connection = None
+
+    def _ready(self, slot: _Slot) -> ldap3.Connection:
+        """
+        Make sure the slot holds a usable connection, opening a new one if needed
+        """
+        conn = slot.connection
+        if conn is not None and (conn.closed or not conn.bound):
+            self._close(slot)
+        elif conn is not None and time.monotonic() - slot.last_used > self.health_check_interval:
+            try:
+                healthy = self.health_check(conn)
+            except CONNECTION_ERRORS:
+                healthy = False
+            if not healthy:
+                logger.warning(f'LDAP connection {slot.number} failed its health check and will be replaced')
+                self._close(slot)
+        if slot.connection is None:
+            if slot.opened > 0:
+                self.replaced += 1
+            slot.connection = self.factory()
+            slot.opened += 1
+        return slot.connection
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[ldap3.Connection]:
+        """
+        Check out a connection for the duration of the block
+        :raises LDAPPoolExhausted: If no connection became free within the timeout
+        """
+        free = self._setup()
+        start = time.monotonic()
+        try:
+            slot = free.get(timeout=self.timeout)
+        except queue.Empty:
+            self.exhausted += 1
+            raise LDAPPoolExhausted
+        self.checkouts += 1
+        self.wait_time += time.monotonic() - start
+        try:
+            conn = self._ready(slot)
+            slot.uses += 1
+            yield conn
+        except CONNECTION_ERRORS:
+            # Don't hand a broken socket to the next caller
+            self._close(slot)
+            raise
+        except Exception:
+            # The factory failed or the caller raised; only keep the connection if it is still bound
+            if slot.connection is not None and (slot.connection.closed or not slot.connection.bound):
+                self._close(slot)
+            raise
+        finally:
+            slot.last_used = time.monotonic()
+            free.put(slot)
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Counters for this worker, including how many times each connection has been used and reopened
+        """
+        return {
+            'size': self.size,
+            'checkouts': self.checkouts,
+            'exhausted': self.exhausted,
+            'replaced': self.replaced,
+            'average_wait_ms': round(1000 * self.wait_time / self.checkouts, 3) if self.checkouts else 0.0,
+            'uses': [slot.uses for slot in self._slots],
+            'opened': [slot.opened for slot in self._slots],
+        }
+
+    def close(self):
+        """
+        Unbind every idle connection held by this process
+        """
+        if self._pid != os.getpid():
+            return
+        while True:
+            try:
+                slot = self._free.get_nowait()
+            except queue.Empty:
+                break
+            self._close(slot)
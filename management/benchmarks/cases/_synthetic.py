@@ -0,0 +1,60 @@
+"""
+Synthetic data shared by the benchmarks. Not a benchmark itself, so it is not imported by the runner.
+"""
+# stdlib
+import hashlib
+# libs
+from django.db import connections
+# local
+from membership.models import User
+
+
+__all__ = [
+    'clone',
+    'create_users',
+    'synthetic_email',
+]
+
+# Columns of the synthetic Users that differ from the copied one, as SQL expressions of the series number `n`
+SYNTHETIC_COLUMNS = {
+    'email': "substr(md5(n::text), 1, 8) || '.' || n || '@example.com'",
+    'first_name': 'initcap(substr(md5(n::text), 9, 6))',
+    'surname': 'initcap(substr(md5((n * 7)::text), 1, 9))',
+}
+
+
+def clone(obj, **overrides):
+    """
+    An unsaved copy of a record, with the fields in `overrides` changed
+    """
+    return type(obj)(**{
+        **{field.attname: getattr(obj, field.attname) for field in obj._meta.concrete_fields if not field.primary_key},
+        **overrides,
+    })
+
+
+def synthetic_email(n: int) -> str:
+    """
+    The email of the nth synthetic User, the same as SYNTHETIC_COLUMNS gives it
+    """
+    return f'{hashlib.md5(str(n).encode()).hexdigest()[:8]}.{n}@example.com'
+
+
+def create_users(template: User, count: int, start: int = 1):
+    """
+    Copy the template User `count` times in one INSERT, with distinct names and emails, numbered from `start`, and
+    update the table statistics. Only for benchmarks marked with writes_data, which are run against a copy of the
+    database.
+    """
+    connection = connections['membership']
+    quote = connection.ops.quote_name
+    table = quote(User._meta.db_table)
+    columns = [field.column for field in User._meta.concrete_fields if not field.primary_key]
+    values = [SYNTHETIC_COLUMNS.get(column, f'u.{quote(column)}') for column in columns]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+            f'SELECT {", ".join(values)} FROM {table} u, generate_series(%s, %s) n WHERE u.id = %s',
+            [start, start + count - 1, template.pk],
+        )
+        cursor.execute(f'ANALYZE {table}')
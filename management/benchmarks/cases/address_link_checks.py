@@ -0,0 +1,88 @@
+# stdlib
+import random
+import statistics
+import time
+# libs
+from django.conf import settings
+from django.db import transaction
+# local
+from membership.address_link_index import AddressLinkIndex
+from membership.management.benchmarks.cases._synthetic import clone
+from membership.management.benchmarks.runner import output_results, register, writes_data
+from membership.management.integrity.runner import file_or_stdout
+from membership.models import Address, AddressLink
+
+
+__all__ = [
+    'address_link_checks',
+]
+
+LINK_COUNTS = (100, 10000, 100000)
+CHECKS = 1000
+REPEATS = 5
+
+
+def _query(index: AddressLinkIndex, address_id: int, contra_address_id: int) -> bool:
+    # The old check, one query for each
+    return AddressLink.objects.filter(address_id=address_id, contra_address_id=contra_address_id).exists()
+
+
+def _index(index: AddressLinkIndex, address_id: int, contra_address_id: int) -> bool:
+    return index.is_linked(address_id, contra_address_id)
+
+
+def _time(check, index: AddressLinkIndex, address_id: int, contra_address_ids) -> float:
+    """
+    Median microseconds for one permission check, over CHECKS checks of linked and unlinked Addresses
+    """
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for contra_address_id in contra_address_ids:
+            check(index, address_id, contra_address_id)
+        timings.append((time.perf_counter() - start) / len(contra_address_ids))
+    return 1000000 * statistics.median(timings)
+
+
+@register
+@writes_data
+def address_link_checks(file=None):
+    """
+    Compare checking that a User's Address is linked to another with a query against the AddressLinkIndex, for an
+    Address with each of LINK_COUNTS links, including the time to load its links into an empty index. The synthetic
+    Addresses and links are rolled back afterwards.
+    """
+    template = Address.objects.order_by('id').first()
+    if template is None:
+        with file_or_stdout(file) as fp:
+            fp.write('At least one Address is needed to copy for the synthetic data\n')
+        return
+
+    rows = []
+    for links in LINK_COUNTS:
+        with transaction.atomic(using='membership'):
+            address = clone(template)
+            address.save()
+            contra_addresses = Address.objects.bulk_create((clone(template) for _ in range(links)), batch_size=5000)
+            AddressLink.objects.bulk_create(
+                (AddressLink(address=address, contra_address=contra) for contra in contra_addresses),
+                batch_size=5000,
+            )
+            # Half of the checks are for Addresses that are linked, and half for ones that are not
+            linked_ids = [contra.pk for contra in contra_addresses]
+            contra_address_ids = [random.choice(linked_ids) for _ in range(CHECKS // 2)]
+            contra_address_ids += [max(linked_ids) + n for n in range(1, CHECKS // 2 + 1)]
+
+            # Versions every check as the shared index does with the default ADDRESS_LINK_INDEX_MAX_AGE
+            index = AddressLinkIndex(1, settings.ADDRESS_LINK_INDEX_TTL, 0)
+            start = time.perf_counter()
+            index.links(address.pk)
+            load = 1000 * (time.perf_counter() - start)
+
+            query = _time(_query, index, address.pk, contra_address_ids)
+            indexed = _time(_index, index, address.pk, contra_address_ids)
+            rows.append((links, f'{load:.1f}', f'{query:.1f}', f'{indexed:.1f}', f'{query / indexed:.1f}x'))
+            index.invalidate(address.pk)
+            transaction.set_rollback(True, using='membership')
+
+    output_results(file, ('Links', 'Load (ms)', 'Query (us)', 'Index (us)', 'Speed up'), rows)
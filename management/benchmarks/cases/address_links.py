@@ -0,0 +1,59 @@
+# stdlib
+import time
+# libs
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+# local
+from membership.management.benchmarks.cases._synthetic import clone
+from membership.management.benchmarks.runner import output_results, register, writes_data
+from membership.management.integrity.runner import file_or_stdout
+from membership.models import Address, AddressLink
+
+
+__all__ = [
+    'new_address_links',
+]
+
+MEMBER_ADDRESSES = (0, 10, 100, 1000)
+# One query for the ids of the other Addresses in the Member and one INSERT for all of the links
+LINK_QUERIES = 2
+
+
+@register
+@writes_data
+def new_address_links(file=None):
+    """
+    Count the queries, links and time taken to create the links for a new Address in a Member with each of
+    MEMBER_ADDRESSES other Addresses. It should take LINK_QUERIES queries however many Addresses there are, and create
+    the self link and the links both ways with the User's Address and each other Address; the last column says whether
+    it did. The synthetic Addresses and links are rolled back afterwards.
+    """
+    template = Address.objects.select_related('member').order_by('id').first()
+    if template is None:
+        with file_or_stdout(file) as fp:
+            fp.write('At least one Address is needed to copy for the synthetic data\n')
+        return
+
+    rows = []
+    for count in MEMBER_ADDRESSES:
+        with transaction.atomic(using='membership'):
+            # A Member of its own, so that it has exactly `count` other Addresses
+            member = clone(template.member)
+            member.save()
+            user_address = clone(template)
+            user_address.save()
+            Address.objects.bulk_create((clone(template, member_id=member.pk) for _ in range(count)), batch_size=5000)
+            address = clone(template, member_id=member.pk)
+            address.save()
+
+            with CaptureQueriesContext(connections['membership']) as queries:
+                start = time.perf_counter()
+                AddressLink.objects.link_new_address(address, user_address.pk)
+                elapsed = time.perf_counter() - start
+            links = AddressLink.objects.filter(contra_address=address).count()
+            links += AddressLink.objects.filter(address=address).exclude(contra_address=address).count()
+            designed = len(queries) == LINK_QUERIES and links == 3 + 2 * count
+            rows.append((count, len(queries), links, f'{1000 * elapsed:.1f}', 'yes' if designed else 'NO'))
+            transaction.set_rollback(True, using='membership')
+
+    output_results(file, ('Member Addresses', 'Queries', 'Links', 'Time (ms)', 'As Designed'), rows)
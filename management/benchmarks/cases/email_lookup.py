@@ -0,0 +1,69 @@
+# stdlib
+import statistics
+import time
+# libs
+from django.db import transaction
+# local
+from membership.management.benchmarks.cases._synthetic import create_users, synthetic_email
+from membership.management.benchmarks.runner import output_results, register, writes_data
+from membership.management.integrity.runner import file_or_stdout
+from membership.models import User
+
+
+__all__ = [
+    'login_email_lookup',
+]
+
+USER_COUNTS = (10000, 100000, 1000000)
+REPEATS = 5
+
+
+def _iexact(email: str, api_key: str):
+    # The old lookup, UPPER(email) = UPPER(...)
+    return User.objects.values('pk').get(email__iexact=email, member__api_key=api_key)
+
+
+def _lower(email: str, api_key: str):
+    return User.objects.with_email(email).values('pk').get(member__api_key=api_key)
+
+
+def _time(lookup, email: str, api_key: str) -> float:
+    """
+    Median milliseconds to find the User for a login
+    """
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        lookup(email, api_key)
+        timings.append(time.perf_counter() - start)
+    return 1000 * statistics.median(timings)
+
+
+@register
+@writes_data
+def login_email_lookup(file=None):
+    """
+    Compare finding the User for a login with `email__iexact` against User.objects.with_email, as the user table grows
+    to each of USER_COUNTS synthetic Users in the same Member. The synthetic Users are rolled back afterwards.
+    """
+    template = User.objects.select_related('member').order_by('id').first()
+    if template is None:
+        with file_or_stdout(file) as fp:
+            fp.write('At least one User is needed to copy for the synthetic data\n')
+        return
+
+    rows = []
+    api_key = template.member.api_key
+    with transaction.atomic(using='membership'):
+        created = 0
+        for count in USER_COUNTS:
+            create_users(template, count - created, created + 1)
+            created = count
+            # Sent in upper case, as a login form might
+            email = synthetic_email(count // 2).upper()
+            iexact = _time(_iexact, email, api_key)
+            lower = _time(_lower, email, api_key)
+            rows.append((count, f'{iexact:.2f}', f'{lower:.2f}', f'{iexact / lower:.1f}x'))
+        transaction.set_rollback(True, using='membership')
+
+    output_results(file, ('Users', 'iexact (ms)', 'LOWER(email) (ms)', 'Speed up'), rows)
@@ -0,0 +1,94 @@
+# stdlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+# libs
+import ldap3
+# local
+from membership.ldap_pool import LDAPConnectionPool
+from membership.management.benchmarks.runner import output_results, register
+
+
+__all__ = [
+    'ldap_pool_concurrent_logins',
+]
+
+DOMAIN_CONTROLLER = 'dc=benchmark,dc=local'
+ADMIN = f'cn=admin,{DOMAIN_CONTROLLER}'
+LOGINS = 400
+THREADS = 16
+USERS = 100
+# Simulated round trip to the LDAP server for each search, which the mock server otherwise doesn't have
+LATENCY = 0.005
+
+
+class _SlowConnection(ldap3.Connection):
+
+    def search(self, *args, **kwargs):
+        time.sleep(LATENCY)
+        return super(_SlowConnection, self).search(*args, **kwargs)
+
+
+def _mock_server() -> ldap3.Server:
+    """
+    Create a mock server with an admin account and USERS accounts to log in with
+    """
+    server = ldap3.Server('benchmark')
+    conn = ldap3.Connection(server, client_strategy=ldap3.MOCK_SYNC)
+    conn.strategy.add_entry(ADMIN, {'userPassword': 'benchmark-password', 'sn': 'admin'})
+    for number in range(USERS):
+        email = f'user{number}@benchmark.local'
+        conn.strategy.add_entry(
+            f'cn={email},{DOMAIN_CONTROLLER}',
+            {'objectClass': ['account', 'extensibleObject'], 'uid': email, 'userPassword': 'crypted', 'memberUid': [1]},
+        )
+    return server
+
+
+def _run_logins(pool: LDAPConnectionPool) -> float:
+    """
+    Look up the password LOGINS times from THREADS threads, the same way ldap_auth does
+    :return: The number of seconds taken
+    """
+    def login(number):
+        with pool.connection() as conn:
+            conn.search(
+                search_base=DOMAIN_CONTROLLER,
+                search_filter=f'(&(uid=user{number % USERS}@benchmark.local))',
+                attributes=['userPassword'],
+            )
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(login, range(LOGINS)))
+    return time.perf_counter() - start
+
+
+@register
+def ldap_pool_concurrent_logins(file=None):
+    """
+    Compare concurrent login lookups through pools of different sizes. A pool of 1 behaves like the single shared
+    connection that was used before the pool.
+    """
+    server = _mock_server()
+
+    def factory():
+        # auto_bind doesn't bind mock connections
+        conn = _SlowConnection(server, user=ADMIN, password='benchmark-password', client_strategy=ldap3.MOCK_SYNC)
+        conn.bind()
+        return conn
+
+    rows = []
+    for size in (1, 2, 4, 8, 16):
+        pool = LDAPConnectionPool(factory, size, timeout=60, health_check_interval=60)
+        elapsed = _run_logins(pool)
+        stats = pool.stats()
+        pool.close()
+        rows.append((
+            size,
+            f'{LOGINS / elapsed:.1f}',
+            stats['average_wait_ms'],
+            min(stats['uses']),
+            max(stats['uses']),
+        ))
+
+    output_results(file, ('Pool size', 'Logins / s', 'Average wait (ms)', 'Min uses', 'Max uses'), rows)
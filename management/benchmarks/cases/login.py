@@ -0,0 +1,63 @@
+# stdlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+# local
+from membership.hashing import CryptPool, CryptPoolSaturated, hash_password, verify_password
+from membership.management.benchmarks.runner import output_results, register
+
+
+__all__ = [
+    'crypt_login_throughput',
+]
+
+LOGINS = 400
+THREADS = 8
+
+
+def _run_logins(crypted_password, pool):
+    """
+    Verify the password LOGINS times from THREADS threads, the same way a threaded gunicorn worker would
+    :return: The number of seconds taken and the number of logins rejected because the pool was saturated
+    """
+    def login(_):
+        try:
+            verify_password('benchmark-password', crypted_password, pool)
+            return 0
+        except CryptPoolSaturated:
+            return 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        rejected = sum(executor.map(login, range(LOGINS)))
+    return time.perf_counter() - start, rejected
+
+
+@register
+def crypt_login_throughput(file=None):
+    """
+    Compare login throughput with the crypt pool disabled and enabled
+    """
+    crypted_password = hash_password('benchmark-password', None)
+    cores = os.cpu_count() or 1
+    rows = []
+
+    elapsed, rejected = _run_logins(crypted_password, None)
+    rows.append(('disabled', 1, f'{LOGINS / elapsed:.1f}', f'{LOGINS / elapsed:.1f}', rejected))
+
+    for workers in sorted({1, max(cores // 2, 1), cores}):
+        # Allow every thread to queue so the numbers show throughput rather than rejections
+        pool = CryptPool(workers, THREADS, timeout=30)
+        # Start the processes before timing
+        verify_password('benchmark-password', crypted_password, pool)
+        elapsed, rejected = _run_logins(crypted_password, pool)
+        pool.shutdown()
+        rows.append((
+            f'{workers} workers',
+            workers,
+            f'{LOGINS / elapsed:.1f}',
+            f'{LOGINS / elapsed / workers:.1f}',
+            rejected,
+        ))
+
+    output_results(file, ('Crypt pool', 'Cores', 'Logins / s', 'Logins / s / core', 'Rejected'), rows)
@@ -0,0 +1,99 @@
+# stdlib
+import json
+import time
+import tracemalloc
+# libs
+from django.db import transaction
+# local
+from membership.management.benchmarks.cases._synthetic import clone
+from membership.management.benchmarks.runner import output_results, register, writes_data
+from membership.management.integrity.runner import file_or_stdout
+from membership.models import Address, Notification, User
+from membership.records import address_records, user_records
+from membership.serializers import AddressSerializer, UserSerializer
+
+
+__all__ = [
+    'list_serialization',
+]
+
+LIMITS = (100, 1000, 10000)
+
+
+def _model_path(objs, serializer, limit: int):
+    return serializer(instance=list(objs[:limit]), many=True).data
+
+
+def _fast_path(objs, serializer, builder, limit: int):
+    return serializer(instance=builder.records(builder.values(objs)[:limit]), many=True).data
+
+
+def _measure(func, limit: int):
+    """
+    Microseconds and bytes of peak memory per row to read and serialize `limit` rows, and the output
+    """
+    start = time.perf_counter()
+    data = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return 1e6 * elapsed / limit, peak / limit, data
+
+
+@register
+@writes_data
+def list_serialization(file=None):
+    """
+    Compare reading and serializing pages of Users and Addresses through model instances against the .values() records
+    in membership.records, per row, at each of LIMITS. Copies of the first User and Address, with the User's
+    Notifications, are created for the pages and rolled back afterwards.
+    """
+    user = User.objects.order_by('id').first()
+    if user is None:
+        with file_or_stdout(file) as fp:
+            fp.write('At least one User is needed to copy for the synthetic data\n')
+        return
+
+    rows = []
+    with transaction.atomic(using='membership'):
+        users = User.objects.bulk_create((clone(user) for _ in range(max(LIMITS))), batch_size=5000)
+        notifications = list(Notification.objects.filter(user=user))
+        Notification.objects.bulk_create(
+            (
+                Notification(external=n.external, transaction_type_id=n.transaction_type_id, user=clone)
+                for clone in users
+                for n in notifications
+            ),
+            batch_size=5000,
+        )
+        addresses = Address.objects.bulk_create((clone(user.address) for _ in range(max(LIMITS))), batch_size=5000)
+
+        cases = (
+            ('User', User.objects.filter(id__in=[u.pk for u in users]).order_by('id'), UserSerializer, user_records),
+            (
+                'Address',
+                Address.objects.filter(id__in=[a.pk for a in addresses]).order_by('id'),
+                AddressSerializer,
+                address_records,
+            ),
+        )
+        for name, objs, serializer, builder in cases:
+            for limit in LIMITS:
+                model_us, model_bytes, model_data = _measure(lambda: _model_path(objs, serializer, limit), limit)
+                fast_us, fast_bytes, fast_data = _measure(lambda: _fast_path(objs, serializer, builder, limit), limit)
+                identical = json.dumps(model_data, default=str) == json.dumps(fast_data, default=str)
+                rows.append((
+                    name,
+                    limit,
+                    f'{model_us:.1f}',
+                    f'{fast_us:.1f}',
+                    f'{model_bytes:.0f}',
+                    f'{fast_bytes:.0f}',
+                    'yes' if identical else 'NO',
+                ))
+        transaction.set_rollback(True, using='membership')
+
+    header = ('Serializer', 'Rows', 'Model µs/row', 'Fast µs/row', 'Model bytes/row', 'Fast bytes/row', 'Identical')
+    output_results(file, header, rows)
@@ -0,0 +1,77 @@
+# stdlib
+import statistics
+import time
+# libs
+from django.db import connections, transaction
+# local
+from membership.management.benchmarks.cases._synthetic import create_users, synthetic_email
+from membership.management.benchmarks.runner import output_results, register, writes_data
+from membership.management.integrity.runner import file_or_stdout
+from membership.models import User
+from membership.search import text_search
+
+
+__all__ = [
+    'type_ahead_search',
+]
+
+USERS = 1000000
+PAGE_SIZE = 10
+REPEATS = 5
+TRIGRAM_INDEXES = ('user_email_trgm', 'user_first_name_trgm', 'user_surname_trgm')
+
+
+def _time(q: str) -> float:
+    """
+    Median milliseconds to count the matches for `q` and read the best page of them, as the User list does
+    """
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        objs = text_search(User.objects.all(), q).values('id', 'first_name', 'surname', 'email')
+        objs.count()
+        list(objs.order_by('-search_rank', 'id')[:PAGE_SIZE])
+        timings.append(time.perf_counter() - start)
+    return 1000 * statistics.median(timings)
+
+
+@register
+@writes_data
+def type_ahead_search(file=None):
+    """
+    Time the `q` search of the User list for type-ahead prefixes of a synthetic User's name and email, over USERS
+    synthetic Users, with the trigram indexes and then without them. The synthetic Users are rolled back afterwards.
+    """
+    template = User.objects.order_by('id').first()
+    if template is None:
+        with file_or_stdout(file) as fp:
+            fp.write('At least one User is needed to copy for the synthetic data\n')
+        return
+
+    rows = []
+    with transaction.atomic(using='membership'):
+        create_users(template, USERS)
+        target = User.objects.filter(email=synthetic_email(USERS // 2)).values('email', 'surname').first()
+        queries = [
+            target['surname'][:3],
+            target['surname'][:5],
+            target['surname'],
+            target['email'][:6],
+        ]
+        indexed = [(q, text_search(User.objects.all(), q).count(), _time(q)) for q in queries]
+
+        with connections['membership'].cursor() as cursor:
+            for name in TRIGRAM_INDEXES:
+                cursor.execute(f'DROP INDEX "{name}"')
+        for q, matches, indexed_ms in indexed:
+            sequential_ms = _time(q)
+            rows.append((
+                q,
+                matches,
+                f'{indexed_ms:.1f}',
+                f'{sequential_ms:.1f}',
+                'yes' if indexed_ms < 10 else 'no',
+            ))
+        transaction.set_rollback(True, using='membership')
+
+    output_results(file, ('q', 'Matches', 'Indexed (ms)', 'No index (ms)', 'Under 10ms'), rows)
@@ -0,0 +1,63 @@
+# stdlib
+import datetime
+import time
+# libs
+import jwt
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+# local
+from membership.management.benchmarks.runner import output_results, register
+
+
+__all__ = [
+    'jwt_mint',
+]
+
+MINTS = 500
+
+
+def _pem(key) -> str:
+    return key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()).decode()
+
+
+def _mints_per_second(key, algorithm: str) -> float:
+    payload = {
+        'uid': 1,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    }
+    start = time.perf_counter()
+    for _ in range(MINTS):
+        jwt.encode(payload, key, algorithm=algorithm)
+    return MINTS / (time.perf_counter() - start)
+
+
+@register
+def jwt_mint(file=None):
+    """
+    Compare token mints per second when PyJWT parses a PEM string each time against the pre-parsed keys used by
+    membership.tokens, for each supported algorithm
+    """
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    ec_key = ec.generate_private_key(ec.SECP256R1(), default_backend())
+    cases = [
+        ('RS256', 'PEM string', _pem(rsa_key)),
+        ('RS256', 'pre-parsed', rsa_key),
+        ('ES256', 'PEM string', _pem(ec_key)),
+        ('ES256', 'pre-parsed', ec_key),
+    ]
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+        ed_key = ed25519.Ed25519PrivateKey.generate()
+        jwt.encode({}, ed_key, algorithm='EdDSA')
+    except (ImportError, NotImplementedError, jwt.PyJWTError):
+        # EdDSA needs PyJWT 2.0 or later
+        pass
+    else:
+        cases.append(('EdDSA', 'pre-parsed', ed_key))
+
+    rows = [
+        (algorithm, key_format, f'{_mints_per_second(key, algorithm):.1f}')
+        for algorithm, key_format, key in cases
+    ]
+    output_results(file, ('Algorithm', 'Key', 'Mints / s'), rows)
@@ -0,0 +1,87 @@
+# stdlib
+import statistics
+import time
+# libs
+from django.db import transaction
+# local
+from membership.management.benchmarks.cases._synthetic import clone
+from membership.management.benchmarks.runner import output_results, register, writes_data
+from membership.management.integrity.runner import file_or_stdout
+from membership.models import Address, AddressLink, User
+
+
+__all__ = [
+    'linked_address_filtering',
+]
+
+LINK_COUNTS = (1000, 10000, 100000)
+PAGE_SIZE = 50
+REPEATS = 5
+
+
+def _materialised(address_id: int):
+    """
+    The old way; read the linked ids into Python and send them back as an IN list
+    """
+    linked_address_ids = set(AddressLink.objects.filter(
+        address_id=address_id,
+    ).values_list(
+        'contra_address_id',
+        flat=True,
+    ))
+    addresses = Address.objects.filter(id__in=linked_address_ids).order_by('name')
+    users = User.objects.filter(address_id__in=linked_address_ids).order_by('surname')
+    return addresses, users
+
+
+def _subquery(address_id: int):
+    linked_address_ids = AddressLink.objects.linked_address_ids(address_id)
+    addresses = Address.objects.filter(id__in=linked_address_ids).order_by('name')
+    users = User.objects.filter(address_id__in=linked_address_ids).order_by('surname')
+    return addresses, users
+
+
+def _time(build, address_id: int) -> float:
+    """
+    Median milliseconds to count and read the first page of both lists, the same work the list views do
+    """
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for objs in build(address_id):
+            objs.count()
+            list(objs[:PAGE_SIZE])
+        timings.append(time.perf_counter() - start)
+    return 1000 * statistics.median(timings)
+
+
+@register
+@writes_data
+def linked_address_filtering(file=None):
+    """
+    Compare listing linked Addresses and Users by materialising the linked ids against filtering with a subquery, for
+    an Address with each of LINK_COUNTS links. The synthetic Addresses and links are rolled back afterwards.
+    """
+    template = Address.objects.order_by('id').first()
+    if template is None:
+        with file_or_stdout(file) as fp:
+            fp.write('At least one Address is needed to copy for the synthetic data\n')
+        return
+
+    rows = []
+    for links in LINK_COUNTS:
+        with transaction.atomic(using='membership'):
+            address = clone(template)
+            address.save()
+            contra_addresses = Address.objects.bulk_create((clone(template) for _ in range(links)), batch_size=5000)
+            AddressLink.objects.bulk_create(
+                (AddressLink(address=address, contra_address=contra) for contra in contra_addresses),
+                batch_size=5000,
+            )
+
+            materialised = _time(_materialised, address.pk)
+            subquery = _time(_subquery, address.pk)
+            rows.append((links, f'{materialised:.1f}', f'{subquery:.1f}', f'{materialised / subquery:.1f}x'))
+            transaction.set_rollback(True, using='membership')
+
+    output_results(file, ('Links', 'Materialised (ms)', 'Subquery (ms)', 'Speed up'), rows)
@@ -0,0 +1,87 @@
+# stdlib
+import importlib
+import os
+from datetime import datetime
+# local
+from membership.management.integrity.runner import file_or_stdout
+
+
+__all__ = [
+    'benchmarks',
+    'output_results',
+    'register',
+    'writes_data',
+]
+
+
+class _BenchmarkRunner:  # pragma: no cover
+
+    def __init__(self):
+        self._benchmarks = {}
+
+    def _import_benchmarks(self):
+        path_chunks = self.__module__.split('.')[:-1]
+
+        path_chunks.append('cases')
+        path_to_benchmarks = '/'.join(path_chunks)
+        benchmark_modules = os.listdir(path_to_benchmarks)
+
+        for module in benchmark_modules:
+            if module.endswith('.py') and not module.startswith('_'):
+                module_name = module[:-3]
+                importlib.import_module('.'.join([*path_chunks, module_name]))
+
+    def run(self, names=None, output_file=None, allow_writes=False):
+        self._import_benchmarks()
+        if not names:
+            names = sorted(self._benchmarks)
+        unknown = [name for name in names if name not in self._benchmarks]
+        if len(unknown) > 0:
+            raise KeyError(f'Unknown benchmarks: {", ".join(unknown)}')
+
+        with file_or_stdout(output_file) as fp:
+            fp.write('Beginning benchmarks\n{}\n'.format(datetime.utcnow()))
+
+        for name in names:
+            with file_or_stdout(output_file) as fp:
+                fp.write(f'\n{name}\n')
+                if getattr(self._benchmarks[name], 'writes_data', False) and not allow_writes:
+                    fp.write(
+                        'Skipped, as it writes synthetic data to the membership database and locks the tables it uses '
+                        'until it is rolled back. Run it against a copy of the database with --allow-writes.\n',
+                    )
+                    continue
+            self._benchmarks[name](output_file)
+
+        with file_or_stdout(output_file) as fp:
+            fp.write('\nBenchmarks completed\n{}\n'.format(datetime.utcnow()))
+
+    def register(self, func):
+        self._benchmarks[func.__name__] = func
+
+
+benchmarks = _BenchmarkRunner()
+
+
+def register(func):
+    benchmarks.register(func)
+    return func
+
+
+def writes_data(func):
+    """
+    Mark a benchmark that writes synthetic data to the membership database, so that it is only run when asked to
+    """
+    func.writes_data = True
+    return func
+
+
+def output_results(file, header, rows):
+    """
+    Write a table of results, one row per line, with the columns padded to line up
+    """
+    rows = [tuple(map(str, row)) for row in rows]
+    widths = [max(len(value) for value in column) for column in zip(header, *rows)]
+    with file_or_stdout(file) as fp:
+        for row in (header, *rows):
+            fp.write(' | '.join(value.rjust(width) for value, width in zip(row, widths)) + '\n')
@@ -0,0 +1,32 @@
+# libs
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    can_import_settings = True
+    help = (
+        'Run the benchmarks for performance sensitive parts of Membership'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='The names of the benchmarks to run. Runs every benchmark if none are given.',
+        )
+        parser.add_argument(
+            '--logfile',
+            action='store',
+        )
+        parser.add_argument(
+            '--allow-writes',
+            action='store_true',
+            help=(
+                'Also run the benchmarks that write synthetic data to the membership database. Only use this against '
+                'a copy of the production database.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        from membership.management.benchmarks.runner import benchmarks
+        benchmarks.run(options.get('names'), options.get('logfile'), options.get('allow_writes'))
@@ -0,0 +1,43 @@
+# stdlib
+import time
+# libs
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    can_import_settings = True
+    help = (
+        'Write the memberUid changes waiting in the LDAP outbox to LDAP'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the outbox until it is empty and exit, e.g. when run from cron.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.LDAP_OUTBOX_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.LDAP_OUTBOX_INTERVAL,
+            help='Seconds to wait before checking an empty outbox again.',
+        )
+
+    def handle(self, *args, **options):
+        from membership.ldap_outbox import drain
+        while True:
+            stats = drain(options['batch_size'])
+            if stats['rows'] > 0:
+                self.stdout.write(
+                    f'Wrote {stats["rows"]} outbox rows for {stats["emails"]} emails, {stats["failed"]} failed',
+                )
+            if stats['rows'] < options['batch_size']:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
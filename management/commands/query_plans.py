@@ -0,0 +1,39 @@
+# libs
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    can_import_settings = True
+    help = (
+        'Report the plans of the hot queries of Membership before and after a migration that changes indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--migration',
+            action='store',
+            default='0024_live_row_indexes',
+            help='The name, or a unique prefix of the name, of the migration to compare against. It must be applied.',
+        )
+        parser.add_argument(
+            '--no-seqscan',
+            action='store_true',
+            help='Explain the queries with sequential scans disabled, as a large table would be planned',
+        )
+        parser.add_argument(
+            '--logfile',
+            action='store',
+        )
+
+    def handle(self, *args, **options):
+        from membership.management.benchmarks.runner import output_results
+        from membership.management.integrity.runner import file_or_stdout
+        from membership.management.plans import plan_report
+        file = options.get('logfile')
+        rows = plan_report(options['migration'], not options['no_seqscan'])
+        if rows is None:
+            with file_or_stdout(file) as fp:
+                fp.write('At least one User is needed to build the queries for\n')
+            return
+        header = ('Query', 'Before', 'Before Cost', 'After', 'After Cost')
+        output_results(file, header, rows)
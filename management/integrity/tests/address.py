@@ -85,7 +85,8 @@ def address_links_have_reciprocals(file=None):
 @register
 def address_links_not_duplicated(file=None):
     """
-    Check if any Address Links are duplicated
+    Check if any Address Links are duplicated. Since migration 0025 the address_link_live constraint prevents it, so
+    this only finds any if the constraint has been dropped.
     """
     results = dict()
     duplicates = AddressLink.objects.values('address_id', 'contra_address_id') \
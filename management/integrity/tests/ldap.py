@@ -0,0 +1,173 @@
+"""
+Reconciliation of the memberUids in LDAP with the Users in the database
+
+Neither side is loaded into memory. LDAP is read with a paged search and, as it can't return entries in order, the
+(email, member_id) pairs are sorted in fixed size runs that are spilled to temporary files and merged back with
+heapq.merge. The database is read in the same order through a server-side cursor. The two sorted streams are then
+walked side by side, so memory use is bounded by the size of a run however many Users there are.
+"""
+# stdlib
+import heapq
+import tempfile
+from typing import IO, Iterator, List, Tuple
+# libs
+import ldap3
+from django.conf import settings
+from django.db import connections
+# local
+from membership.management.integrity.runner import register, output_errors
+from membership.utils import ldap_pool
+
+
+__all__ = [
+    'ldap_matches_users',
+]
+
+# Pairs sorted in memory at a time before being spilled to disk
+SORT_RUN_SIZE = 100000
+# Entries read from LDAP and rows read from the database per round trip
+PAGE_SIZE = 1000
+
+Pair = Tuple[str, int]
+
+
+def _read_run(run: IO[str]) -> Iterator[Pair]:
+    run.seek(0)
+    for line in run:
+        email, member_id = line.rstrip('\n').rsplit('\t', 1)
+        yield email, int(member_id)
+
+
+def _read_orphans(orphans: IO[str]) -> Iterator[Tuple[str, str]]:
+    orphans.seek(0)
+    for line in orphans:
+        yield tuple(line.rstrip('\n').rsplit('\t', 1))
+
+
+def _spill(pairs: List[Pair]) -> IO[str]:
+    pairs.sort()
+    run = tempfile.TemporaryFile('w+')
+    run.writelines(f'{email}\t{member_id}\n' for email, member_id in pairs)
+    return run
+
+
+def _ldap_pairs(runs: List[IO[str]], invalid: IO[str]) -> Iterator[Pair]:
+    """
+    Read every memberUid in LDAP and return them sorted by email and member id.
+    Entries without a valid memberUid are written to invalid as they can't be matched with a User.
+    :param runs: Collects the temporary files so that the caller can close them
+    """
+    pairs: List[Pair] = []
+    with ldap_pool.connection() as conn:
+        entries = conn.extend.standard.paged_search(
+            search_base=settings.LDAP_DOMAIN_CONTROLLER,
+            search_filter='(uid=*)',
+            search_scope=ldap3.SUBTREE,
+            attributes=['uid', 'memberUid'],
+            paged_size=PAGE_SIZE,
+            generator=True,
+        )
+        for entry in entries:
+            if entry.get('type') != 'searchResEntry':
+                continue
+            attributes = entry['attributes']
+            uid = attributes.get('uid')
+            email = (uid[0] if isinstance(uid, list) else uid).lower()
+            member_uids = attributes.get('memberUid') or []
+            if len(member_uids) == 0:
+                invalid.write(f'{email}\t(no memberUid)\n')
+            for member_uid in member_uids:
+                try:
+                    pairs.append((email, int(member_uid)))
+                except ValueError:
+                    invalid.write(f'{email}\t{member_uid}\n')
+                    continue
+                if len(pairs) >= SORT_RUN_SIZE:
+                    runs.append(_spill(pairs))
+                    pairs = []
+    if len(pairs) > 0:
+        runs.append(_spill(pairs))
+    return heapq.merge(*(_read_run(run) for run in runs))
+
+
+def _user_pairs(cursor) -> Iterator[Pair]:
+    """
+    Stream the email and member id of every User from a server-side cursor, in the same order as the LDAP pairs.
+    COLLATE "C" compares by code point, the same way Python compares strings.
+    """
+    cursor.execute("""
+        SELECT DISTINCT lower(email) COLLATE "C" AS email, member_id FROM "user"
+        WHERE deleted IS NULL
+        ORDER BY email, member_id
+    """)
+    while True:
+        rows = cursor.fetchmany(PAGE_SIZE)
+        if len(rows) == 0:
+            return
+        yield from rows
+
+
+def _unique(pairs: Iterator[Pair]) -> Iterator[Pair]:
+    previous = None
+    for pair in pairs:
+        if pair != previous:
+            yield pair
+            previous = pair
+
+
+@register
+def ldap_matches_users(file=None):
+    """
+    Check that every User has its member id in the memberUids of the LDAP entry for its email, and that every memberUid
+    in LDAP belongs to a User
+    """
+    results = dict()
+    inspected = 0
+    runs: List[IO[str]] = []
+    # Orphans are written to disk as they are found, in case there are a lot of them
+    ldap_orphans = tempfile.TemporaryFile('w+')
+    user_orphans = tempfile.TemporaryFile('w+')
+    ldap_orphan_count = user_orphan_count = 0
+    membership_db = connections['membership']
+    try:
+        ldap_pairs = _unique(_ldap_pairs(runs, ldap_orphans))
+        ldap_orphans.seek(0)
+        ldap_orphan_count = sum(1 for _ in ldap_orphans)
+
+        with membership_db.chunked_cursor() as cursor:
+            user_pairs = _user_pairs(cursor)
+            ldap_pair = next(ldap_pairs, None)
+            user_pair = next(user_pairs, None)
+            while ldap_pair is not None or user_pair is not None:
+                inspected += 1
+                if user_pair is None or (ldap_pair is not None and ldap_pair < user_pair):
+                    ldap_orphans.write(f'{ldap_pair[0]}\t{ldap_pair[1]}\n')
+                    ldap_orphan_count += 1
+                    ldap_pair = next(ldap_pairs, None)
+                elif ldap_pair is None or user_pair < ldap_pair:
+                    user_orphans.write(f'{user_pair[0]}\t{user_pair[1]}\n')
+                    user_orphan_count += 1
+                    user_pair = next(user_pairs, None)
+                else:
+                    ldap_pair = next(ldap_pairs, None)
+                    user_pair = next(user_pairs, None)
+
+        results['records_inspected'] = inspected
+        results['errors_found'] = ldap_orphan_count + user_orphan_count
+        if ldap_orphan_count > 0:
+            error_header = (
+                'The following memberUids in LDAP do not belong to a User:\n'
+                'Email | Member ID\n'
+            )
+            output_errors(file, error_header, _read_orphans(ldap_orphans))
+        if user_orphan_count > 0:
+            error_header = (
+                'The following Users are missing their memberUid in LDAP:\n'
+                'Email | Member ID\n'
+            )
+            output_errors(file, error_header, _read_orphans(user_orphans))
+    finally:
+        for temporary in (*runs, ldap_orphans, user_orphans):
+            temporary.close()
+
+    return results
@@ -0,0 +1,45 @@
+# libs
+from django.db import connections, transaction
+# local
+from membership.management.integrity.runner import register, output_errors
+from membership.management.plans import explain, PINNED_PLANS, plan_indexes
+from membership.models import User
+
+
+__all__ = [
+    'query_plans',
+]
+
+
+@register
+def query_plans(file=None):
+    """
+    Check that each of the PINNED_PLANS is served by the indexes designed for it
+    """
+    results = dict()
+    user = User.objects.order_by('id').first()
+    if user is None:
+        results['records_inspected'] = 0
+        return results
+
+    invalid_records = []
+    with transaction.atomic(using='membership'):
+        with connections['membership'].cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for pinned in PINNED_PLANS:
+            used = plan_indexes(explain(pinned.query(user)))
+            missing = [index for index in pinned.indexes if index not in used]
+            if len(missing) > 0:
+                invalid_records.append((pinned.name, ' '.join(missing), ' '.join(sorted(used)) or '-'))
+        transaction.set_rollback(True, using='membership')
+
+    results['records_inspected'] = len(PINNED_PLANS)
+    results['errors_found'] = len(invalid_records)
+    if len(invalid_records) > 0:
+        error_header = (
+            'The following queries are not served by the indexes designed for them:\n'
+            'Query | Missing Indexes | Indexes Used\n'
+        )
+        output_errors(file, error_header, invalid_records)
+
+    return results
@@ -0,0 +1,129 @@
+"""
+Counts of the LDAP operations sent by the writes that were changed to send as few as possible
+
+Each check runs the writes against synthetic data and compares the number of operations sent with the number they were
+designed for, so a change that adds round trips is reported as an error. The writes are sent to an in-memory ldap3 mock
+instead of the LDAP server. The queries taken to link a new Address are counted by the new_address_links benchmark,
+as that writes to the database.
+"""
+# stdlib
+from typing import Callable, List, NamedTuple
+# libs
+import ldap3
+# local
+from membership.ldap_pool import LDAPConnectionPool
+from membership.management.integrity.runner import register, output_errors
+from membership.utils import LDAPResult, ldap_remove_member, ldap_set_password, ldap_upsert_member
+
+
+__all__ = [
+    'ldap_round_trips',
+]
+
+EMAIL = 'integrity.round.trips@example.com'
+OTHER_EMAIL = 'integrity.round.trips.other@example.com'
+# Already hashed, so that the checks don't need the crypt pool
+CRYPT_PASSWORD = '{CRYPT}$6$integrity$round.trips'
+
+
+class LDAPCase(NamedTuple):
+    """
+    An LDAP write, the action it should take and the number of operations it should send, in order
+    """
+    name: str
+    write: Callable[[LDAPConnectionPool], LDAPResult]
+    action: str
+    operations: int
+
+
+LDAP_CASES: List[LDAPCase] = [
+    LDAPCase(
+        'upsert_new_email',
+        lambda pool: ldap_upsert_member(EMAIL, 1, crypt_password=CRYPT_PASSWORD, pool=pool),
+        'created',
+        2,
+    ),
+    LDAPCase(
+        'upsert_existing_email',
+        lambda pool: ldap_upsert_member(EMAIL, 2, crypt_password=CRYPT_PASSWORD, pool=pool),
+        'member_added',
+        1,
+    ),
+    LDAPCase(
+        'upsert_existing_email_write_behind',
+        lambda pool: ldap_upsert_member(EMAIL, 3, add_member=False, crypt_password=CRYPT_PASSWORD, pool=pool),
+        'exists',
+        1,
+    ),
+    LDAPCase(
+        'upsert_new_email_without_password',
+        lambda pool: ldap_upsert_member(OTHER_EMAIL, 1, pool=pool),
+        'not_found',
+        1,
+    ),
+    LDAPCase(
+        'set_password',
+        lambda pool: ldap_set_password(EMAIL, 1, CRYPT_PASSWORD, pool=pool),
+        'password_updated',
+        1,
+    ),
+    LDAPCase(
+        'set_password_new_email',
+        lambda pool: ldap_set_password(OTHER_EMAIL, 1, CRYPT_PASSWORD, pool=pool),
+        'created',
+        2,
+    ),
+    LDAPCase(
+        'remove_member',
+        lambda pool: ldap_remove_member(EMAIL, 2, False, pool=pool),
+        'member_removed',
+        1,
+    ),
+    LDAPCase(
+        'remove_entry',
+        lambda pool: ldap_remove_member(EMAIL, 1, True, pool=pool),
+        'deleted',
+        1,
+    ),
+]
+
+
+@register
+def ldap_round_trips(file=None):
+    """
+    Check that each of the LDAP_CASES takes the expected action with the expected number of LDAP operations
+    """
+    results = dict()
+    opened: List[ldap3.Connection] = []
+    server = ldap3.Server('membership_round_trips', get_info=ldap3.NONE)
+
+    def factory() -> ldap3.Connection:
+        conn = ldap3.Connection(server, client_strategy=ldap3.MOCK_SYNC, collect_usage=True)
+        conn.open()
+        conn.bind()
+        opened.append(conn)
+        return conn
+
+    def operations() -> int:
+        return sum(conn.usage.operations - conn.usage.bind_operations for conn in opened)
+
+    pool = LDAPConnectionPool(factory, 1, 1, float('inf'))
+    invalid_records = []
+    for case in LDAP_CASES:
+        before = operations()
+        result = case.write(pool)
+        sent = operations() - before
+        if result.action != case.action or sent != case.operations:
+            invalid_records.append((case.name, case.action, result.action, case.operations, sent))
+    pool.close()
+
+    results['records_inspected'] = len(LDAP_CASES)
+    results['errors_found'] = len(invalid_records)
+    if len(invalid_records) > 0:
+        error_header = (
+            'The following LDAP writes did not send the expected number of operations:\n'
+            'Write | Expected Action | Action | Expected Operations | Operations\n'
+        )
+        output_errors(file, error_header, invalid_records)
+
+    return results
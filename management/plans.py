@@ -0,0 +1,213 @@
+"""
+Query plans pinned to the indexes designed for them
+
+Each PinnedPlan is one of the hot queries of the service, built for a sample User, and the indexes it is expected to be
+served by. They are checked by the `query_plans` integrity test so that a change to the indexes or the queries that
+stops the database using them is noticed.
+
+On a small or freshly loaded database the planner would rather read a whole table than use any index, so the plans are
+checked with sequential scans disabled. That pins which of the indexes is chosen, not whether one is.
+
+The `query_plans` command reports the plans before and after a migration that changes indexes, by explaining each
+query, reversing the migration inside a transaction, explaining them again and rolling back. Reversing a migration
+locks the tables it changes until the rollback, including while any indexes it removed are rebuilt, so it should be run
+against a copy of the production database.
+"""
+# stdlib
+import json
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+# libs
+from django.db import connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import QuerySet
+# local
+from membership.models import (
+    Address,
+    AddressLink,
+    Department,
+    Member,
+    MemberLink,
+    Profile,
+    Team,
+    Territory,
+    TransactionType,
+    User,
+)
+from membership.visibility import notified_user_ids, notified_users, visible_users
+
+
+__all__ = [
+    'explain',
+    'PINNED_PLANS',
+    'PinnedPlan',
+    'plan_indexes',
+    'plan_report',
+]
+
+
+class PinnedPlan(NamedTuple):
+    """
+    A query and the indexes it should be served by
+    """
+    name: str
+    # Builds the query for a sample User
+    query: Callable[[User], QuerySet]
+    indexes: Tuple[str, ...]
+
+
+def explain(objs: QuerySet) -> Dict[str, Any]:
+    """
+    The plan of a query as Postgres would run it, without running it
+    """
+    sql, params = objs.query.sql_with_params()
+    with connections[objs.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def _nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from _nodes(child)
+
+
+def plan_indexes(plan: Dict[str, Any]) -> Set[str]:
+    """
+    The names of the indexes scanned anywhere in a plan
+    """
+    return {node['Index Name'] for node in _nodes(plan) if 'Index Name' in node}
+
+
+def _transaction_type_id() -> int:
+    # Any Transaction Type will do for the Notification queries, the plan does not depend on which
+    return TransactionType.objects.order_by('id').values_list('id', flat=True).first() or 0
+
+
+PINNED_PLANS: List[PinnedPlan] = [
+    # The User list of a User who is not the superuser, with the visibility filter the view sends
+    PinnedPlan(
+        'user_list_visible',
+        lambda user: User.objects.filter(visible_users(user.address_id, user.member_id)),
+        ('address_link_live',),
+    ),
+    # The receivers of the Notifications of a Transaction Type for the requesting User's Address, and the Notification
+    # list built from them
+    PinnedPlan(
+        'notification_user_ids',
+        lambda user: notified_user_ids(user.address_id, user.member_id, _transaction_type_id()),
+        ('user_live_member_global',),
+    ),
+    PinnedPlan(
+        'notification_list',
+        lambda user: User.objects.filter(notified_users(
+            user.address_id,
+            user.member_id,
+            _transaction_type_id(),
+            user.member.self_managed,
+        )),
+        ('user_live_member_global',),
+    ),
+    # The Addresses linked to the requesting User's, used to filter the User and Address lists
+    PinnedPlan(
+        'address_link_linked_address_ids',
+        lambda user: AddressLink.objects.linked_address_ids(user.address_id),
+        ('address_link_live',),
+    ),
+    # The link between two Addresses, read for the details of a User or an Address Link
+    PinnedPlan(
+        'address_link_pair',
+        lambda user: AddressLink.objects.filter(address_id=user.address_id, contra_address_id=user.address_id),
+        ('address_link_live',),
+    ),
+    # The first page of each of the lists that are limited to the requesting User's Member and ordered by name
+    *(
+        PinnedPlan(
+            f'{model._meta.db_table}_member_list',
+            lambda user, model=model: model.objects.filter(member_id=user.member_id).order_by('name')[:50],
+            (index,),
+        )
+        for model, index in (
+            (Address, 'address_live_member'),
+            (Department, 'department_live_member'),
+            (Profile, 'profile_live_member'),
+            (Team, 'team_live_member'),
+            (Territory, 'territory_live_member'),
+        )
+    ),
+    # The Members linked to the requesting User's
+    PinnedPlan(
+        'member_link_list',
+        lambda user: MemberLink.objects.filter(member_id=user.member_id),
+        ('member_link_live',),
+    ),
+    # The first page of the lists of every record, ordered by name
+    PinnedPlan(
+        'member_list',
+        lambda user: Member.objects.order_by('name')[:50],
+        ('member_live_name',),
+    ),
+    PinnedPlan(
+        'transaction_type_list',
+        lambda user: TransactionType.objects.order_by('name')[:50],
+        ('transaction_type_name',),
+    ),
+]
+
+
+def _scans(plan: Dict[str, Any], table: str) -> str:
+    """
+    How a plan reads a table; the type of each scan of it, with the indexes used
+    """
+    scans = []
+    for node in _nodes(plan):
+        if node.get('Relation Name') != table:
+            continue
+        indexes = sorted(plan_indexes(node))
+        scans.append(f'{node["Node Type"]} ({", ".join(indexes)})' if len(indexes) > 0 else node['Node Type'])
+    return '; '.join(scans) or '-'
+
+
+def _explain_all(user: User) -> Dict[str, Dict[str, Any]]:
+    return {pinned.name: explain(pinned.query(user)) for pinned in PINNED_PLANS}
+
+
+def plan_report(migration: str, seqscan: bool = True) -> Optional[List[Tuple[str, ...]]]:
+    """
+    Compare the plans of the PINNED_PLANS with the database as it is and as it was before a migration
+    :param migration: The name, or a unique prefix of the name, of an applied migration of this app
+    :param seqscan: Set to False to explain the queries with sequential scans disabled
+    :return: A row for each query, with how its table is read and the total estimated cost before and after, or None
+             if there is no User to build the queries for
+    """
+    user = User.objects.order_by('id').first()
+    if user is None:
+        return None
+
+    connection = connections['membership']
+    loader = MigrationLoader(connection)
+    target = loader.get_migration_by_prefix('membership', migration)
+    rows = []
+    with transaction.atomic(using='membership'):
+        if not seqscan:
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        after = _explain_all(user)
+        state = loader.project_state(('membership', target.name), at_end=False)
+        with connection.schema_editor() as schema_editor:
+            target.unapply(state, schema_editor)
+        before = _explain_all(user)
+        transaction.set_rollback(True, using='membership')
+
+    for pinned in PINNED_PLANS:
+        table = pinned.query(user).model._meta.db_table
+        rows.append((
+            pinned.name,
+            _scans(before[pinned.name], table),
+            f'{before[pinned.name]["Total Cost"]:.1f}',
+            _scans(after[pinned.name], table),
+            f'{after[pinned.name]["Total Cost"]:.1f}',
+        ))
+    return rows
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0018_address_link_markup_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='otp_secret',
+            field=models.TextField(null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.13 on 2026-10-17 10:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0019_user_otp_secret'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LDAPOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(
+                    choices=[
+                        ('add', 'Add the Member to the LDAP entry for the email'),
+                        ('remove', 'Remove the Member from the LDAP entry for the email'),
+                    ],
+                    max_length=6,
+                )),
+                ('attempts', models.IntegerField(default=0)),
+                ('completed', models.DateTimeField(null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('email', models.CharField(max_length=255)),
+                ('last_error', models.TextField(null=True)),
+                ('member_id', models.IntegerField()),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'ldap_outbox',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ldapoutbox',
+            index=models.Index(
+                condition=models.Q(completed__isnull=True),
+                fields=['next_attempt', 'id'],
+                name='ldap_outbox_pending',
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.13 on 2026-10-17 11:00
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram indexes for the `q` search of the User and Address lists. They index UPPER(column) to match the SQL of
+# `icontains`, which Django 2.2 cannot declare in Meta.indexes
+TRIGRAM_INDEXES = (
+    ('address_address1_trgm', 'address', 'address1'),
+    ('address_city_trgm', 'address', 'city'),
+    ('address_name_trgm', 'address', 'name'),
+    ('user_email_trgm', 'user', 'email'),
+    ('user_first_name_trgm', 'user', 'first_name'),
+    ('user_surname_trgm', 'user', 'surname'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0020_ldap_outbox'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        *(
+            migrations.RunSQL(
+                f'CREATE INDEX "{name}" ON "{table}" USING gin ((UPPER("{column}"::text)) gin_trgm_ops);',
+                reverse_sql=f'DROP INDEX "{name}";',
+            )
+            for name, table, column in TRIGRAM_INDEXES
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.13 on 2026-10-17 12:00
+
+from django.db import migrations
+
+# Indexes for looking Users up by email ignoring case, with User.objects.with_email. Django 2.2 cannot declare
+# expression indexes in Meta.indexes
+EMAIL_INDEXES = (
+    ('user_email_lower', 'LOWER("email")'),
+    ('user_member_email_lower', '"member_id", LOWER("email")'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0021_trigram_search'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX "{name}" ON "user" ({columns});',
+            reverse_sql=f'DROP INDEX "{name}";',
+        )
+        for name, columns in EMAIL_INDEXES
+    ]
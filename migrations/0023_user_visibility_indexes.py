@@ -0,0 +1,65 @@
+# Generated by Django 2.2.13 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0022_user_email_lower'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_administrator',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='email_validated',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_global_active',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_global_user',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_is_private',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_robot',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(
+                condition=models.Q(administrator=True, deleted__isnull=True),
+                fields=['member'],
+                name='user_live_member_admin',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True, global_active=True),
+                fields=['member'],
+                name='user_live_member_global',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True, is_private=False),
+                fields=['member', 'expiry_date'],
+                name='user_live_member_public',
+            ),
+        ),
+    ]
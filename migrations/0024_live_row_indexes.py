@@ -0,0 +1,177 @@
+# Generated by Django 2.2.13 on 2026-10-17 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0023_user_visibility_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='address',
+            name='address_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='address',
+            name='address_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='department',
+            name='department_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='department',
+            name='department_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='department',
+            name='department_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='member',
+            name='member_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='member',
+            name='member_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='member',
+            name='member_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='memberlink',
+            name='member_link_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='memberlink',
+            name='member_link_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='profile_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='team',
+            name='team_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='team',
+            name='team_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='team',
+            name='team_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='territory',
+            name='territory_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='territory',
+            name='territory_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='territory',
+            name='territory_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='transactiontype',
+            name='transaction_type_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='transactiontype',
+            name='transaction_type_deleted',
+        ),
+        migrations.RemoveIndex(
+            model_name='transactiontype',
+            name='transaction_type_name',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_deleted',
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['member', 'name'],
+                name='address_live_member',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='addresslink',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['address', 'contra_address'],
+                name='address_link_live',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='department',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['member', 'name'],
+                name='department_live_member',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['name'],
+                name='member_live_name',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='memberlink',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['member', 'contra_member'],
+                name='member_link_live',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['member', 'name'],
+                name='profile_live_member',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['member', 'name'],
+                name='team_live_member',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='territory',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['member', 'name'],
+                name='territory_live_member',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='transactiontype',
+            index=models.Index(
+                condition=models.Q(deleted__isnull=True),
+                fields=['name'],
+                name='transaction_type_live_name',
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.13 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+# Soft delete all but the oldest of each set of live links between the same two Addresses, so that the constraint can
+# be added. The deleted rows are not restored when reversing.
+SOFT_DELETE_DUPLICATES = """
+    UPDATE address_link SET deleted = NOW(), updated = NOW() WHERE id IN (
+        SELECT id FROM (
+            SELECT
+                id,
+                ROW_NUMBER() OVER (PARTITION BY address_id, contra_address_id ORDER BY id) AS position
+            FROM address_link
+            WHERE deleted IS NULL
+        ) AS links
+        WHERE position > 1
+    );
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0024_live_row_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SOFT_DELETE_DUPLICATES, reverse_sql=migrations.RunSQL.noop),
+        migrations.RemoveIndex(
+            model_name='addresslink',
+            name='address_link_live',
+        ),
+        migrations.AddConstraint(
+            model_name='addresslink',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(deleted__isnull=True),
+                fields=('address', 'contra_address'),
+                name='address_link_live',
+            ),
+        ),
+    ]
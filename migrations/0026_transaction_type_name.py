@@ -0,0 +1,21 @@
+# Generated by Django 2.2.13 on 2026-10-17 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membership', '0025_address_link_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transactiontype',
+            name='transaction_type_live_name',
+        ),
+        migrations.AddIndex(
+            model_name='transactiontype',
+            index=models.Index(fields=['name'], name='transaction_type_name'),
+        ),
+    ]
@@ -7,6 +7,7 @@ from .department import Department
 from .email_confirmation import EmailConfirmation
 from .integrity_test import IntegrityTest
 from .language import Language
+from .ldap_outbox import LDAPOutbox
 from .member import Member
 from .member_link import MemberLink
 from .notification import Notification
@@ -47,6 +48,9 @@ __all__ = [
     # Language
     'Language',
 
+    # LDAP Outbox
+    'LDAPOutbox',
+
     # Member
     'Member',
 
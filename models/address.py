@@ -2,6 +2,7 @@
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.contrib.postgres.fields import JSONField
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 # local
 # import models directly since importing from membership.models breaks stuff
@@ -68,17 +69,18 @@ class Address(BaseModel):
         Metadata about the model for Django to use in whatever way it sees fit
         """
         db_table = 'address'
+        # The trigram indexes for the `q` search are created in migration 0021
         indexes = [
             # Indexing everything in the `search_fields` map in List Controller
-            models.Index(fields=['id'], name='address_id'),
             models.Index(fields=['address1'], name='address_address1'),
             models.Index(fields=['address2'], name='address_address2'),
             models.Index(fields=['address3'], name='address_address3'),
             models.Index(fields=['city'], name='address_city'),
             models.Index(fields=['cloud_region'], name='address_cloud_region'),
-            models.Index(fields=['deleted'], name='address_deleted'),
             models.Index(fields=['name'], name='address_name'),
             models.Index(fields=['postcode'], name='address_postcode'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(fields=['member', 'name'], name='address_live_member', condition=Q(deleted__isnull=True)),
         ]
 
     def get_absolute_url(self) -> str:
@@ -1,6 +1,9 @@
+# stdlib
+from typing import Any, Iterable, List, Tuple
 # libs
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 # local
 from .address import Address
@@ -35,6 +38,58 @@ class AddressLinkManager(BaseManager):
             'contra_address__subdivision__country',
         )
 
+    def linked_address_ids(self, address_id: int) -> models.QuerySet:
+        """
+        The ids of the Addresses linked to the given Address, as a subquery.
+        Filter on it with `__in` so that the database does the join, rather than reading every id into Python and
+        sending them back in an IN list.
+        :param address_id: The id of the Address to find the links of
+        :return: A values QuerySet of contra_address_id
+        """
+        return self.filter(address_id=address_id).values('contra_address_id')
+
+    def create_links(self, pairs: Iterable[Tuple[int, int]], **fields: Any):
+        """
+        Create the links between pairs of Addresses that are not linked yet, in one INSERT. Pairs that are already
+        linked are left as they are, by ON CONFLICT DO NOTHING against the address_link_live constraint.
+        :param pairs: The (address_id, contra_address_id) of each link
+        :param fields: Values for the other fields of the new links, such as `reference`
+        """
+        self.bulk_create(
+            (
+                self.model(address_id=address_id, contra_address_id=contra_address_id, **fields)
+                for address_id, contra_address_id in pairs
+            ),
+            ignore_conflicts=True,
+        )
+
+    def link_new_address(self, address: Address, user_address_id: int) -> List['AddressLink']:
+        """
+        Create the links for a newly created Address in one INSERT, however many Addresses there are in its Member;
+        - from the Address to itself
+        - between it and the Address of the User that created it, both ways
+        - between it and every other Address in its Member, both ways
+        :param address: The new Address
+        :param user_address_id: The id of the Address of the User that created it
+        :return: The new links with their ids, starting with the link from the User's Address to the new one
+        """
+        address_ids = Address.objects.filter(
+            member_id=address.member_id,
+        ).exclude(
+            pk__in=[address.pk, user_address_id],
+        ).values_list('id', flat=True)
+        links = [
+            self.model(address_id=user_address_id, contra_address=address),
+            self.model(address=address, contra_address=address, reference='Self Link'),
+            self.model(address=address, contra_address_id=user_address_id),
+        ]
+        for address_id in address_ids:
+            links.append(self.model(address_id=address_id, contra_address=address))
+            links.append(self.model(address=address, contra_address_id=address_id))
+        # The new Address has no links yet, so there are no conflicts, and Postgres returns the ids of the new rows
+        self.bulk_create(links)
+        return links
+
 
 class AddressLink(BaseModel):
     """
@@ -66,6 +121,16 @@ class AddressLink(BaseModel):
 
     class Meta:
         db_table = 'address_link'
+        constraints = [
+            # There is at most one live link from one Address to another, so links can be created with
+            # create_links without checking for them first. Links are read by the requesting Address, and
+            # linked_address_ids is an index only scan of this constraint's index
+            models.UniqueConstraint(
+                fields=['address', 'contra_address'],
+                name='address_link_live',
+                condition=Q(deleted__isnull=True),
+            ),
+        ]
 
     def get_absolute_url(self) -> str:
         """
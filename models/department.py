@@ -2,6 +2,7 @@
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.urls import reverse
 from django.db import models
+from django.db.models import Q
 # local
 from .member import Member
 
@@ -38,9 +39,8 @@ class Department(BaseModel):
     class Meta:
         db_table = 'department'
         indexes = [
-            models.Index(fields=['id'], name='department_id'),
-            models.Index(fields=['deleted'], name='department_deleted'),
-            models.Index(fields=['name'], name='department_name'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(fields=['member', 'name'], name='department_live_member', condition=Q(deleted__isnull=True)),
         ]
 
     def get_absolute_url(self):
@@ -0,0 +1,42 @@
+# libs
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+__all__ = [
+    'LDAPOutbox',
+]
+
+
+class LDAPOutbox(models.Model):
+    """
+    A memberUid change that has been committed to the database and still has to be written to LDAP.
+    Rows are written in the same transaction as the User they belong to, and drained by the ldap_outbox command.
+    """
+    ADD = 'add'
+    REMOVE = 'remove'
+    ACTIONS = (
+        (ADD, 'Add the Member to the LDAP entry for the email'),
+        (REMOVE, 'Remove the Member from the LDAP entry for the email'),
+    )
+
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    attempts = models.IntegerField(default=0)
+    completed = models.DateTimeField(null=True)
+    created = models.DateTimeField(auto_now_add=True)
+    email = models.CharField(max_length=255)
+    last_error = models.TextField(null=True)
+    member_id = models.IntegerField()
+    next_attempt = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'ldap_outbox'
+        indexes = [
+            # Only rows that are still to be written are ever searched for
+            models.Index(
+                fields=['next_attempt', 'id'],
+                name='ldap_outbox_pending',
+                condition=Q(completed__isnull=True),
+            ),
+        ]
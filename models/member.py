@@ -1,6 +1,7 @@
 # libs
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 # local
 from .currency import Currency
@@ -44,9 +45,8 @@ class Member(BaseModel):
         db_table = 'member'
         indexes = [
             models.Index(fields=['api_key'], name='member_api_key'),
-            models.Index(fields=['id'], name='member_id'),
-            models.Index(fields=['deleted'], name='member_deleted'),
-            models.Index(fields=['name'], name='member_name'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(fields=['name'], name='member_live_name', condition=Q(deleted__isnull=True)),
         ]
 
     def get_absolute_url(self) -> str:
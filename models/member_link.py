@@ -2,6 +2,7 @@
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.urls import reverse
 from django.db import models
+from django.db.models import Q
 # local
 from .member import Member
 
@@ -41,8 +42,12 @@ class MemberLink(BaseModel):
     class Meta:
         db_table = 'member_link'
         indexes = [
-            models.Index(fields=['id'], name='member_link_id'),
-            models.Index(fields=['deleted'], name='member_link_deleted'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(
+                fields=['member', 'contra_member'],
+                name='member_link_live',
+                condition=Q(deleted__isnull=True),
+            ),
         ]
 
     def get_absolute_url(self):
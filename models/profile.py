@@ -1,6 +1,7 @@
 # libs
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 # local
 from .member import Member
@@ -42,9 +43,8 @@ class Profile(BaseModel):
         """
         db_table = 'profile'
         indexes = [
-            models.Index(fields=['id'], name='profile_id'),
-            models.Index(fields=['deleted'], name='profile_deleted'),
-            models.Index(fields=['name'], name='profile_name'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(fields=['member', 'name'], name='profile_live_member', condition=Q(deleted__isnull=True)),
         ]
 
     def get_absolute_url(self) -> str:
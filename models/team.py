@@ -1,6 +1,7 @@
 # libs
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 # local
 from .member import Member
@@ -65,9 +66,8 @@ class Team(BaseModel):
     class Meta:
         db_table = 'team'
         indexes = [
-            models.Index(fields=['id'], name='team_id'),
-            models.Index(fields=['deleted'], name='team_deleted'),
-            models.Index(fields=['name'], name='team_name'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(fields=['member', 'name'], name='team_live_member', condition=Q(deleted__isnull=True)),
         ]
 
     def get_absolute_url(self) -> str:
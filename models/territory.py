@@ -2,6 +2,7 @@
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.urls import reverse
 from django.db import models
+from django.db.models import Q
 # local
 from .member import Member
 
@@ -34,9 +35,8 @@ class Territory(BaseModel):
     class Meta:
         db_table = 'territory'
         indexes = [
-            models.Index(fields=['id'], name='territory_id'),
-            models.Index(fields=['deleted'], name='territory_deleted'),
-            models.Index(fields=['name'], name='territory_name'),
+            # Partial indexes on live rows, as every query through the manager filters out deleted ones
+            models.Index(fields=['member', 'name'], name='territory_live_member', condition=Q(deleted__isnull=True)),
         ]
 
     def get_absolute_url(self) -> str:
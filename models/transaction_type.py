@@ -26,8 +26,7 @@ class TransactionType(BaseModel):
 
         db_table = 'transaction_type'
         indexes = [
-            models.Index(fields=['id'], name='transaction_type_id'),
-            models.Index(fields=['deleted'], name='transaction_type_deleted'),
+            # Not partial like the other live row indexes, as deleted Transaction Types are not filtered out
             models.Index(fields=['name'], name='transaction_type_name'),
         ]
 
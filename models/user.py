@@ -4,6 +4,8 @@ from typing import List
 from cloudcix_rest.models import BaseManager, BaseModel
 from django.contrib.postgres.fields import JSONField
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.urls import reverse
 # local
 from .address import Address
@@ -53,6 +55,16 @@ class UserManager(BaseManager):
             'teams',
         )
 
+    def with_email(self, email: str) -> models.QuerySet:
+        """
+        The Users with the given email, ignoring case.
+        Compares LOWER(email) so that the user_email_lower and user_member_email_lower indexes are used, where
+        `email__iexact` compiles to UPPER(email) and can only be answered by reading the whole table.
+        :param email: The email to look for
+        :return: A QuerySet of the Users with the email, which can be filtered further, e.g. by Member
+        """
+        return self.annotate(email_lower=Lower('email')).filter(email_lower=email.lower())
+
 
 class User(BaseModel):
     """
@@ -82,27 +94,39 @@ class User(BaseModel):
     timezone = models.CharField(max_length=50)
     otp = models.BooleanField(default=False)
     first_otp = models.IntegerField(null=True)
+    # Encrypted TOTP secret, used when OTP codes are verified locally. Never serialized
+    otp_secret = models.TextField(null=True)
     email_validated = models.BooleanField(default=False)
     objects = UserManager()
 
     class Meta:
         db_table = 'user'
+        # The trigram indexes for the `q` search and the LOWER(email) indexes are created in migrations 0021 and 0022
         indexes = [
-            models.Index(fields=['id'], name='user_id'),
-            models.Index(fields=['administrator'], name='user_administrator'),
-            models.Index(fields=['deleted'], name='user_deleted'),
             models.Index(fields=['email'], name='user_email'),
-            models.Index(fields=['email_validated'], name='email_validated'),
             models.Index(fields=['expiry_date'], name='user_expiry_date'),
             models.Index(fields=['first_name'], name='user_first_name'),
-            models.Index(fields=['global_active'], name='user_global_active'),
-            models.Index(fields=['global_user'], name='user_global_user'),
-            models.Index(fields=['is_private'], name='user_is_private'),
             models.Index(fields=['job_title'], name='user_job_title'),
             models.Index(fields=['last_login'], name='user_last_login'),
-            models.Index(fields=['robot'], name='user_robot'),
             models.Index(fields=['start_date'], name='user_start_date'),
             models.Index(fields=['surname'], name='user_surname'),
+            # Partial indexes on live Users for the visibility filters of the User and Notification lists. The
+            # booleans are in the conditions rather than the columns, as on their own they are too unselective to use
+            models.Index(
+                fields=['member'],
+                name='user_live_member_admin',
+                condition=Q(administrator=True, deleted__isnull=True),
+            ),
+            models.Index(
+                fields=['member'],
+                name='user_live_member_global',
+                condition=Q(deleted__isnull=True, global_active=True),
+            ),
+            models.Index(
+                fields=['member', 'expiry_date'],
+                name='user_live_member_public',
+                condition=Q(deleted__isnull=True, is_private=False),
+            ),
         ]
 
     def get_absolute_url(self) -> str:
@@ -117,11 +141,11 @@ class User(BaseModel):
         Returns a list of all the TransactionType records this User is set up to receive external notifications for
         :return: A list of TransactionType records
         """
-        return TransactionType.objects.filter(notification__external=True, notification__user=self)
+        return TransactionType.objects.filter(notification__external=True, notification__user=self).order_by('id')
 
     def get_internal_notifications(self) -> List[TransactionType]:
         """
         Returns a list of all the TransactionType records this User is set up to receive internal notifications for
         :return: A list of TransactionType records
         """
-        return TransactionType.objects.filter(notification__external=False, notification__user=self)
+        return TransactionType.objects.filter(notification__external=False, notification__user=self).order_by('id')
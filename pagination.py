@@ -0,0 +1,239 @@
+"""
+Pagination of the list endpoints
+
+Lists are paginated with `page` and `limit` by default, which becomes an OFFSET query that gets slower the deeper the
+page is. Every list also returns a `next_cursor` in its `_metadata`; sending it back as `cursor` returns the rows
+after the last one of the previous page instead, by comparing against the values of the `order` fields of that row
+with `id` as the tie breaker. That is a keyset query, which takes the same time whatever the depth, and it is not
+thrown off by rows being created or deleted between requests.
+
+A cursor is only valid for the `order` it was created with. The search and exclude filters are applied as usual, so
+they should be sent unchanged with every cursor as well.
+
+`total_records` costs a second query as expensive as the list itself, so clients can choose how it is counted with the
+`count` parameter; `exact` (the default), `none` to skip it, or `estimate`. An estimate is the row count the Postgres
+planner expects, or the exact count when the planner expects only a few rows, and is cached for a short time for the
+requesting Address and the same filters. `_metadata` says which mode was used.
+"""
+# stdlib
+import base64
+import binascii
+import datetime
+import decimal
+import hashlib
+import json
+import operator
+import uuid
+from functools import reduce
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple, Union
+# libs
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from rest_framework.request import Request
+
+
+__all__ = [
+    'count_records',
+    'InvalidCursor',
+    'Keyset',
+    'keyset',
+    'paginate',
+]
+
+COUNT_MODES = ('estimate', 'exact', 'none')
+
+Order = Union[str, Sequence[str]]
+
+
+class InvalidCursor(ValueError):
+    """
+    The sent cursor could not be decoded or was created for a different order
+    """
+    pass
+
+
+def _default(value: Any) -> str:
+    # Unlike DjangoJSONEncoder, datetimes keep their microseconds, or the cursor would not sit exactly on its row
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'Cannot put {type(value).__name__} in a cursor')
+
+
+def _encode(order: List[str], values: List[Any]) -> str:
+    data = json.dumps({'order': order, 'values': values}, default=_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def _decode(cursor: str, order: List[str]) -> List[Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = data['values']
+        cursor_order = data['order']
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        raise InvalidCursor('The cursor could not be decoded')
+    if cursor_order != order or not isinstance(values, list) or len(values) != len(order):
+        raise InvalidCursor('The cursor was not created for this order')
+    return values
+
+
+def _after(name: str, descending: bool, value: Any) -> Q:
+    """
+    Filter for the rows that come after `value` in the ordering of one field. Postgres puts NULLs last when ascending
+    and first when descending, so that has to be taken into account.
+    """
+    if descending:
+        if value is None:
+            return Q(**{f'{name}__isnull': False})
+        return Q(**{f'{name}__lt': value})
+    if value is None:
+        return Q(pk__in=[])
+    return Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+
+
+def _equal(name: str, value: Any) -> Q:
+    if value is None:
+        return Q(**{f'{name}__isnull': True})
+    return Q(**{name: value})
+
+
+class Keyset(NamedTuple):
+    """
+    A list ordered for keyset pagination, starting at the sent cursor or page
+    """
+    objs: QuerySet
+    # Names of the annotations holding the values of the ordering, and the order they were created for
+    names: List[str]
+    order: List[str]
+
+    def cursor(self, last: Any) -> str:
+        """
+        The cursor for the page after the one ending with `last`, a record or a row of a .values() QuerySet
+        """
+        if isinstance(last, dict):
+            return _encode(self.order, [last[name] for name in self.names])
+        return _encode(self.order, [getattr(last, name) for name in self.names])
+
+
+def keyset(
+        objs: QuerySet,
+        order: Order,
+        page: int,
+        limit: int,
+        cursor: Optional[str] = None,
+) -> Keyset:
+    """
+    Order a list for keyset pagination, and skip to the start of the requested page
+    :param objs: The filtered QuerySet to paginate. Its ordering is replaced by `order`.
+    :param order: The order from the list controller, either one field or a sequence of them
+    :param page: The page to start at when no cursor is sent
+    :param limit: The number of records in a page
+    :param cursor: The `next_cursor` from the previous page, if one was sent
+    :raises InvalidCursor: If the cursor is invalid or was created for a different order
+    :return: The list starting at the page, with no limit applied
+    """
+    order = [order] if isinstance(order, str) else order
+    fields = [(field.lstrip('-'), field.startswith('-')) for field in order]
+    if not any(name in ('id', 'pk') for name, _ in fields):
+        # The id makes every position in the ordering unique, and follows the direction of the last field so an index
+        # on both can be scanned in one direction
+        fields.append(('id', fields[-1][1] if fields else False))
+    full_order = [f'{"-" if descending else ""}{field}' for field, descending in fields]
+
+    # Order by annotations rather than the field paths so that the cursor values can be read from the records, and so
+    # the keyset filter uses the same joins as the ordering
+    names = [f'_cursor_{i}' for i in range(len(fields))]
+    objs = objs.annotate(**{name: F(field) for name, (field, _) in zip(names, fields)}).order_by(*(
+        F(name).desc(nulls_first=True) if descending else F(name).asc(nulls_last=True)
+        for name, (_, descending) in zip(names, fields)
+    ))
+
+    if cursor:
+        values = _decode(cursor, full_order)
+        # (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        keyset = []
+        equal = Q()
+        for name, (_, descending), value in zip(names, fields, values):
+            keyset.append(equal & _after(name, descending, value))
+            equal &= _equal(name, value)
+        objs = objs.filter(reduce(operator.or_, keyset))
+    else:
+        objs = objs[page * limit:]
+    return Keyset(objs, names, full_order)
+
+
+def paginate(
+        objs: QuerySet,
+        order: Order,
+        page: int,
+        limit: int,
+        cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Get one page of a list
+    :param objs: The filtered QuerySet to paginate. Its ordering is replaced by `order`.
+    :param order: The order from the list controller, either one field or a sequence of them
+    :param page: The page to return when no cursor is sent
+    :param limit: The number of records in a page
+    :param cursor: The `next_cursor` from the previous page, if one was sent
+    :raises InvalidCursor: If the cursor is invalid or was created for a different order
+    :return: The records in the page, and the cursor for the next page or None if this is the last one
+    """
+    ordered = keyset(objs, order, page, limit, cursor)
+    # Read one extra record to find out if there is a next page
+    records = list(ordered.objs[:limit + 1])
+    if len(records) <= limit:
+        return records, None
+    records = records[:limit]
+    return records, ordered.cursor(records[-1])
+
+
+def _planner_rows(objs: QuerySet) -> int:
+    """
+    The number of rows the Postgres planner expects the query to return, without running it
+    """
+    sql, params = objs.query.sql_with_params()
+    with connections[objs.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_records(objs: QuerySet, request: Request) -> Tuple[Optional[int], str]:
+    """
+    Count the records in a list the way the client asked for with the `count` parameter. Unknown modes are counted
+    exactly.
+    :param objs: The filtered QuerySet to count
+    :param request: The request for the list
+    :return: The number of records, or None if they were not counted, and the mode that was used
+    """
+    mode = request.GET.get('count', 'exact')
+    if mode not in COUNT_MODES:
+        mode = 'exact'
+    if mode == 'none':
+        return None, mode
+    if mode == 'exact':
+        return objs.count(), mode
+
+    objs = objs.order_by()
+    try:
+        sql, params = objs.query.sql_with_params()
+    except EmptyResultSet:
+        return 0, mode
+    # The filters include the visibility rules for the requesting User, so the SQL identifies what they can see
+    address_id = (getattr(request.user, 'address', None) or {}).get('id')
+    query_hash = hashlib.sha1(repr((sql, params)).encode()).hexdigest()
+    key = f'list_count_{objs.model._meta.db_table}_{address_id}_{query_hash}'
+    total_records = cache.get(key)
+    if total_records is None:
+        total_records = _planner_rows(objs)
+        if total_records <= settings.LIST_COUNT_EXACT_THRESHOLD:
+            total_records = objs.count()
+        cache.set(key, total_records, settings.LIST_COUNT_CACHE_TTL)
+    return total_records, mode
@@ -4,7 +4,8 @@ from typing import Optional
 from cloudcix_rest.exceptions import Http403
 from rest_framework.request import Request
 # local
-from membership.models import Address, AddressLink, Member
+from membership.address_link_index import address_link_index
+from membership.models import Address, Member
 
 
 __all__ = [
@@ -42,12 +43,7 @@ class Permissions:
             return None
 
         # The requesting User's Address is linked to the Address being read
-        try:
-            AddressLink.objects.get(
-                address_id=request.user.address['id'],
-                contra_address=obj.id,
-            )
-        except AddressLink.DoesNotExist:
+        if not address_link_index.is_linked(request.user.address['id'], obj.pk):
             return Http403(error_code='membership_address_read_201')
 
         return None
@@ -82,12 +78,7 @@ class Permissions:
             return Http403(error_code='membership_address_update_203')
 
         # There is a link between the Address being updated and the requesting User's Address
-        try:
-            AddressLink.objects.get(
-                address_id=request.user.address['id'],
-                contra_address=obj,
-            )
-        except AddressLink.DoesNotExist:
+        if not address_link_index.is_linked(request.user.address['id'], obj.pk):
             return Http403(error_code='membership_address_update_204')
 
         return None
@@ -4,7 +4,8 @@ from typing import Optional
 from cloudcix_rest.exceptions import Http403
 from rest_framework.request import Request
 # local
-from membership.models import Address, AddressLink
+from membership.address_link_index import address_link_index
+from membership.models import Address
 
 
 class Permissions:
@@ -21,14 +22,8 @@ class Permissions:
             return Http403(error_code='membership_address_link_create_201')
 
         # An Address Link does not already exist between the requesting User's Address and the specified Address
-        try:
-            AddressLink.objects.get(
-                address_id=request.user.address['id'],
-                contra_address=contra_address,
-            )
+        if address_link_index.is_linked(request.user.address['id'], contra_address.pk):
             return Http403(error_code='membership_address_link_create_202')
-        except AddressLink.DoesNotExist:
-            pass
 
         return None
 
@@ -4,7 +4,8 @@ from typing import Optional
 from cloudcix_rest.exceptions import Http403
 from rest_framework.request import Request
 # local
-from membership.models import Address, AddressLink
+from membership.address_link_index import address_link_index
+from membership.models import Address
 
 
 class Permissions:
@@ -19,12 +20,7 @@ class Permissions:
         - The specified Address is Linked to the requesting User's Address
         """
         # The specified Address is Linked to the requesting User's Address
-        try:
-            AddressLink.objects.get(
-                address_id=request.user.address['id'],
-                contra_address=address,
-            )
-        except AddressLink.DoesNotExist:
+        if not address_link_index.is_linked(request.user.address['id'], address.pk):
             return Http403(error_code='membership_notification_list_201')
 
         return None
@@ -5,7 +5,8 @@ from typing import Optional
 from cloudcix_rest.exceptions import Http403
 from rest_framework.request import Request
 # local
-from membership.models import Address, AddressLink, User
+from membership.address_link_index import address_link_index
+from membership.models import Address, User
 
 __all__ = [
     'Permissions',
@@ -114,12 +115,7 @@ class Permissions:
         # requesting User's Member and the requesting User is global
         if request.user.member['id'] != obj.member_id or not request.user.is_global:
             # Check if an Address Link exists before raising a 403
-            try:
-                AddressLink.objects.get(
-                    address_id=request.user.address['id'],
-                    contra_address=obj.address,
-                )
-            except AddressLink.DoesNotExist:
+            if not address_link_index.is_linked(request.user.address['id'], obj.address_id):
                 return Http403(error_code='membership_user_update_203')
 
         # The specified User is in a non self-managed partner Member
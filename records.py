@@ -0,0 +1,150 @@
+"""
+Fast path for serializing full pages of Users and Addresses
+
+Serializing a page normally builds a model instance for every record and for each of its `select_related` children,
+and serpy then walks their attributes. The fast path reads the same columns with `.values()` instead and loads them
+into light records with `__slots__`, which have the attributes, properties and methods the serializer reads. The
+records are passed to the same serializer, so the output is the same as for model instances.
+
+The Transaction Types that a page of Users receive Notifications for are read in one query for the page, instead of
+three queries per User.
+"""
+# stdlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+# libs
+import serpy
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+# local
+from membership.models import Address, TransactionType, User
+from membership.serializers import AddressSerializer, TransactionTypeSerializer, UserSerializer
+
+
+__all__ = [
+    'address_records',
+    'RecordBuilder',
+    'user_records',
+]
+
+
+class RecordBuilder:
+    """
+    Builds records for a serializer from the rows of a `.values()` query on its model. The columns, relations and
+    methods are worked out from the fields of the serializer.
+    """
+
+    def __init__(
+            self,
+            serializer: Type[serpy.Serializer],
+            model: Type[models.Model],
+            overrides: Optional[Dict[str, Any]] = None,
+            slots: Tuple[str, ...] = (),
+    ):
+        self.model = model
+        self.columns = [field.attname for field in model._meta.concrete_fields]
+        # Map of relation name to the builder for the related records
+        self.relations: Dict[str, RecordBuilder] = {}
+        attrs: Dict[str, Any] = dict(overrides or {})
+        attrs['pk'] = property(lambda record, name=model._meta.pk.attname: getattr(record, name))
+        # Attributes that are not columns or relations, like an Address's link, which views set on some records. Left
+        # unset they raise AttributeError, which serpy skips for fields that are not required, as for a model instance
+        self.optional = set(slots)
+        for name, field in serializer._field_map.items():
+            root = (field.attr or name).split('.')[0]
+            if root in self.columns or root in self.relations or root in self.optional or root in attrs:
+                continue
+            try:
+                model_field = model._meta.get_field(root)
+            except FieldDoesNotExist:
+                model_field = None
+            if isinstance(field, serpy.Serializer) and model_field is not None and model_field.many_to_one:
+                self.relations[root] = RecordBuilder(type(field), model_field.related_model)
+            elif hasattr(model, root):
+                # Methods and properties, such as get_absolute_url, are shared with the model
+                attrs[root] = getattr(model, root)
+            else:
+                self.optional.add(root)
+        slots = sorted({*self.columns, *self.relations, *self.optional})
+        self.record = type(f'{model.__name__}Record', (), {'__slots__': tuple(slots), **attrs})
+        self._pk = model._meta.pk.attname
+
+    def paths(self, prefix: str = '') -> List[str]:
+        """
+        The paths to pass to `.values()` to read every column the records need
+        """
+        paths = [f'{prefix}{column}' for column in self.columns]
+        for name, builder in self.relations.items():
+            paths.extend(builder.paths(f'{prefix}{name}__'))
+        return paths
+
+    def values(self, objs: models.QuerySet) -> models.QuerySet:
+        """
+        Turn a QuerySet of the model into a `.values()` QuerySet for the records. Annotations that the serializer reads,
+        like `linked`, are kept.
+        """
+        annotations = [name for name in objs.query.annotations if name in self.optional]
+        return objs.values(*self.paths(), *annotations)
+
+    def build(self, row: Dict[str, Any], prefix: str = '') -> Any:
+        """
+        Build the record for one row, or None if a nullable relation is empty
+        """
+        if prefix != '' and row[f'{prefix}{self._pk}'] is None:
+            return None
+        record = self.record()
+        for column in self.columns:
+            setattr(record, column, row[f'{prefix}{column}'])
+        for name, builder in self.relations.items():
+            setattr(record, name, builder.build(row, f'{prefix}{name}__'))
+        if prefix == '':
+            for name in self.optional.intersection(row):
+                setattr(record, name, row[name])
+        return record
+
+    def records(self, rows: Iterable[Dict[str, Any]]) -> List[Any]:
+        """
+        Build the records for a page of rows
+        """
+        return [self.build(row) for row in rows]
+
+
+class _UserRecordBuilder(RecordBuilder):
+    """
+    Reads the Notifications of the whole page at once. User.get_*_notifications each run a query per User.
+    """
+
+    def __init__(self):
+        self.transaction_types = RecordBuilder(TransactionTypeSerializer, TransactionType)
+        overrides = {
+            'get_external_notifications': lambda record: record.external_notifications_,
+            'get_internal_notifications': lambda record: record.internal_notifications_,
+        }
+        super().__init__(UserSerializer, User, overrides, ('external_notifications_', 'internal_notifications_'))
+
+    def records(self, rows: Iterable[Dict[str, Any]]) -> List[Any]:
+        records = super().records(rows)
+        notifications: Dict[Tuple[int, bool], List[Any]] = defaultdict(list)
+        if len(records) > 0:
+            # Ordered the same way as User.get_*_notifications
+            rows = TransactionType.objects.filter(
+                notification__user_id__in=[record.id for record in records],
+            ).values(
+                *self.transaction_types.paths(),
+                'notification__external',
+                'notification__user_id',
+            ).order_by('id')
+            transaction_types: Dict[int, Any] = {}
+            for row in rows:
+                if row['id'] not in transaction_types:
+                    transaction_types[row['id']] = self.transaction_types.build(row)
+                key = (row['notification__user_id'], row['notification__external'])
+                notifications[key].append(transaction_types[row['id']])
+        for record in records:
+            record.external_notifications_ = notifications.get((record.id, True), [])
+            record.internal_notifications_ = notifications.get((record.id, False), [])
+        return records
+
+
+address_records = RecordBuilder(AddressSerializer, Address)
+user_records = _UserRecordBuilder()
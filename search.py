@@ -0,0 +1,66 @@
+"""
+Ranked text search for the User and Address lists
+
+Sending `q` to the User or Address lists matches it, case insensitively, anywhere in the columns a person would type
+into a type-ahead box; the names and email of a User, and the name, first line and city of an Address. The matches are
+ordered by how similar their closest column is to `q`, and then by the usual `order`. The `search` and `exclude`
+filters are applied on top as usual.
+
+The match is the same `UPPER(column) LIKE UPPER('%q%')` as `icontains`, which the pg_trgm GIN indexes created in
+migration 0021 serve for a `q` of three or more characters, and the rank is the pg_trgm similarity.
+"""
+# stdlib
+import operator
+from functools import reduce
+from typing import Dict, List, Tuple, Type
+# libs
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import models
+from django.db.models import Q, QuerySet
+from django.db.models.functions import Greatest
+from rest_framework.request import Request
+# local
+from membership.models import Address, User
+from membership.pagination import Order
+
+
+__all__ = [
+    'ranked_search',
+    'SEARCH_FIELDS',
+    'text_search',
+]
+
+RANK = 'search_rank'
+
+# Map of model to the columns searched with `q`. Each of them has a trigram index
+SEARCH_FIELDS: Dict[Type[models.Model], Tuple[str, ...]] = {
+    Address: ('name', 'address1', 'city'),
+    User: ('first_name', 'surname', 'email'),
+}
+
+
+def text_search(objs: QuerySet, q: str) -> QuerySet:
+    """
+    Filter a QuerySet of a model in SEARCH_FIELDS to the records matching `q`, annotated with their rank
+    """
+    fields = SEARCH_FIELDS[objs.model]
+    return objs.filter(
+        reduce(operator.or_, (Q(**{f'{field}__icontains': q}) for field in fields)),
+    ).annotate(**{
+        RANK: Greatest(*(TrigramSimilarity(field, q) for field in fields)),
+    })
+
+
+def ranked_search(objs: QuerySet, request: Request, order: Order) -> Tuple[QuerySet, List[str]]:
+    """
+    Apply the `q` parameter of a list, if it was sent
+    :param objs: The filtered QuerySet of the list
+    :param request: The request for the list
+    :param order: The order from the list controller
+    :return: The searched QuerySet, and the order to paginate it with, best matches first
+    """
+    order = [order] if isinstance(order, str) else list(order)
+    q = request.GET.get('q', '').strip()
+    if q == '':
+        return objs, order
+    return text_search(objs, q), [f'-{RANK}', *order]
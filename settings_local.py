@@ -1,7 +1,5 @@
 # Local settings that change on a per application / per environment basis
-import atexit
 import os
-import ldap3
 
 PGSQLAPI_PASSWORD = os.getenv('PGSQL_PASSWORD', 'pw')
 PGSQLAPI_USER = os.getenv('PGSQL_USER', 'postgres')
@@ -59,26 +57,80 @@ INSTALLED_APPS = [
     'membership',
 ]
 
-# Used as the search base in LDAP queries
-# LDAP domain connection
-
-LDAP_CONN = ldap3.Connection(
-    ldap3.ServerPool([ldap3.Server(f'{LDAP_URL}:389') for _ in range(5)], active=True, exhaust=False),
-    user=f'cn=admin,{LDAP_DOMAIN_CONTROLLER}',
-    password=f'{LDAP_PASSWORD}',
-    pool_size=2,
-    pool_keepalive=10,
-    pool_lifetime=60,
-    client_strategy='RESTARTABLE',
-)
-
-LDAP_CONN.bind()
-# Close the connection when the system closes
-atexit.register(LDAP_CONN.unbind)
+# LDAP connections held per worker, the seconds to wait for one to be free, and the seconds a connection can be idle
+# before it is checked again
+LDAP_POOL_SIZE = int(os.getenv('LDAP_POOL_SIZE', '4'))
+LDAP_POOL_TIMEOUT = float(os.getenv('LDAP_POOL_TIMEOUT', '5'))
+LDAP_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('LDAP_POOL_HEALTH_CHECK_INTERVAL', '30'))
+
+# Write memberUid changes to LDAP from the ldap_outbox command instead of during User requests
+LDAP_WRITE_BEHIND = os.getenv('LDAP_WRITE_BEHIND', 'false').lower() == 'true'
+LDAP_OUTBOX_BATCH_SIZE = int(os.getenv('LDAP_OUTBOX_BATCH_SIZE', '100'))
+LDAP_OUTBOX_INTERVAL = float(os.getenv('LDAP_OUTBOX_INTERVAL', '1'))
+LDAP_OUTBOX_MAX_ATTEMPTS = int(os.getenv('LDAP_OUTBOX_MAX_ATTEMPTS', '10'))
+
+# Cache of recently verified credentials used by ldap_auth, per worker. A size of 0 disables it
+LDAP_CREDENTIAL_CACHE_SIZE = int(os.getenv('LDAP_CREDENTIAL_CACHE_SIZE', '10000'))
+LDAP_CREDENTIAL_CACHE_TTL = int(os.getenv('LDAP_CREDENTIAL_CACHE_TTL', '300'))
+
+# Failed login attempts allowed per email and per client IP within the period, in seconds. A capacity of 0 disables
+# that limit
+LOGIN_THROTTLE_EMAIL_CAPACITY = int(os.getenv('LOGIN_THROTTLE_EMAIL_CAPACITY', '10'))
+LOGIN_THROTTLE_IP_CAPACITY = int(os.getenv('LOGIN_THROTTLE_IP_CAPACITY', '50'))
+LOGIN_THROTTLE_PERIOD = int(os.getenv('LOGIN_THROTTLE_PERIOD', '60'))
+# Number of proxies in front of the service that append to X-Forwarded-For. The client IP is the entry that many from
+# the right. With 0, X-Forwarded-For is ignored and the IP limit is skipped for private REMOTE_ADDRs
+LOGIN_THROTTLE_PROXY_HOPS = int(os.getenv('LOGIN_THROTTLE_PROXY_HOPS', '0'))
+
+# Process pool used to crypt passwords, per worker. 0 workers runs crypt in the request thread
+LDAP_CRYPT_POOL_WORKERS = int(os.getenv('LDAP_CRYPT_POOL_WORKERS', '0'))
+LDAP_CRYPT_POOL_QUEUE = int(os.getenv('LDAP_CRYPT_POOL_QUEUE', '16'))
+LDAP_CRYPT_POOL_TIMEOUT = float(os.getenv('LDAP_CRYPT_POOL_TIMEOUT', '5'))
 
 # Path to private key file for membership
 PRIVATE_KEY_FILE = os.path.join(BASE_DIR, 'private-key.rsa')
 
+# Algorithm and key used to sign tokens. The key must match the algorithm, e.g. an EC P-384 key for ES384
+JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'RS256')
+JWT_PRIVATE_KEY_FILE = os.getenv('JWT_PRIVATE_KEY_FILE', PRIVATE_KEY_FILE)
+# Keep accepting RS256 tokens signed with PRIVATE_KEY_FILE while moving to a different algorithm
+JWT_VERIFY_RS256 = os.getenv('JWT_VERIFY_RS256', 'true').lower() == 'true'
+# Public keys of signing keys that have been rotated out. They stay published and accepted until their tokens expire
+JWT_PREVIOUS_PUBLIC_KEY_FILES = [
+    path.strip() for path in os.getenv('JWT_PREVIOUS_PUBLIC_KEY_FILES', '').split(',') if path.strip() != ''
+]
+# Seconds that clients may cache the JWK Set for
+JWKS_MAX_AGE = int(os.getenv('JWKS_MAX_AGE', '3600'))
+
+# Where OTP codes are verified at login; "remote" calls the OTP service, "local" checks them against the User's own
+# secret and falls back to the OTP service for Users that have no secret stored
+OTP_VERIFICATION = os.getenv('OTP_VERIFICATION', 'remote').lower()
+# Fernet key used to encrypt the stored secrets
+OTP_SECRET_KEY = os.getenv('OTP_SECRET_KEY', '')
+# Number of 30 second steps either side of the current one that a code is accepted for
+OTP_VALID_WINDOW = int(os.getenv('OTP_VALID_WINDOW', '1'))
+
+# Serialize full pages of the User and Address lists from .values() rows instead of model instances
+LIST_FAST_PATH = os.getenv('LIST_FAST_PATH', 'true').lower() == 'true'
+
+# Number of records read and serialized at a time when a list is streamed
+LIST_STREAM_CHUNK_SIZE = int(os.getenv('LIST_STREAM_CHUNK_SIZE', '500'))
+
+# Index of the Addresses each Address is linked to, used by permission checks, per worker. A size of 0 disables it.
+# Entries are held for ADDRESS_LINK_INDEX_TTL seconds, and their version is checked against the shared cache at most
+# every ADDRESS_LINK_INDEX_MAX_AGE seconds
+ADDRESS_LINK_INDEX_SIZE = int(os.getenv('ADDRESS_LINK_INDEX_SIZE', '10000'))
+ADDRESS_LINK_INDEX_TTL = int(os.getenv('ADDRESS_LINK_INDEX_TTL', '300'))
+ADDRESS_LINK_INDEX_MAX_AGE = float(os.getenv('ADDRESS_LINK_INDEX_MAX_AGE', '0'))
+
+# Maximum number of Users that can be read in one request to user/bulk/
+USER_BULK_READ_LIMIT = int(os.getenv('USER_BULK_READ_LIMIT', '100'))
+
+# List endpoints asked to estimate total_records count exactly when the planner expects at most this many rows, and
+# cache the estimate for this many seconds
+LIST_COUNT_EXACT_THRESHOLD = int(os.getenv('LIST_COUNT_EXACT_THRESHOLD', '1000'))
+LIST_COUNT_CACHE_TTL = int(os.getenv('LIST_COUNT_CACHE_TTL', '30'))
+
 # Small flag for whether or not this is a production deployment
 PRODUCTION_DEPLOYMENT = os.getenv('PRODUCTION_DEPLOYMENT', 'true').lower() == 'true'
 if not PRODUCTION_DEPLOYMENT:
@@ -0,0 +1,120 @@
+"""
+Streaming of large list responses
+
+Sending `stream=true` to a list renders the response while it is read from the database, instead of building the whole
+page in memory first. Records are read from a server-side cursor with `QuerySet.iterator()` and serialized
+`LIST_STREAM_CHUNK_SIZE` at a time, so memory use stays flat however large `limit` is, and the first bytes go out as
+soon as the first chunk has been read.
+
+The body is the usual `{"content": [...], "_metadata": {...}}`. `_metadata` is sent last so that `next_cursor` can be
+filled in once the last record is known. `stream=all` returns every record matching the filters, from the sent cursor
+if there is one, ignoring `page` and `limit`, for full exports.
+"""
+# stdlib
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Type
+# libs
+import serpy
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+# local
+from membership.pagination import Keyset, keyset, Order
+
+
+__all__ = [
+    'stream_list',
+    'streaming',
+]
+
+STREAM_MODES = ('all', 'true')
+
+Prepare = Callable[[List[Any]], Iterable[Any]]
+
+
+def streaming(request: Request) -> bool:
+    """
+    Check if the client asked for the list to be streamed
+    """
+    return request.GET.get('stream', '').lower() in STREAM_MODES
+
+
+def _dumps(data: Any) -> str:
+    # The same format as the JSONRenderer used for every other response
+    content = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+    return content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def _render(
+        serializer: Type[serpy.Serializer],
+        ordered: Keyset,
+        limit: Optional[int],
+        metadata: Dict[str, Any],
+        prepare: Optional[Prepare],
+) -> Iterator[bytes]:
+    chunk_size = settings.LIST_STREAM_CHUNK_SIZE
+    objs = ordered.objs if limit is None else ordered.objs[:limit + 1]
+    rows = objs.iterator(chunk_size=chunk_size)
+
+    yield b'{"content":['
+    sent = 0
+    last = None
+    more = False
+    while not more:
+        chunk = list(islice(rows, chunk_size))
+        if len(chunk) == 0:
+            break
+        if limit is not None and sent + len(chunk) > limit:
+            # The extra record read to find out if there is a next page
+            chunk = chunk[:limit - sent]
+            more = True
+            if len(chunk) == 0:
+                break
+        last = chunk[-1]
+        records = prepare(chunk) if prepare is not None else chunk
+        # Strip the brackets from each chunk's array so the chunks join into one
+        content = _dumps(serializer(instance=records, many=True).data)[1:-1]
+        yield (',' if sent > 0 else '').encode() + content.encode()
+        sent += len(chunk)
+
+    metadata['next_cursor'] = ordered.cursor(last) if more else None
+    yield f'],"_metadata":{_dumps(metadata)}}}'.encode()
+
+
+def stream_list(
+        request: Request,
+        serializer: Type[serpy.Serializer],
+        objs: QuerySet,
+        order: Order,
+        page: int,
+        limit: int,
+        metadata: Dict[str, Any],
+        prepare: Optional[Prepare] = None,
+) -> StreamingHttpResponse:
+    """
+    Stream a list as it is serialized
+    :param request: The request for the list, with the `stream` and `cursor` parameters
+    :param serializer: The serializer for the records
+    :param objs: The filtered QuerySet of the list. Prefetches are not run by `iterator()`, so it should not rely on
+                 them.
+    :param order: The order from the list controller
+    :param page: The page from the list controller
+    :param limit: The limit from the list controller
+    :param metadata: The `_metadata` for the response. `next_cursor` is added to it at the end.
+    :param prepare: Called with each chunk of records before it is serialized, returning the records to serialize
+    :raises InvalidCursor: If the sent cursor is invalid
+    :return: The streaming response
+    """
+    cursor = request.GET.get('cursor')
+    if request.GET.get('stream', '').lower() == 'all':
+        ordered = keyset(objs, order, 0, limit, cursor)
+        limit = None
+    else:
+        ordered = keyset(objs, order, page, limit, cursor)
+    return StreamingHttpResponse(
+        _render(serializer, ordered, limit, metadata, prepare),
+        content_type='application/json',
+    )
@@ -0,0 +1,227 @@
+"""
+Throttling of failed login attempts
+
+Every failed attempt on `auth/login/` is counted against the sent email and the client IP. Once either has had as many
+failed attempts as its limit within the last `LOGIN_THROTTLE_PERIOD` seconds, further attempts are turned away with a
+429 before LDAP is searched. Successful logins are not counted, so Users, robots and portals that log in often are never
+affected, but a burst of bad passwords against one account or from one address costs no more LDAP calls.
+
+Attempts are counted over a sliding window, estimated from a counter for the current period and the one before it. The
+counters live in the shared Django cache and are only changed with `add` and `incr`, which are atomic, so the limits
+hold across workers. If the cache cannot be reached, each worker falls back to its own bounded in-memory counters
+rather than letting every attempt through.
+"""
+# stdlib
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from ipaddress import ip_address
+from typing import Dict, List, Optional, Tuple, Type
+# libs
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.request import Request
+
+
+__all__ = [
+    'AttemptWindow',
+    'client_ip',
+    'login_throttle',
+    'LoginThrottle',
+]
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of counters held in memory when the Django cache cannot be used
+FALLBACK_SIZE = 10000
+
+# Errors raised by the cache backends when the cache cannot be reached. Socket errors are OSErrors, and the memcached
+# and redis clients raise their own
+CACHE_ERRORS: Tuple[Type[Exception], ...] = (OSError,)
+try:
+    from pymemcache.exceptions import MemcacheError
+    CACHE_ERRORS += (MemcacheError,)
+except ImportError:  # pragma: no cover
+    pass
+try:
+    from redis.exceptions import RedisError
+    CACHE_ERRORS += (RedisError,)
+except ImportError:  # pragma: no cover
+    pass
+
+
+class AttemptWindow:
+    """
+    Counts of attempts per key over a sliding window, with a limit
+    """
+
+    def __init__(self, name: str, capacity: int, period: int):
+        """
+        :param name: Prefix for the keys of these counters in the cache
+        :param capacity: The number of attempts allowed within the period. 0 disables the limit.
+        :param period: The number of seconds attempts are counted for
+        """
+        self.name = name
+        self.capacity = capacity
+        self.period = max(period, 1)
+        self._fallback: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _keys(self, key: str, now: float) -> Tuple[str, str, float]:
+        """
+        The cache keys of the counters for the previous and current periods, and how far through the current period
+        `now` is. The key is hashed as emails can contain characters that are not allowed in memcached keys.
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        window, offset = divmod(now, self.period)
+        prefix = f'login_throttle_{self.name}_{digest}'
+        return f'{prefix}_{int(window) - 1}', f'{prefix}_{int(window)}', offset / self.period
+
+    def _wait(self, previous: int, current: int, elapsed: float) -> float:
+        """
+        The number of seconds until one more attempt is allowed, with the previous period's attempts weighted by how
+        much of it is still inside the window
+        """
+        allowed = self.capacity - 1
+        if previous * (1 - elapsed) + current <= allowed:
+            return 0
+        if current <= allowed:
+            # Wait for enough of the previous period to leave the window
+            return (1 - (allowed - current) / previous - elapsed) * self.period
+        # Wait for the end of this period, and then for enough of it to leave the window
+        return (2 - elapsed - allowed / current) * self.period
+
+    def _counts_in_memory(self, keys: List[str]) -> List[int]:
+        with self._lock:
+            return [self._fallback.get(key, 0) for key in keys]
+
+    def _incr_in_memory(self, key: str):
+        with self._lock:
+            self._fallback[key] = self._fallback.pop(key, 0) + 1
+            while len(self._fallback) > FALLBACK_SIZE:
+                self._fallback.popitem(last=False)
+
+    def wait(self, key: str) -> float:
+        """
+        Check if an attempt for a key is allowed, without counting it
+        :param key: The email or IP address making the attempt
+        :return: 0 if the attempt is allowed, otherwise the number of seconds until one will be
+        """
+        if self.capacity <= 0:
+            return 0
+        previous, current, elapsed = self._keys(key, time.time())
+        try:
+            counts = cache.get_many([previous, current])
+            previous_count, current_count = counts.get(previous, 0), counts.get(current, 0)
+        except CACHE_ERRORS:
+            logger.warning('Login throttle falling back to in-memory counters as the cache is unavailable')
+            previous_count, current_count = self._counts_in_memory([previous, current])
+        return self._wait(previous_count, current_count, elapsed)
+
+    def add(self, key: str):
+        """
+        Count an attempt for a key
+        :param key: The email or IP address that made the attempt
+        """
+        if self.capacity <= 0:
+            return
+        _, current, _ = self._keys(key, time.time())
+        # The counter is kept for two periods so that it is still there while it is the previous period's
+        timeout = 2 * self.period
+        try:
+            # add does nothing if the counter exists, and incr is atomic, so attempts from every worker are counted
+            cache.add(current, 0, timeout=timeout)
+            try:
+                cache.incr(current)
+            except ValueError:
+                # The counter was evicted between the add and the incr
+                cache.add(current, 1, timeout=timeout)
+        except CACHE_ERRORS:
+            logger.warning('Login throttle falling back to in-memory counters as the cache is unavailable')
+            self._incr_in_memory(current)
+
+
+class LoginThrottle:
+    """
+    Throttles failed login attempts per email and per client IP, and counts the LDAP calls that were avoided by doing so
+    """
+
+    def __init__(self, email_window: AttemptWindow, ip_window: AttemptWindow):
+        self.email_window = email_window
+        self.ip_window = ip_window
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+
+    def check(self, email: str, ip: Optional[str]) -> Optional[int]:
+        """
+        Check if a login attempt can go ahead, given the failed attempts for its email and IP
+        :param email: The email sent in the attempt
+        :param ip: The IP address of the client, if known
+        :return: None if the attempt can go ahead, otherwise the number of seconds to wait before trying again
+        """
+        wait = self.email_window.wait(email.lower())
+        if ip is not None:
+            wait = max(wait, self.ip_window.wait(ip))
+        with self._lock:
+            if wait == 0:
+                self.allowed += 1
+                return None
+            self.throttled += 1
+        return max(1, math.ceil(wait))
+
+    def failed(self, email: str, ip: Optional[str]):
+        """
+        Count a login attempt whose credentials were wrong against its email and IP
+        :param email: The email sent in the attempt
+        :param ip: The IP address of the client, if known
+        """
+        self.email_window.add(email.lower())
+        if ip is not None:
+            self.ip_window.add(ip)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters for this worker. Every throttled attempt is an LDAP search and crypt that did not happen.
+        """
+        return {
+            'allowed': self.allowed,
+            'ldap_calls_avoided': self.throttled,
+        }
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    Find the IP address of the client that sent a request, to limit its failed login attempts by.
+    Behind LOGIN_THROTTLE_PROXY_HOPS proxies that each append to X-Forwarded-For, the client is the entry that many
+    from the right. The entries to the left of it were sent by the client, which could choose them.
+    With no proxies configured, a private REMOTE_ADDR is taken to be a proxy rather than a client, and None is returned
+    so that every client behind it doesn't share one limit.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR')
+    hops = settings.LOGIN_THROTTLE_PROXY_HOPS
+    if hops > 0:
+        forwarded = [entry.strip() for entry in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [entry for entry in forwarded if entry != '']
+        if len(forwarded) == 0:
+            return remote_addr
+        # With fewer entries than proxies, the leftmost was added by the outermost proxy
+        return forwarded[max(0, len(forwarded) - hops)]
+
+    if remote_addr is None:
+        return None
+    try:
+        if ip_address(remote_addr).is_private:
+            return None
+    except ValueError:
+        return None
+    return remote_addr
+
+
+login_throttle = LoginThrottle(
+    AttemptWindow('email', settings.LOGIN_THROTTLE_EMAIL_CAPACITY, settings.LOGIN_THROTTLE_PERIOD),
+    AttemptWindow('ip', settings.LOGIN_THROTTLE_IP_CAPACITY, settings.LOGIN_THROTTLE_PERIOD),
+)
@@ -0,0 +1,174 @@
+"""
+Signing and verification of the tokens minted by AuthResource
+
+The key files are parsed once when this module is loaded and the key objects are reused for every token, instead of
+PyJWT parsing the PEM strings again on each call.
+
+Every minted token carries a `kid` header, the RFC 7638 thumbprint of the key that signed it. The public keys are
+published as a JWK Set by JWKSResource so that other services can verify tokens without calling Membership.
+
+Keys are rotated by moving the old public key into `JWT_PREVIOUS_PUBLIC_KEY_FILES` when the signing key changes. The
+old key is still published and accepted until it is removed from that list, which should not happen before every token
+it signed has expired. While `JWT_VERIFY_RS256` is set, RS256 tokens signed with the original Membership key are also
+accepted, so the algorithm can be changed without invalidating tokens already in circulation.
+"""
+# stdlib
+import base64
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+# libs
+import jwt
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    load_pem_private_key,
+    load_pem_public_key,
+    PublicFormat,
+)
+from django.conf import settings
+
+
+__all__ = [
+    'decode_token',
+    'encode_token',
+    'JWKS',
+    'SIGNING_ALGORITHM',
+    'SIGNING_KEY_ID',
+]
+
+
+# Map of the name of each supported elliptic curve to its JWK `crv` and the algorithm that signs with it, per RFC 7518
+_EC_CURVES: Dict[str, Tuple[str, str]] = {
+    'secp256r1': ('P-256', 'ES256'),
+    'secp384r1': ('P-384', 'ES384'),
+    'secp521r1': ('P-521', 'ES512'),
+}
+
+
+def _check_curve(key, path: str):
+    """
+    Reject EC keys on a curve that has no JWS algorithm
+    """
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and key.curve.name not in _EC_CURVES:
+        raise ValueError(f'The EC key in {path} is on the unsupported curve {key.curve.name}')
+    return key
+
+
+def _load_private_key(path: str):
+    with open(path, 'rb') as f:
+        return _check_curve(load_pem_private_key(f.read(), password=None, backend=default_backend()), path)
+
+
+def _load_public_key(path: str):
+    with open(path, 'rb') as f:
+        return _check_curve(load_pem_public_key(f.read(), backend=default_backend()), path)
+
+
+def _b64(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b'=').decode()
+
+
+def _b64_int(value: int) -> str:
+    return _b64(value.to_bytes((value.bit_length() + 7) // 8 or 1, 'big'))
+
+
+def _algorithm(key) -> str:
+    """
+    The signing algorithm used with a public key of this type
+    """
+    if isinstance(key, rsa.RSAPublicKey):
+        return 'RS256'
+    if isinstance(key, ec.EllipticCurvePublicKey):
+        return _EC_CURVES[key.curve.name][1]
+    return 'EdDSA'
+
+
+def _jwk(key) -> Dict[str, str]:
+    """
+    The required members of the JWK for a public key, per RFC 7518 and RFC 8037
+    """
+    if isinstance(key, rsa.RSAPublicKey):
+        numbers = key.public_numbers()
+        return {'e': _b64_int(numbers.e), 'kty': 'RSA', 'n': _b64_int(numbers.n)}
+    if isinstance(key, ec.EllipticCurvePublicKey):
+        numbers = key.public_numbers()
+        # Each coordinate is the full size of the curve's field, e.g. 66 bytes for P-521
+        size = (key.curve.key_size + 7) // 8
+        return {
+            'crv': _EC_CURVES[key.curve.name][0],
+            'kty': 'EC',
+            'x': _b64(numbers.x.to_bytes(size, 'big')),
+            'y': _b64(numbers.y.to_bytes(size, 'big')),
+        }
+    return {'crv': 'Ed25519', 'kty': 'OKP', 'x': _b64(key.public_bytes(Encoding.Raw, PublicFormat.Raw))}
+
+
+def _thumbprint(jwk: Dict[str, str]) -> str:
+    """
+    RFC 7638 thumbprint of a JWK; the SHA-256 of its required members, sorted and without whitespace
+    """
+    canonical = json.dumps(jwk, sort_keys=True, separators=(',', ':'))
+    return _b64(hashlib.sha256(canonical.encode()).digest())
+
+
+SIGNING_ALGORITHM = settings.JWT_ALGORITHM
+_SIGNING_KEY = _load_private_key(settings.JWT_PRIVATE_KEY_FILE)
+if isinstance(_SIGNING_KEY, ec.EllipticCurvePrivateKey) and _algorithm(_SIGNING_KEY.public_key()) != SIGNING_ALGORITHM:
+    raise ValueError(f'JWT_ALGORITHM {SIGNING_ALGORITHM} cannot sign with a key on curve {_SIGNING_KEY.curve.name}')
+
+_public_keys = [(SIGNING_ALGORITHM, _SIGNING_KEY.public_key())]
+if settings.JWT_VERIFY_RS256 and SIGNING_ALGORITHM != 'RS256':
+    _public_keys.append(('RS256', _load_public_key(settings.PUBLIC_KEY_FILE)))
+for _path in settings.JWT_PREVIOUS_PUBLIC_KEY_FILES:
+    _key = _load_public_key(_path)
+    _public_keys.append((_algorithm(_key), _key))
+
+# Map of kid to the algorithm and public key used to verify tokens signed with it
+_VERIFICATION_KEYS: Dict[str, tuple] = {}
+# Map of algorithm to public key for tokens minted before kid headers were added, which may still be in circulation
+_LEGACY_KEYS: Dict[str, Any] = {}
+_jwks: List[Dict[str, str]] = []
+for _key_algorithm, _key in _public_keys:
+    _jwk_members = _jwk(_key)
+    _kid = _thumbprint(_jwk_members)
+    if _kid in _VERIFICATION_KEYS:
+        continue
+    _VERIFICATION_KEYS[_kid] = (_key_algorithm, _key)
+    _LEGACY_KEYS.setdefault(_key_algorithm, _key)
+    _jwks.append({**_jwk_members, 'alg': _key_algorithm, 'kid': _kid, 'use': 'sig'})
+
+SIGNING_KEY_ID = _thumbprint(_jwk(_public_keys[0][1]))
+# The JWK Set published by JWKSResource. The signing key is always first
+JWKS: Dict[str, List[Dict[str, str]]] = {'keys': _jwks}
+
+
+def encode_token(payload: Dict[str, Any]) -> str:
+    """
+    Sign a token for the payload with the current signing key
+    :param payload: The claims to put in the token
+    :return: The encoded token
+    """
+    return jwt.encode(payload, _SIGNING_KEY, algorithm=SIGNING_ALGORITHM, headers={'kid': SIGNING_KEY_ID})
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a token minted by Membership and return its claims
+    :param token: The encoded token
+    :raises jwt.PyJWTError: If the token is invalid, expired, or signed with a key that is not accepted
+    :return: The claims in the token
+    """
+    header = jwt.get_unverified_header(token)
+    kid: Optional[str] = header.get('kid')
+    # Only published keys are accepted, and only with their own algorithm, which rules out "none" and algorithm
+    # confusion
+    if kid is not None:
+        algorithm, key = _VERIFICATION_KEYS.get(kid, (None, None))
+    else:
+        algorithm = header.get('alg')
+        key = _LEGACY_KEYS.get(algorithm)
+    if key is None:
+        raise jwt.InvalidTokenError(f'Tokens signed with key {kid} using {header.get("alg")} are not accepted')
+    return jwt.decode(token, key, algorithms=[algorithm])
@@ -0,0 +1,126 @@
+"""
+In-process verification of TOTP codes
+
+When `OTP_VERIFICATION` is `local`, codes sent to AuthResource are checked against the User's own TOTP secret instead of
+with a call to the OTP service. Secrets are stored encrypted with `OTP_SECRET_KEY` and are only decrypted to check a
+code.
+
+A code is accepted for the current time step and `OTP_VALID_WINDOW` steps either side of it to allow for clock drift.
+Each accepted step is recorded in the shared Django cache until it leaves the window, so a code cannot be used twice.
+"""
+# stdlib
+import base64
+import binascii
+import hmac
+import time
+from typing import Optional
+# libs
+import pyotp
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.core.cache import cache
+
+
+__all__ = [
+    'check_totp',
+    'decrypt_secret',
+    'encrypt_secret',
+    'local_verification_enabled',
+    'valid_secret',
+    'verify_totp',
+]
+
+_fernet: Optional[Fernet] = Fernet(settings.OTP_SECRET_KEY) if settings.OTP_SECRET_KEY else None
+
+
+def local_verification_enabled() -> bool:
+    """
+    Check if TOTP codes should be verified in Membership rather than by the OTP service
+    """
+    return settings.OTP_VERIFICATION == 'local' and _fernet is not None
+
+
+def valid_secret(secret: str) -> bool:
+    """
+    Check that a secret is a base32 string that can be used to generate TOTP codes
+    """
+    try:
+        base64.b32decode(secret.upper() + '=' * (-len(secret) % 8))
+    except (binascii.Error, ValueError):
+        return False
+    return len(secret) >= 16
+
+
+def encrypt_secret(secret: str) -> str:
+    """
+    Encrypt a TOTP secret to be stored on a User
+    :raises RuntimeError: If no OTP_SECRET_KEY is configured
+    """
+    if _fernet is None:
+        raise RuntimeError('OTP_SECRET_KEY must be set to store TOTP secrets')
+    return _fernet.encrypt(secret.upper().encode()).decode()
+
+
+def decrypt_secret(encrypted: str) -> Optional[str]:
+    """
+    Decrypt a TOTP secret stored on a User
+    :return: The secret, or None if it cannot be decrypted with the configured key
+    """
+    if _fernet is None:
+        return None
+    try:
+        return _fernet.decrypt(encrypted.encode()).decode()
+    except InvalidToken:
+        return None
+
+
+def _matching_counter(totp: pyotp.TOTP, code: str) -> Optional[int]:
+    """
+    The time step within the valid window that a code was generated for, if any
+    """
+    window = settings.OTP_VALID_WINDOW
+    current = int(time.time()) // totp.interval
+    for counter in range(current - window, current + window + 1):
+        if hmac.compare_digest(totp.generate_otp(counter), str(code).zfill(totp.digits)):
+            return counter
+    return None
+
+
+def _used_key(user_id: int, counter: int) -> str:
+    return f'totp_used_{user_id}_{counter}'
+
+
+def check_totp(secret: str, code: str, user_id: Optional[int] = None) -> bool:
+    """
+    Check a TOTP code against a secret without recording it as used. Either the secret is not stored yet, and the code
+    confirms that the User's Authenticator App holds it, or the code is recorded with verify_totp once whatever it
+    authorises has been done.
+    :param secret: The base32 secret, unencrypted
+    :param code: The code sent by the User
+    :param user_id: The id of the User sending the code, to also reject a code the User has already used
+    :return: A flag stating whether the code is valid
+    """
+    counter = _matching_counter(pyotp.TOTP(secret.upper()), code)
+    if counter is None:
+        return False
+    return user_id is None or cache.get(_used_key(user_id, counter)) is None
+
+
+def verify_totp(user_id: int, encrypted_secret: str, code: str) -> bool:
+    """
+    Verify a TOTP code for a User and record it as used
+    :param user_id: The id of the User sending the code
+    :param encrypted_secret: The User's encrypted secret
+    :param code: The code sent by the User
+    :return: A flag stating whether the code is valid and has not been used before
+    """
+    secret = decrypt_secret(encrypted_secret)
+    if secret is None:
+        return False
+    totp = pyotp.TOTP(secret)
+    counter = _matching_counter(totp, code)
+    if counter is None:
+        return False
+    # add is atomic across workers, so only one request can claim each time step
+    window = settings.OTP_VALID_WINDOW
+    return cache.add(_used_key(user_id, counter), True, timeout=(2 * window + 1) * totp.interval)
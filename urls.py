@@ -48,6 +48,12 @@ urlpatterns = [
         name='auth_resource',
     ),
 
+    path(
+        'auth/jwks/',
+        views.JWKSResource.as_view(),
+        name='jwks_resource',
+    ),
+
     # CloudBill
     path(
         'cloud_bill/<int:address_id>/<int:target_address_id>/',
@@ -238,6 +244,12 @@ urlpatterns = [
         name='user_collection',
     ),
 
+    path(
+        'user/bulk/',
+        views.UserBulkResource.as_view(),
+        name='user_bulk_resource',
+    ),
+
     path(
         'user/<int:pk>/',
         views.UserResource.as_view(),
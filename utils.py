@@ -1,15 +1,25 @@
 # stdlib
-import crypt
-import hmac
+import atexit
 import logging
 from minio import Minio
+from typing import NamedTuple, Optional
 # lib
 import ldap3
+from ldap3.core.results import (
+    RESULT_ATTRIBUTE_OR_VALUE_EXISTS,
+    RESULT_ENTRY_ALREADY_EXISTS,
+    RESULT_NO_SUCH_ATTRIBUTE,
+    RESULT_NO_SUCH_OBJECT,
+    RESULT_SUCCESS,
+)
 from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 # local
+from membership.credentials import credential_cache
+from membership.hashing import hash_password, verify_password
+from membership.ldap_pool import LDAPConnectionPool
 from membership.models import AppSettings
 
 
@@ -17,18 +27,57 @@ class MinioError(Exception):
     pass
 
 
+class LDAPResult(NamedTuple):
+    """
+    The outcome of an LDAP write
+    """
+    # Whether the entry is now in the requested state
+    success: bool
+    # What was done to reach that state; created, exists, member_added, member_removed, deleted, password_updated,
+    # unchanged, not_found or failed
+    action: str
+    # The LDAP result code of the last operation sent
+    result_code: int
+    # The number of operations sent to LDAP
+    round_trips: int
+
+
 __all__ = [
     'clear_user_cache',
     'get_minio_client',
-    'ldap_add_memberuid',
     'ldap_auth',
-    'ldap_create',
-    'ldap_delete',
-    'ldap_exists',
-    'ldap_remove_memberuid',
-    'ldap_update_password',
+    'ldap_pool',
+    'ldap_remove_member',
+    'ldap_set_password',
+    'ldap_upsert_member',
+    'LDAPResult',
 ]
 
+OBJECT_CLASSES = ['account', 'extensibleObject']
+
+
+def _new_ldap_connection() -> ldap3.Connection:
+    """
+    Open and bind a new connection to the LDAP server for the pool
+    """
+    return ldap3.Connection(
+        ldap3.ServerPool([ldap3.Server(f'{settings.LDAP_URL}:389') for _ in range(5)], active=True, exhaust=False),
+        user=f'cn=admin,{settings.LDAP_DOMAIN_CONTROLLER}',
+        password=f'{settings.LDAP_PASSWORD}',
+        client_strategy=ldap3.SYNC,
+        auto_bind=ldap3.AUTO_BIND_NO_TLS,
+    )
+
+
+ldap_pool = LDAPConnectionPool(
+    _new_ldap_connection,
+    settings.LDAP_POOL_SIZE,
+    settings.LDAP_POOL_TIMEOUT,
+    settings.LDAP_POOL_HEALTH_CHECK_INTERVAL,
+)
+# Close the connections when the system closes
+atexit.register(ldap_pool.close)
+
 
 def clear_user_cache(user_id):
 
@@ -59,150 +108,188 @@ def get_minio_client() -> Minio:
     )
 
 
-def ldap_add_memberuid(email, member_id):
-    """
-    Update an existing LDAP account by adding another memberUid to it.
-    """
-    logger = logging.getLogger('membership.utils.ldap_add_memberuid')
-    conn = settings.LDAP_CONN
-
-    cn = f'cn={email},{settings.LDAP_DOMAIN_CONTROLLER}'
-    changes = {'memberUid': (ldap3.MODIFY_ADD, [member_id])}
-    success = conn.modify(cn, changes)
-
-    if not success:  # pragma: no cover
-        logger.error(
-            f'Error occurred when updating {email} with MemberUID {member_id} in LDAP. '
-            f'ERROR: {conn.last_error}',
-        )
-
-    return success
-
-
 def ldap_auth(email, password):
     """
     Verify sent crenditals are valid
+    Raises CryptPoolSaturated if the password cannot be checked right now
+    Raises LDAPPoolExhausted if no LDAP connection is free
     """
-    conn = settings.LDAP_CONN
-
     try:
         validate_email(email)
     except ValidationError:
         # An email address was not sent
         return False
 
-    if not conn.search(
-        search_base=settings.LDAP_DOMAIN_CONTROLLER,
-        search_filter=f'(&(uid={email}))',
-        attributes=['userPassword'],
-    ):
-        # Email not found
-        return False
-
-    crypted_password = conn.response[0]['attributes']['userPassword'][0]
+    # Repeat logins with credentials that were recently verified don't need to go to LDAP
+    version = credential_cache.version(email)
+    if credential_cache.check(email, password, version):
+        return True
+
+    with ldap_pool.connection() as conn:
+        if not conn.search(
+            search_base=settings.LDAP_DOMAIN_CONTROLLER,
+            search_filter=f'(&(uid={email}))',
+            attributes=['userPassword'],
+        ):
+            # Email not found
+            return False
+
+        crypted_password = conn.response[0]['attributes']['userPassword'][0]
     if type(crypted_password) == bytes:  # pragma: no cover
         # Uncovered because I'm not 100% sure when this happens but I've seen it happen so I know it does
         crypted_password = crypted_password.decode()
-    if not hmac.compare_digest(crypted_password, crypt.crypt(password, crypted_password)):
+    if not verify_password(password, crypted_password):
         # Incorrect password sent
         return False
 
+    credential_cache.store(email, password, crypted_password, version)
     return True
 
 
-def ldap_create(email, member_id, password):
-    """
-    Create an LDAP account
-    """
-    logger = logging.getLogger('membership.utils.ldap_create')
-
-    conn = settings.LDAP_CONN
-    cn = f'cn={email},{settings.LDAP_DOMAIN_CONTROLLER}'
-
-    object_classes = ['account', 'extensibleObject']
-    crypt_password = crypt.crypt(password, crypt.mksalt(crypt.METHOD_SHA512))
-    attrs = {
-        'uid': email,
-        'userPassword': crypt_password,
-        'memberUid': [member_id],
-    }
-    success = conn.add(cn, object_classes, attrs)
-
-    if not success:  # pragma: no cover
-        logger.error(
-            f'Error occurred when creating LDAP entry for {email} with MemberUID {member_id}. '
-            f'ERROR: {conn.last_error}',
-        )
-
-    return success
-
-
-def ldap_delete(email):
+def ldap_remove_member(
+        email: str,
+        member_id: int,
+        delete_entry: bool,
+        pool: LDAPConnectionPool = ldap_pool,
+) -> LDAPResult:
     """
-    Delete an LDAP account
+    Take a Member out of an LDAP account in a single round trip, without checking that the account exists first.
+    An account or memberUid that is already gone counts as removed.
+    :param email: The email of the account
+    :param member_id: The id of the Member to remove
+    :param delete_entry: Delete the whole account, as no other Member has a User with this email
+    :param pool: The pool to take a connection from
+    Raises LDAPPoolExhausted if no LDAP connection is free
     """
-    logger = logging.getLogger('membership.utils.ldap_create')
-    conn = settings.LDAP_CONN
+    logger = logging.getLogger('membership.utils.ldap_remove_member')
     cn = f'cn={email},{settings.LDAP_DOMAIN_CONTROLLER}'
 
-    success = conn.delete(cn)
-
-    if not success:  # pragma: no cover
-        logger.error(f'Error occurred when deleting LDAP entry for {email}. ERROR: {conn.last_error}')
-
-    return success
-
-
-def ldap_exists(email):
+    with pool.connection() as conn:
+        if delete_entry:
+            conn.delete(cn)
+            action = 'deleted'
+        else:
+            conn.modify(cn, {'memberUid': (ldap3.MODIFY_DELETE, [member_id])})
+            action = 'member_removed'
+        result_code = conn.result['result']
+        last_error = conn.last_error
+
+    if delete_entry:
+        # Invalidate after the write so that a concurrent login cannot cache the old credentials
+        credential_cache.invalidate(email)
+
+    if result_code == RESULT_SUCCESS:
+        return LDAPResult(True, action, result_code, 1)
+    if result_code in (RESULT_NO_SUCH_OBJECT, RESULT_NO_SUCH_ATTRIBUTE):
+        return LDAPResult(True, 'unchanged', result_code, 1)
+    logger.error(f'Error occurred when removing MemberUID {member_id} from {email} in LDAP. ERROR: {last_error}')
+    return LDAPResult(False, 'failed', result_code, 1)
+
+
+def ldap_set_password(
+        email: str,
+        member_id: int,
+        crypt_password: str,
+        pool: LDAPConnectionPool = ldap_pool,
+) -> LDAPResult:
     """
-    Check if an account for email exists in LDAP
+    Set the password of an LDAP account, creating the account for the Member if it doesn't exist.
+    The password is replaced first, and the account is only created if that fails with noSuchObject.
+    The password is hashed with hash_password by the caller, before anything is written to LDAP.
+    Connections are taken from pool, which the ldap_round_trips integrity test replaces to count the operations sent.
+    Raises LDAPPoolExhausted if no LDAP connection is free
     """
-    conn = settings.LDAP_CONN
-
-    exists = conn.search(
-        search_base=settings.LDAP_DOMAIN_CONTROLLER,
-        search_filter=f'(&(uid={email}))',
-    )
-
-    return exists
-
-
-def ldap_remove_memberuid(email, member_id):
-    """
-    Update an existing LDAP account by removing memberUid from it
-    """
-    logger = logging.getLogger('membership.utils.ldap_remove_memberuid')
-
-    conn = settings.LDAP_CONN
-
+    logger = logging.getLogger('membership.utils.ldap_set_password')
     cn = f'cn={email},{settings.LDAP_DOMAIN_CONTROLLER}'
-    remove_memberuid = {'memberUid': (ldap3.MODIFY_DELETE, [member_id])}
-    success = conn.modify(cn, remove_memberuid)
-
-    if not success:  # pragma: no cover
-        logger.error(
-            f'Error occurred when updating {email} to remove MemberUID {member_id} in LDAP. ERROR: {conn.last_error}',
-        )
-
-    return success
 
-
-def ldap_update_password(email, password):
+    with pool.connection() as conn:
+        conn.modify(cn, {'userPassword': (ldap3.MODIFY_REPLACE, [crypt_password])})
+        result_code = conn.result['result']
+        round_trips = 1
+        action = 'password_updated'
+        if result_code == RESULT_NO_SUCH_OBJECT:
+            conn.add(cn, OBJECT_CLASSES, {'uid': email, 'userPassword': crypt_password, 'memberUid': [member_id]})
+            result_code = conn.result['result']
+            round_trips += 1
+            action = 'created'
+        last_error = conn.last_error
+    # Invalidate after the write so that a concurrent login cannot cache the old credentials
+    credential_cache.invalidate(email)
+
+    if result_code == RESULT_SUCCESS:
+        return LDAPResult(True, action, result_code, round_trips)
+    logger.error(f'Error occurred when setting the password for {email} in LDAP. ERROR: {last_error}')
+    return LDAPResult(False, 'failed', result_code, round_trips)
+
+
+def ldap_upsert_member(
+        email: str,
+        member_id: int,
+        password: Optional[str] = None,
+        add_member: bool = True,
+        crypt_password: Optional[str] = None,
+        pool: LDAPConnectionPool = ldap_pool,
+) -> LDAPResult:
     """
-    Update the password for an existing LDAP account.
+    Make sure there is an LDAP account for the email that includes the Member, without checking that it exists first.
+    The memberUid is added to the account, and only on noSuchObject is the account created with the password, so the
+    password is only hashed when it is needed. Without a password the result is then not_found.
+    When add_member is False the account is looked up instead, and if it exists the memberUid is left for the caller
+    to add later, e.g. through the LDAP outbox, and the action is exists.
+    A password already hashed with hash_password can be sent as crypt_password instead.
+    Connections are taken from pool, which the ldap_round_trips integrity test replaces to count the operations sent.
+    Raises CryptPoolSaturated if the password cannot be hashed right now
+    Raises LDAPPoolExhausted if no LDAP connection is free
     """
-    logger = logging.getLogger('membership.utils.ldap_update_password')
-
-    conn = settings.LDAP_CONN
+    logger = logging.getLogger('membership.utils.ldap_upsert_member')
     cn = f'cn={email},{settings.LDAP_DOMAIN_CONTROLLER}'
 
-    crypt_password = crypt.crypt(password, crypt.mksalt(crypt.METHOD_SHA512))
-    update_password = {'userPassword': (ldap3.MODIFY_REPLACE, [crypt_password])}
-    success = conn.modify(cn, update_password)
-
-    if not success:  # pragma: no cover
+    with pool.connection() as conn:
+        if add_member:
+            conn.modify(cn, {'memberUid': (ldap3.MODIFY_ADD, [member_id])})
+            found = conn.result['result'] != RESULT_NO_SUCH_OBJECT
+        else:
+            found = conn.search(cn, '(objectClass=*)', search_scope=ldap3.BASE, attributes=['1.1'])
+        round_trips = 1
+        result_code = conn.result['result']
+        last_error = conn.last_error
+
+    if found:
+        if not add_member:
+            return LDAPResult(True, 'exists', result_code, round_trips)
+        if result_code == RESULT_SUCCESS:
+            return LDAPResult(True, 'member_added', result_code, round_trips)
+        if result_code == RESULT_ATTRIBUTE_OR_VALUE_EXISTS:
+            return LDAPResult(True, 'unchanged', result_code, round_trips)
         logger.error(
-            f'Error occurred when updating password for {email} in LDAP. ERROR: {conn.last_error}',
+            f'Error occurred when updating {email} with MemberUID {member_id} in LDAP. ERROR: {last_error}',
         )
-
-    return success
+        return LDAPResult(False, 'failed', result_code, round_trips)
+
+    if crypt_password is None:
+        if password is None:
+            return LDAPResult(False, 'not_found', result_code, round_trips)
+        # Hash after the connection is returned so that crypt doesn't hold one
+        crypt_password = hash_password(password)
+
+    with pool.connection() as conn:
+        conn.add(cn, OBJECT_CLASSES, {'uid': email, 'userPassword': crypt_password, 'memberUid': [member_id]})
+        round_trips += 1
+        result_code = conn.result['result']
+        if result_code == RESULT_ENTRY_ALREADY_EXISTS and add_member:
+            # Another request created the account since it was looked for
+            conn.modify(cn, {'memberUid': (ldap3.MODIFY_ADD, [member_id])})
+            round_trips += 1
+            result_code = conn.result['result']
+            if result_code in (RESULT_SUCCESS, RESULT_ATTRIBUTE_OR_VALUE_EXISTS):
+                return LDAPResult(True, 'member_added', result_code, round_trips)
+        last_error = conn.last_error
+
+    if result_code == RESULT_SUCCESS:
+        return LDAPResult(True, 'created', result_code, round_trips)
+    if result_code == RESULT_ENTRY_ALREADY_EXISTS:
+        return LDAPResult(True, 'exists', result_code, round_trips)
+    logger.error(
+        f'Error occurred when creating LDAP entry for {email} with MemberUID {member_id}. ERROR: {last_error}',
+    )
+    return LDAPResult(False, 'failed', result_code, round_trips)
@@ -8,6 +8,7 @@ from .country import CountryCollection, CountryResource
 from .currency import CurrencyCollection, CurrencyResource
 from .department import DepartmentCollection, DepartmentResource
 from .email_confirmation import EmailConfirmationResource
+from .jwks import JWKSResource
 from .language import LanguageCollection, LanguageResource
 from .member import MemberCollection, MemberResource
 from .member_link import MemberLinkCollection, MemberLinkResource
@@ -17,7 +18,7 @@ from .profile import ProfileCollection, ProfileResource
 from .team import TeamCollection, TeamResource
 from .territory import TerritoryCollection, TerritoryResource
 from .transaction_type import TransactionTypeCollection, TransactionTypeResource
-from .user import UserCollection, UserResource
+from .user import UserBulkResource, UserCollection, UserResource
 
 
 __all__ = [
@@ -57,6 +58,9 @@ __all__ = [
     # EmailConfirmationResource
     'EmailConfirmationResource',
 
+    # JWKS
+    'JWKSResource',
+
     # Language
     'LanguageCollection',
     'LanguageResource',
@@ -93,6 +97,7 @@ __all__ = [
     'TransactionTypeResource',
 
     # User
+    'UserBulkResource',
     'UserCollection',
     'UserResource',
 ]
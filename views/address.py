@@ -8,19 +8,26 @@ from cloudcix_rest.views import APIView
 from cloudcix_metrics import prepare_metrics, Metric
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import BooleanField, Prefetch, Value
+from django.db import transaction
+from django.db.models import BooleanField, Prefetch, Q, Value
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 # local
+from membership.address_link_index import address_link_index
 from membership.controllers import (
     AddressCreateController,
     AddressListController,
     AddressUpdateController,
 )
+from membership.fieldsets import Fieldset
 from membership.models import Address, AddressLink
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.address import Permissions
+from membership.records import address_records
+from membership.search import ranked_search
 from membership.serializers import AddressSerializer
+from membership.streaming import stream_list, streaming
 
 
 __all__ = [
@@ -53,26 +60,19 @@ class AddressCollection(APIView):
         with tracer.start_span('validating_controller', child_of=request.span) as span:
             controller = AddressListController(data=request.GET, request=request, span=span)
             controller.is_valid()
+            fieldset = Fieldset(AddressSerializer, request)
 
         kw = controller.cleaned_data['search']
         order = controller.cleaned_data['order']
         with tracer.start_span('get_objects', child_of=request.span) as span:
+            linked_filter = Q()
             try:
                 # User 1 can list all addresses
                 if request.user.id != 1:
                     with tracer.start_span('get_linked_address_ids', child_of=span):
-                        # Get the addresses that are linked to the User's for listing
-                        linked_address = set(AddressLink.objects.filter(
-                            address_id=request.user.address['id'],
-                        ).values_list(
-                            'contra_address_id',
-                            flat=True,
-                        ))
-                        if kw.get('id__in', False):
-                            id_set = {int(i) for i in kw['id__in']}
-                            kw['id__in'] = id_set & linked_address
-                        else:
-                            kw['id__in'] = linked_address
+                        # Only list the addresses that are linked to the User's. This is a subquery so the ids never
+                        # leave the database, and any id__in sent by the User is still applied on top of it
+                        linked_filter = Q(id__in=AddressLink.objects.linked_address_ids(request.user.address['id']))
 
                 with tracer.start_span('checking_search_filters', child_of=span):
                     # If the User is filtering by the Address Link table, we want to make sure they only filter on
@@ -88,19 +88,23 @@ class AddressCollection(APIView):
 
                 with tracer.start_span('retrieve_requested_objects', child_of=span):
                     # Get the list of Address objects
-                    objs = Address.objects.filter(
+                    objs = fieldset.queryset(Address.objects.all()).filter(
+                        linked_filter,
                         **kw,
                     ).exclude(
                         **controller.cleaned_data['exclude'],
-                    ).order_by(
-                        *controller.cleaned_data['order'],
                     ).annotate(linked=Value(True, BooleanField()))
+
+                with tracer.start_span('applying_text_search', child_of=span):
+                    # Best matches for `q` first, if it was sent
+                    objs, ordering = ranked_search(objs, request, order)
+                    objs = objs.order_by(*ordering)
             except (ValueError, ValidationError):
                 return Http400(error_code='membership_address_list_001')
 
         # Gather metadata
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
@@ -110,17 +114,48 @@ class AddressCollection(APIView):
                 'page': page,
                 'limit': limit,
                 'order': meta_order,
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': warnings,
             }
             # Pagination
-            objs = objs[page * limit:(page + 1) * limit]
+            # Full pages are read with .values() and serialized from light records instead of model instances
+            fast_path = settings.LIST_FAST_PATH and not fieldset.sparse
+            if fast_path:
+                objs = address_records.values(objs)
+            try:
+                # Included records are gathered from the whole page, so those lists are not streamed
+                if streaming(request) and len(fieldset.include) == 0:
+                    return stream_list(
+                        request,
+                        fieldset.serializer,
+                        objs,
+                        ordering,
+                        page,
+                        limit,
+                        metadata,
+                        address_records.records if fast_path else None,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    ordering,
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_address_list_002')
+            if fast_path:
+                objs = address_records.records(objs)
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
-            data = AddressSerializer(instance=objs, many=True).data
+            span.set_tag('num_objects', len(objs))
+            data = fieldset.serializer(instance=objs, many=True).data
+            response = {'content': data, '_metadata': metadata}
+            if len(fieldset.include) > 0:
+                response['included'] = fieldset.included(objs)
 
-        return Response({'content': data, '_metadata': metadata})
+        return Response(response)
 
     def post(self, request: Request) -> Response:
         """
@@ -150,35 +185,22 @@ class AddressCollection(APIView):
             if err is not None:
                 return err
 
-        # Save the Address object
-        with tracer.start_span('saving_object', child_of=request.span):
-            controller.instance.save()
+        # Save the Address object and create the necessary links to it, all or nothing
+        with transaction.atomic(using='membership'):
+            with tracer.start_span('saving_object', child_of=request.span):
+                controller.instance.save()
 
-        # Create the necessary links
-        # Self link
-        with tracer.start_span('creating_self_link', child_of=request.span):
-            AddressLink.objects.create(
-                address=controller.instance,
-                contra_address=controller.instance,
-                reference='Self Link',
-            )
+            # Links to the new Address from itself, the user's Address and the other Addresses in its Member, and back
+            with tracer.start_span('creating_address_links', child_of=request.span):
+                links = AddressLink.objects.link_new_address(controller.instance, request.user.address['id'])
+
+            # Every Address that is now linked to the new one must reload its links, once they are committed
+            address_ids = {link.address_id for link in links}
+            transaction.on_commit(lambda: address_link_index.invalidate(*address_ids), using='membership')
 
-        # Link the new address to the user's address
-        with tracer.start_span('creating_user_address_links', child_of=request.span):
-            link = AddressLink.objects.create(address_id=request.user.address['id'], contra_address=controller.instance)
-            AddressLink.objects.create(address=controller.instance, contra_address_id=request.user.address['id'])
-            # Serialize the link
-            controller.instance.link = link
-            controller.instance.linked = True
-
-        # Link the new address to the other addresses in it's member
-        with tracer.start_span('creating_member_address_links', child_of=request.span):
-            address_ids = Address.objects.filter(member=controller.instance.member).exclude(
-                pk__in=[controller.instance.pk, request.user.address['id']],
-            ).values_list('id', flat=True)
-            for a in address_ids:
-                AddressLink.objects.create(address_id=a, contra_address=controller.instance)
-                AddressLink.objects.create(address=controller.instance, contra_address_id=a)
+        # Serialize the link
+        controller.instance.link = links[0]
+        controller.instance.linked = True
 
         # Send a metric to indicate an Address record has been created
         prepare_metrics(lambda pk: Metric('address_create', pk, {}), pk=controller.instance.pk)
@@ -343,6 +365,7 @@ class VerboseAddressCollection(APIView):
         with tracer.start_span('validating_controller', child_of=request.span) as span:
             controller = AddressListController(data=request.GET, request=request, span=span)
             controller.is_valid()
+            fieldset = Fieldset(AddressSerializer, request)
 
         kw = controller.cleaned_data['search']
         order = controller.cleaned_data['order']
@@ -351,7 +374,7 @@ class VerboseAddressCollection(APIView):
                 with tracer.start_span('retrieve_requested_objects', child_of=span):
                     address_id = request.user.address['id']
                     # Get the list of Address objects
-                    objs = Address.objects.prefetch_related(Prefetch(
+                    objs = fieldset.queryset(Address.objects.all()).prefetch_related(Prefetch(
                         'address_link',
                         AddressLink.objects.filter(address_id=address_id, deleted__isnull=True),
                         to_attr='link',
@@ -360,15 +383,18 @@ class VerboseAddressCollection(APIView):
                         **kw,
                     ).exclude(
                         **controller.cleaned_data['exclude'],
-                    ).order_by(
-                        *controller.cleaned_data['order'],
                     ).annotate(linked=Value(True, BooleanField()))
+
+                with tracer.start_span('applying_text_search', child_of=span):
+                    # Best matches for `q` first, if it was sent
+                    objs, ordering = ranked_search(objs, request, order)
+                    objs = objs.order_by(*ordering)
             except (ValueError, ValidationError):
                 return Http400(error_code='membership_verbose_address_list_001')
 
         # Gather metadata
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
@@ -378,17 +404,30 @@ class VerboseAddressCollection(APIView):
                 'page': page,
                 'limit': limit,
                 'order': meta_order,
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': warnings,
             }
             # Pagination
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    ordering,
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_verbose_address_list_002')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             # Cast all the prefetched lists of Address Links to AddressLink objects
             for o in objs:
                 o.link = o.link[0]
-            data = AddressSerializer(instance=objs, many=True).data
+            data = fieldset.serializer(instance=objs, many=True).data
+            response = {'content': data, '_metadata': metadata}
+            if len(fieldset.include) > 0:
+                response['included'] = fieldset.included(objs)
 
-        return Response({'content': data, '_metadata': metadata})
+        return Response(response)
@@ -3,14 +3,16 @@ Management of links between Addresses
 """
 
 # libs
-from cloudcix_rest.exceptions import Http400, Http404
+from cloudcix_rest.exceptions import Http400, Http403, Http404
 from cloudcix_rest.views import APIView
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.request import Request
 
 # local
+from membership.address_link_index import address_link_index
 from membership.controllers import (
     AddressLinkCreateController,
     AddressLinkUpdateController,
@@ -72,19 +74,21 @@ class AddressLinkResource(APIView):
             controller.instance.contra_address = contra_address
 
         with tracer.start_span('saving_object', child_of=request.span):
-            controller.instance.save()
-
-        # Create the opposite link if it does not exist
-        with tracer.start_span('get_or_create_reverse_link', child_of=request.span) as span:
             try:
-                AddressLink.objects.get(
-                    address=contra_address,
-                    contra_address=address,
-                )
-                span.set_tag('action', 'get')  # pragma: no cover
-            except AddressLink.DoesNotExist:
-                AddressLink.objects.create(address=contra_address, contra_address=address, reference='')
-                span.set_tag('action', 'create')
+                with transaction.atomic(using='membership'):
+                    controller.instance.save()
+            except IntegrityError:
+                # Another request created the same link after the permissions were checked
+                return Http403(error_code='membership_address_link_create_202')
+
+        # Create the opposite link if it does not exist, in one INSERT ... ON CONFLICT DO NOTHING
+        with tracer.start_span('creating_reverse_link', child_of=request.span):
+            AddressLink.objects.create_links([(contra_address.pk, address.pk)], reference='')
+        # Both Addresses must reload their links, once they are committed
+        transaction.on_commit(
+            lambda: address_link_index.invalidate(address.pk, contra_address.pk),
+            using='membership',
+        )
 
         with tracer.start_span('serializing_data', child_of=request.span):
             data = AddressLinkSerializer(instance=controller.instance).data
@@ -15,19 +15,21 @@ from rest_framework.permissions import BasePermission
 from rest_framework.response import Response
 from rest_framework.request import Request
 # local
+from membership.credentials import credential_cache
+from membership.exceptions import Http429, Http503
+from membership.hashing import CryptPoolSaturated
+from membership.ldap_pool import LDAPPoolExhausted
 from membership.models import User
-from membership.utils import ldap_auth
+from membership.throttling import client_ip, login_throttle
+from membership.tokens import decode_token, encode_token
+from membership.totp import local_verification_enabled, verify_totp
+from membership.utils import ldap_auth, ldap_pool
 
 
 __all__ = [
     'AuthResource',
 ]
 
-with open(settings.PRIVATE_KEY_FILE) as f:
-    PRIVATE_KEY = f.read()
-with open(settings.PUBLIC_KEY_FILE) as f:
-    PUBLIC_KEY = f.read()
-
 
 class LoginPermission(BasePermission):
     """
@@ -75,6 +77,10 @@ class AuthResource(APIView):
                             $ref: '#/components/schemas/Auth'
             # Putting {} here means it will be completely populated with the defaults
             400: {}
+            429:
+                description: Too many login attempts were made for the email or from the client, try again later
+            503:
+                description: Too many passwords are being checked or LDAP is busy right now, try again shortly
 
         # Disable security on this method
         security: []
@@ -87,9 +93,30 @@ class AuthResource(APIView):
             if 'email' not in data or 'password' not in data:
                 return Http400(error_code='membership_token_create_001')
 
-        with tracer.start_span('verifying_credentials_in_ldap', child_of=request.span):
-            valid = ldap_auth(data['email'], data['password'])
+        # Turn away bursts of failed attempts before they reach LDAP
+        ip = client_ip(request)
+        with tracer.start_span('throttling_login', child_of=request.span) as span:
+            retry_after = login_throttle.check(str(data['email']), ip)
+            for name, value in login_throttle.stats().items():
+                span.set_tag(f'login_throttle_{name}', value)
+            if retry_after is not None:
+                return Http429(error_code='membership_token_create_010', retry_after=retry_after)
+
+        with tracer.start_span('verifying_credentials_in_ldap', child_of=request.span) as span:
+            try:
+                valid = ldap_auth(data['email'], data['password'])
+            except CryptPoolSaturated:
+                return Http503(error_code='membership_token_create_009')
+            except LDAPPoolExhausted:
+                return Http503(error_code='membership_token_create_011')
+            # Report the credential cache counters so it can be sized
+            for name, value in credential_cache.stats().items():
+                span.set_tag(f'credential_cache_{name}', value)
+            for name, value in ldap_pool.stats().items():
+                # Per connection counters are lists, which tags can't hold
+                span.set_tag(f'ldap_pool_{name}', str(value) if isinstance(value, list) else value)
             if not valid:
+                login_throttle.failed(str(data['email']), ip)
                 return Http400(error_code='membership_token_create_002')
 
         # At this point we know that the supplied details are valid.
@@ -100,20 +127,24 @@ class AuthResource(APIView):
         # At this point, check if a user with that email exists in the supplied Member
         with tracer.start_span('ensure_valid_api_key', child_of=request.span):
             try:
-                user = User.objects.values(
+                user = User.objects.with_email(
+                    data['email'],
+                ).values(
                     'pk',
                     'otp',
                     'first_otp',
+                    'otp_secret',
                 ).get(
-                    email__iexact=data['email'],
                     member__api_key=data['api_key'],
                 )
 
             except User.DoesNotExist:
-                # If the User doesn't exist in the Member, return a 400
+                # If the User doesn't exist in the Member, return a 400. Guessing api keys counts as a failed login
+                login_throttle.failed(str(data['email']), ip)
                 return Http400(error_code='membership_token_create_003')
 
-        # check if a user has otp, if they dont return an error which will then use the form
+        # check if a user has otp, if they dont return an error which will then use the form. Every wrong or invalid
+        # code counts as a failed login, so that the codes can't be guessed
         with tracer.start_span('checking_otp', child_of=request.span) as span:
             if user['otp'] and user['first_otp'] is not None:
                 if 'first_otp' not in data:
@@ -121,12 +152,14 @@ class AuthResource(APIView):
 
                 try:
                     if int(data['first_otp']) != user['first_otp']:
+                        login_throttle.failed(str(data['email']), ip)
                         return Http400(error_code='membership_token_create_005')
                 except(ValueError, TypeError):
+                    login_throttle.failed(str(data['email']), ip)
                     return Http400(error_code='membership_token_create_006')
 
                 # get user and update first otp of user to none
-                u = User.objects.get(email__iexact=data['email'], member__api_key=data['api_key'])
+                u = User.objects.get(pk=user['pk'])
                 u.first_otp = None
                 u.save()
 
@@ -138,18 +171,27 @@ class AuthResource(APIView):
                 try:
                     int(data['otp'])
                 except(ValueError, TypeError):
+                    login_throttle.failed(str(data['email']), ip)
                     return Http400(error_code='membership_token_create_008')
 
-                request_data = {
-                    'otp': data['otp'],
-                }
-                response = OTP.otp_auth.create(
-                    data=request_data,
-                    email=data['email'],
-                    span=span,
-                )
-                if response.status_code != 200:
-                    return Http400(error_code='membership_token_create_008')
+                if local_verification_enabled() and user['otp_secret'] is not None:
+                    span.set_tag('otp_verification', 'local')
+                    if not verify_totp(user['pk'], user['otp_secret'], data['otp']):
+                        login_throttle.failed(str(data['email']), ip)
+                        return Http400(error_code='membership_token_create_008')
+                else:
+                    span.set_tag('otp_verification', 'remote')
+                    request_data = {
+                        'otp': data['otp'],
+                    }
+                    response = OTP.otp_auth.create(
+                        data=request_data,
+                        email=data['email'],
+                        span=span,
+                    )
+                    if response.status_code != 200:
+                        login_throttle.failed(str(data['email']), ip)
+                        return Http400(error_code='membership_token_create_008')
         # Create a token and return it in the response
         # Token will contain the user id since there is a specific id for each user / member mapping
         with tracer.start_span('create_token', child_of=request.span):
@@ -157,7 +199,7 @@ class AuthResource(APIView):
                 'uid': user['pk'],
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=settings.TOKEN_VALID_HOURS),
             }
-            token = jwt.encode(payload, PRIVATE_KEY, algorithm='RS256')
+            token = encode_token(payload)
 
         return Response({'token': token}, status=status.HTTP_201_CREATED)
 
@@ -185,7 +227,7 @@ class AuthResource(APIView):
 
         with tracer.start_span('decode_token', child_of=request.span):
             try:
-                uid = jwt.decode(request.auth, PUBLIC_KEY, algorithms=['RS256'])['uid']
+                uid = decode_token(request.auth)['uid']
             except jwt.PyJWTError:  # pragma: no cover
                 # No cover because we should never get here anyway
                 return Http400(error_code='membership_token_update_001')
@@ -195,6 +237,6 @@ class AuthResource(APIView):
                 'uid': uid,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1),
             }
-            token = jwt.encode(payload, PRIVATE_KEY, algorithm='RS256')
+            token = encode_token(payload)
 
         return Response({'token': token})
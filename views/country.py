@@ -13,7 +13,9 @@ from rest_framework.response import Response
 # local
 from membership.controllers import CountryListController
 from membership.models import Country
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.serializers import CountrySerializer
+from membership.streaming import stream_list, streaming
 
 
 __all__ = [
@@ -72,12 +74,13 @@ class CountryCollection(APIView):
                 return Http400(error_code='membership_country_list_001')
 
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             order = controller.cleaned_data['order']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
             metadata = {
+                'count': count_mode,
                 'total_records': total_records,
                 'page': page,
                 'limit': limit,
@@ -85,10 +88,29 @@ class CountryCollection(APIView):
                 'warnings': warnings,
             }
             # Handle pagination
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        CountrySerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_country_list_002')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = CountrySerializer(instance=objs, many=True).data
 
         # Generate and return response
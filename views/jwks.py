@@ -0,0 +1,56 @@
+"""
+Publication of the public keys that verify Membership tokens
+"""
+
+# libs
+from cloudcix_rest.views import APIView
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+from rest_framework.response import Response
+# local
+from membership.tokens import JWKS
+
+
+__all__ = [
+    'JWKSResource',
+]
+
+
+class JWKSResource(APIView):
+    """
+    Publishes the keys used to sign tokens so that other services can verify them without calling Membership
+    """
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request: Request) -> Response:
+        """
+        summary: Read the JSON Web Key Set used to verify tokens
+
+        description: |
+            Returns the public keys that verify tokens created by the Auth service, in the JWK Set format of RFC 7517.
+            Each token has a `kid` header that matches the `kid` of the key that signed it. The key currently used to
+            sign tokens is first, followed by keys that have been rotated out but may still have tokens in
+            circulation.
+
+            The response can be cached for the time given in the Cache-Control header. A client that finds a token
+            with an unknown `kid` should fetch the set again, as the signing key may have been rotated.
+
+        responses:
+            200:
+                description: The JSON Web Key Set
+                # This view doesn't follow the Resource pattern
+                content:
+                    application/json:
+                        schema:
+                            type: object
+
+        # Disable security on this method
+        security: []
+        """
+        response = Response(JWKS)
+        patch_cache_control(response, public=True, max_age=settings.JWKS_MAX_AGE)
+        return response
@@ -3,7 +3,7 @@ Read-only services for data on Languages supported by CloudCIX
 """
 
 # libs
-from cloudcix_rest.exceptions import Http404
+from cloudcix_rest.exceptions import Http400, Http404
 from cloudcix_rest.views import APIView
 from django.conf import settings
 from rest_framework.permissions import BasePermission
@@ -12,7 +12,9 @@ from rest_framework.response import Response
 # local
 from membership.controllers import LanguageListController
 from membership.models import Language
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.serializers import LanguageSerializer
+from membership.streaming import stream_list, streaming
 
 
 __all__ = [
@@ -68,11 +70,12 @@ class LanguageCollection(APIView):
 
         # Generate the metadata
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
             metadata = {
+                'count': count_mode,
                 'total_records': total_records,
                 'page': page,
                 'limit': limit,
@@ -80,11 +83,30 @@ class LanguageCollection(APIView):
                 'warnings': warnings,
             }
             # Handle pagination
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        LanguageSerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_language_list_001')
 
         # Generate and return response
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = LanguageSerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
@@ -21,8 +21,10 @@ from membership.controllers import (
     MemberUpdateController,
 )
 from membership.models import Member, MemberLink
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.member import Permissions
 from membership.serializers import MemberSerializer
+from membership.streaming import stream_list, streaming
 
 __all__ = [
     'MemberCollection',
@@ -86,7 +88,7 @@ class MemberCollection(APIView):
                 return Http400(error_code='membership_member_list_001')
 
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
@@ -94,13 +96,33 @@ class MemberCollection(APIView):
                 'page': page,
                 'limit': limit,
                 'order': order,
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': warnings,
             }
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        MemberSerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_member_list_002')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = MemberSerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
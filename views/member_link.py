@@ -12,7 +12,9 @@ from rest_framework.response import Response
 # local
 from membership.controllers import MemberLinkListController
 from membership.models import Member, MemberLink
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.serializers import MemberLinkSerializer
+from membership.streaming import stream_list, streaming
 
 __all__ = [
     'MemberLinkCollection',
@@ -74,7 +76,7 @@ class MemberLinkCollection(APIView):
                 return Http400(error_code='membership_member_link_list_002')
 
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
@@ -82,13 +84,33 @@ class MemberLinkCollection(APIView):
                 'page': page,
                 'limit': limit,
                 'order': order,
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': warnings,
             }
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        MemberLinkSerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_member_link_list_003')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = MemberLinkSerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
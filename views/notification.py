@@ -1,21 +1,20 @@
 """
 Check receivers of Notifications in an Address for a specific Transaction
 """
-# stdlib
-from datetime import datetime
-from typing import Optional
 # libs
 from cloudcix_rest.views import APIView
-from cloudcix_rest.exceptions import Http404
+from cloudcix_rest.exceptions import Http400, Http404
 from django.conf import settings
-from django.db.models import Q
 from rest_framework.response import Response
 from rest_framework.request import Request
 # local
 from membership.controllers import UserListController
-from membership.models import Address, Notification, TransactionType, User
+from membership.models import Address, TransactionType, User
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.notification import Permissions
 from membership.serializers import UserSerializer
+from membership.streaming import stream_list, streaming
+from membership.visibility import expired_notified_users, notified_users
 
 __all__ = [
     'NotificationCollection',
@@ -78,54 +77,24 @@ class NotificationCollection(APIView):
             if err is not None:
                 return err
 
-        # Filter the notifications. Fetch users in the specified Address, and global active users in the Member
-        address_filter = Q(user__address=address) | Q(user__global_active=True, user__member=address.member)
-        with tracer.start_span('retrieving_notification_objects', child_of=request.span):
-            notifications = Notification.objects.filter(
-                address_filter,
-                transaction_type=transaction_type,
-            ).values_list(
-                'user_id',
-                flat=True,
-            )
-
         # Get the controller
         with tracer.start_span('validating_controller', child_of=request.span) as span:
             controller = UserListController(data=request.GET, request=request, span=span)
             controller.is_valid()
 
         with tracer.start_span('get_user_filters', child_of=span):
-            user_filtering: Optional[Q] = None
-            expired_user_filters = Q(
-                pk__in=notifications,
-                administrator=False,
-                expiry_date__lt=datetime.utcnow().date(),
-            )
-            # If Member is self-managed only return Administrators or users who are public and not expired
-            if address.member.self_managed:
-                user_filtering = Q(
-                    administrator=True,
-                ) | Q(
-                    expiry_date__gte=datetime.utcnow().date(),
-                    is_private=False,
-                )
-                expired_user_filters &= Q(is_private=False)
-            # If Member is not self-managed only return Administrators or users who have not expired.
-            else:
-                user_filtering = Q(
-                    administrator=True,
-                ) | Q(
-                    expiry_date__gte=datetime.utcnow().date(),
-                )
+            # Users in the specified Address and global active users in the Member who receive the notifications. If
+            # the Member is self-managed only return Administrators or users who are public and not expired, and if not
+            # only return Administrators or users who have not expired
+            args = (address.pk, address.member_id, transaction_type.pk, address.member.self_managed)
+            user_filtering = notified_users(*args)
+            expired_user_filters = expired_notified_users(*args)
 
         with tracer.start_span('retrieving_user_objects', child_of=request.span):
             objs = User.objects.filter(
-                pk__in=notifications,
+                user_filtering,
                 **controller.cleaned_data['search'],
-            )
-            if user_filtering is not None:
-                objs = objs.filter(user_filtering)
-            objs = objs.exclude(
+            ).exclude(
                 **controller.cleaned_data['exclude'],
             ).order_by(
                 controller.cleaned_data['order'],
@@ -142,17 +111,38 @@ class NotificationCollection(APIView):
         with tracer.start_span('generating_metadata', child_of=request.span):
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
+            total_records, count_mode = count_records(objs, request)
             metadata = {
                 'page': page,
                 'limit': limit,
                 'order': controller.cleaned_data['order'],
-                'total_records': objs.count(),
+                'count': count_mode,
+                'total_records': total_records,
                 'expired_users': expired_users,
             }
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        UserSerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_notification_list_003')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = UserSerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
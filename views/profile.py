@@ -14,8 +14,10 @@ from rest_framework.response import Response
 # local
 from membership.controllers import ProfileCreateController, ProfileListController, ProfileUpdateController
 from membership.models import Profile
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.profile import Permissions
 from membership.serializers import ProfileSerializer
+from membership.streaming import stream_list, streaming
 
 __all__ = [
     'ProfileCollection',
@@ -58,20 +60,40 @@ class ProfileCollection(APIView):
             )
 
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             metadata = {
                 'page': page,
                 'limit': limit,
                 'order': controller.cleaned_data['order'],
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': controller.warnings,
             }
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        ProfileSerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_profile_list_001')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = ProfileSerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
@@ -13,7 +13,9 @@ from rest_framework.response import Response
 # local
 from membership.controllers import SubdivisionListController
 from membership.models import Country, Subdivision
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.serializers import SubdivisionSerializer
+from membership.streaming import stream_list, streaming
 
 
 __all__ = [
@@ -87,22 +89,28 @@ class SubdivisionCollection(APIView):
         # Only create vars for things we use more than once (efficiency)
         # or that we need to save
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
-            # Handle pagination
-            objs = objs[page * limit:(page + 1) * limit]
             # Generate response data
             metadata = {
+                'count': count_mode,
                 'total_records': total_records,
                 'page': page,
                 'limit': limit,
                 'order': order,
                 'warnings': controller.warnings,
             }
+            # Handle pagination
+            try:
+                if streaming(request):
+                    return stream_list(request, SubdivisionSerializer, objs, order, page, limit, metadata)
+                objs, metadata['next_cursor'] = paginate(objs, order, page, limit, request.GET.get('cursor'))
+            except InvalidCursor:
+                return Http400(error_code='membership_subdivision_list_003')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = SubdivisionSerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
@@ -15,7 +15,9 @@ from rest_framework.response import Response
 from rest_framework.request import Request
 # local
 from membership.controllers import TeamCreateController, TeamListController, TeamUpdateController
+from membership.fieldsets import Fieldset
 from membership.models import Team, TeamUser
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.team import Permissions
 from membership.serializers import TeamSerializer
 
@@ -49,10 +51,11 @@ class TeamCollection(APIView):
         with tracer.start_span('validating_controller', child_of=request.span) as span:
             controller = TeamListController(data=request.GET, request=request, span=span)
             controller.is_valid()
+            fieldset = Fieldset(TeamSerializer, request)
 
         # No possible way for an error to be thrown here
         with tracer.start_span('retrieving_requested_objects', child_of=request.span):
-            objs = Team.list_objects.filter(
+            objs = fieldset.queryset(Team.list_objects.all()).filter(
                 member_id=request.user.member['id'],
                 **controller.cleaned_data['search'],
             ).exclude(
@@ -64,19 +67,33 @@ class TeamCollection(APIView):
         with tracer.start_span('generating_metadata', child_of=request.span):
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
+            total_records, count_mode = count_records(objs, request)
             metadata = {
                 'page': page,
                 'limit': limit,
                 'order': controller.cleaned_data['order'],
-                'total_records': objs.count(),
+                'count': count_mode,
+                'total_records': total_records,
             }
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_team_list_001')
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
-            data = TeamSerializer(instance=objs, many=True).data
+            span.set_tag('num_objects', len(objs))
+            data = fieldset.serializer(instance=objs, many=True).data
+            response = {'content': data, '_metadata': metadata}
+            if len(fieldset.include) > 0:
+                response['included'] = fieldset.included(objs)
 
-        return Response({'content': data, '_metadata': metadata})
+        return Response(response)
 
     def post(self, request: Request) -> Response:
         """
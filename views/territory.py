@@ -18,8 +18,10 @@ from membership.controllers import (
     TerritoryUpdateController,
 )
 from membership.models import Territory
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.territory import Permissions
 from membership.serializers import TerritorySerializer
+from membership.streaming import stream_list, streaming
 
 
 __all__ = [
@@ -68,7 +70,7 @@ class TerritoryCollection(APIView):
 
         # Gather the metadata
         with tracer.start_span('generating_metadata', child_of=request.span):
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
@@ -76,15 +78,35 @@ class TerritoryCollection(APIView):
                 'page': page,
                 'limit': limit,
                 'order': order,
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': warnings,
             }
             # Pagination
-            objs = objs[page * limit:(page + 1) * limit]
+            try:
+                if streaming(request):
+                    return stream_list(
+                        request,
+                        TerritorySerializer,
+                        objs,
+                        controller.cleaned_data['order'],
+                        page,
+                        limit,
+                        metadata,
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    controller.cleaned_data['order'],
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_territory_list_001')
 
         # Generate and return the Response
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
+            span.set_tag('num_objects', len(objs))
             data = TerritorySerializer(instance=objs, many=True).data
 
         return Response({'content': data, '_metadata': metadata})
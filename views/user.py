@@ -2,8 +2,8 @@
 Manage Users
 """
 # stdlib
-from datetime import datetime
-from typing import Optional
+from functools import partial
+from typing import List, Optional, Tuple
 
 # libs
 from cloudcix_rest.exceptions import Http400, Http404
@@ -11,41 +11,70 @@ from cloudcix_rest.views import APIView
 from cloudcix_metrics import prepare_metrics, Metric
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.db.models import Q
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 # local
+from membership.address_link_index import address_link_index
 from membership.controllers import (
     UserCreateController,
     UserListController,
     UserUpdateController,
 )
+from membership.exceptions import Http503
+from membership.fieldsets import Fieldset
+from membership.hashing import CryptPoolSaturated, hash_password
+from membership.ldap_outbox import enqueue
+from membership.ldap_pool import LDAPPoolExhausted
 from membership.models import (
     AddressLink,
+    LDAPOutbox,
     Notification,
     User,
 )
 from membership.notifications import EmailConfirmationEmail as Email
+from membership.pagination import count_records, InvalidCursor, paginate
 from membership.permissions.user import Permissions
+from membership.records import user_records
+from membership.search import ranked_search
 from membership.serializers import UserSerializer
+from membership.streaming import stream_list, streaming
+from membership.totp import verify_totp
 from membership.utils import (
     clear_user_cache,
-    ldap_add_memberuid,
-    ldap_create,
-    ldap_delete,
-    ldap_exists,
-    ldap_remove_memberuid,
-    ldap_update_password,
+    ldap_remove_member,
+    ldap_set_password,
+    ldap_upsert_member,
 )
+from membership.visibility import visible_users
 
 
 __all__ = [
+    'UserBulkResource',
     'UserCollection',
     'UserResource',
 ]
 
 
+def _prepare(request: Request, fast_path: bool, objs: List) -> List:
+    """
+    Get a page of Users ready to serialize, building the records for the fast path from the .values() rows, and hiding
+    first_otp unless the requesting User is an administrator in the same Member
+    """
+    if fast_path:
+        objs = user_records.records(objs)
+    if not request.user.administrator:
+        for obj in objs:
+            obj.first_otp = None
+    else:
+        for obj in objs:
+            if request.user.member != obj.member_id:
+                obj.first_otp = None
+    return objs
+
+
 class UserCollection(APIView):
     """
     Handles methods regarding User records that do not require an id to be specified, i.e. list, create
@@ -69,6 +98,7 @@ class UserCollection(APIView):
         with tracer.start_span('validating_controller', child_of=request.span) as span:
             controller = UserListController(data=request.GET, request=request, span=span)
             controller.is_valid()
+            fieldset = Fieldset(UserSerializer, request)
 
         with tracer.start_span('get_objects', child_of=request.span) as span:
             user_filtering: Optional[Q] = None
@@ -76,44 +106,15 @@ class UserCollection(APIView):
             try:
                 with tracer.start_span('get_linked_address_ids', child_of=span):
                     if request.user.id != 1:
-                        # If not, filter by linked Addresses instead
-                        linked_address_ids = set(AddressLink.objects.filter(
-                            address_id=request.user.address['id'],
-                        ).values_list(
-                            'contra_address_id',
-                            flat=True,
-                        ))
-                        # Check if the User has already specified some ids to filter by
-                        key = 'address_id__in'
-                        if key in search:
-                            set_ids = {int(i) for i in search[key]}
-                            search[key] = set_ids & linked_address_ids
-                        else:
-                            search[key] = linked_address_ids
-
-                        with tracer.start_span('get_active_public_users_for_partner_addresses', child_of=span):
-                            # Return users who are;
-                            # a) All Administrators
-                            # b) All users in requesting users Member
-                            # c) All users in non self-managed Partner Members
-                            # c) Public users in self-managed Partner Members who have not expired
-                            user_filtering = Q(
-                                administrator=True,
-                            ) | Q(
-                                member_id=request.user.member['id'],
-                            ) | Q(
-                                member__self_managed=False,
-                            ) | Q(
-                                expiry_date__gte=datetime.utcnow().date(),
-                                is_private=False,
-                                member__self_managed=True,
-                            )
+                        # If not, only the Users in linked Addresses who are visible to the User. Any address_id__in
+                        # sent by the User is still applied on top of it
+                        user_filtering = visible_users(request.user.address['id'], request.user.member['id'])
 
                 with tracer.start_span('retrieving_requested_objects', child_of=span):
                     # Get the list of User objects
                     order = controller.cleaned_data['order']
 
-                    objs = User.objects.filter(
+                    objs = fieldset.queryset(User.objects.all()).filter(
                         **search,
                     )
 
@@ -122,9 +123,12 @@ class UserCollection(APIView):
 
                     objs = objs.exclude(
                         **controller.cleaned_data['exclude'],
-                    ).order_by(
-                        order,
                     )
+
+                with tracer.start_span('applying_text_search', child_of=span):
+                    # Best matches for `q` first, if it was sent
+                    objs, ordering = ranked_search(objs, request, order)
+                    objs = objs.order_by(*ordering)
             except (ValueError, ValidationError):
                 return Http400(error_code='membership_user_list_001')
 
@@ -133,31 +137,54 @@ class UserCollection(APIView):
             page = controller.cleaned_data['page']
             limit = controller.cleaned_data['limit']
             warnings = controller.warnings
-            total_records = objs.count()
+            total_records, count_mode = count_records(objs, request)
             metadata = {
                 'page': page,
                 'limit': limit,
                 'order': order,
+                'count': count_mode,
                 'total_records': total_records,
                 'warnings': warnings,
             }
             # Pagination
-            objs = objs[page * limit:(page + 1) * limit]
+            # Full pages are read with .values() and serialized from light records instead of model instances
+            fast_path = settings.LIST_FAST_PATH and not fieldset.sparse
+            if fast_path:
+                objs = user_records.values(objs)
+            try:
+                # Included records are gathered from the whole page, so those lists are not streamed
+                if streaming(request) and len(fieldset.include) == 0:
+                    return stream_list(
+                        request,
+                        fieldset.serializer,
+                        objs,
+                        ordering,
+                        page,
+                        limit,
+                        metadata,
+                        partial(_prepare, request, fast_path),
+                    )
+                objs, metadata['next_cursor'] = paginate(
+                    objs,
+                    ordering,
+                    page,
+                    limit,
+                    request.GET.get('cursor'),
+                )
+            except InvalidCursor:
+                return Http400(error_code='membership_user_list_002')
 
         with tracer.start_span('checking_administrator', child_of=request.span):
-            if not request.user.administrator:
-                for obj in objs:
-                    obj.first_otp = None
-            else:
-                for obj in objs:
-                    if request.user.member != obj.member_id:
-                        obj.first_otp = None
+            objs = _prepare(request, fast_path, objs)
 
         with tracer.start_span('serializing_data', child_of=request.span) as span:
-            span.set_tag('num_objects', objs.count())
-            data = UserSerializer(instance=objs, many=True).data
+            span.set_tag('num_objects', len(objs))
+            data = fieldset.serializer(instance=objs, many=True).data
+            response = {'content': data, '_metadata': metadata}
+            if len(fieldset.include) > 0:
+                response['included'] = fieldset.included(objs)
 
-        return Response({'content': data, '_metadata': metadata})
+        return Response(response)
 
     def post(self, request: Request) -> Response:
         """
@@ -171,6 +198,8 @@ class UserCollection(APIView):
                 description: User record was created successfully
             400: {}
             403: {}
+            503:
+                description: Too many passwords are being hashed or LDAP is busy right now, try again shortly
         """
         tracer = settings.TRACER
 
@@ -194,27 +223,29 @@ class UserCollection(APIView):
                 controller.instance.global_user = True
 
         # Modify the LDAP DB, either create the user outright, or update their existing entry to add another member id
-        with tracer.start_span('modifying_LDAP', child_of=request.span):
-            create_user = True
-            # If we're testing, we might not need to create anything
-            if settings.TESTING:
-                conn = settings.LDAP_CONN
-                create_user = not conn.search(
-                    search_base=settings.LDAP_DOMAIN_CONTROLLER,
-                    search_filter=f'(&(uid={controller.instance.email})(memberUid={controller.instance.member.id}))',
+        with tracer.start_span('modifying_LDAP', child_of=request.span) as span:
+            try:
+                result = ldap_upsert_member(
+                    controller.instance.email,
+                    controller.instance.member.id,
+                    password,
+                    add_member=not settings.LDAP_WRITE_BEHIND,
                 )
-            if create_user:
-                if ldap_exists(controller.instance.email):
-                    # LDAP entry exist for email so we will update it with the member_id
-                    success = ldap_add_memberuid(controller.instance.email, controller.instance.member.id)
-                else:
-                    # Create new LDAP entry
-                    success = ldap_create(controller.instance.email, controller.instance.member.id, password)
-                if not success:  # pragma: no cover
-                    return Http400(error_code='membership_user_create_001')
+            except CryptPoolSaturated:
+                return Http503(error_code='membership_user_create_003')
+            except LDAPPoolExhausted:
+                return Http503(error_code='membership_user_create_004')
+            span.set_tag('ldap_action', result.action)
+            span.set_tag('ldap_round_trips', result.round_trips)
+            if not result.success:  # pragma: no cover
+                return Http400(error_code='membership_user_create_001')
 
         with tracer.start_span('saving_object', child_of=request.span):
-            controller.instance.save()
+            with transaction.atomic(using='membership'):
+                controller.instance.save()
+                if result.action == 'exists':
+                    # The ldap_outbox command adds the memberUid once this is committed
+                    enqueue(LDAPOutbox.ADD, controller.instance.email, controller.instance.member.id)
 
         # Set up notifications for the User
         with tracer.start_span('adding_notifications_to_user', child_of=request.span):
@@ -293,13 +324,12 @@ class UserResource(APIView):
         # Get the address link object to populate the User's Address serializer
         with tracer.start_span('retrieving_address_link_object', child_of=request.span):
             obj.address.link = None
-            try:
-                obj.address.link = AddressLink.objects.get(
+            # Only query for the link when the index says there is one
+            if address_link_index.is_linked(request.user.address['id'], obj.address_id):
+                obj.address.link = AddressLink.objects.filter(
                     address_id=request.user.address['id'],
                     contra_address=obj.address,
-                )
-            except AddressLink.DoesNotExist:
-                pass
+                ).first()
 
         with tracer.start_span('checking_permissions', child_of=request.span):
             err = Permissions.read(request, obj)
@@ -336,6 +366,8 @@ class UserResource(APIView):
             400: {}
             403: {}
             404: {}
+            503:
+                description: Too many passwords are being hashed or LDAP is busy right now, try again shortly
         """
         tracer = settings.TRACER
 
@@ -351,6 +383,7 @@ class UserResource(APIView):
         current_email = obj.email
         current_administrator = obj.administrator
         current_robot = obj.robot
+        current_otp_secret = obj.otp_secret
 
         # Validate the user input
         with tracer.start_span('validating_controller', child_of=request.span) as span:
@@ -366,6 +399,8 @@ class UserResource(APIView):
 
         # Retrieve the new password (if any)
         password = controller.cleaned_data.pop('password', None)
+        # and the code from the stored OTP secret that authorised replacing or removing it (if any)
+        current_otp_code = controller.cleaned_data.pop('current_otp_code', None)
 
         # Check the permission for the update
         with tracer.start_span('checking_permissions', child_of=request.span):
@@ -382,65 +417,76 @@ class UserResource(APIView):
             if err is not None:
                 return err
 
-        update_password = False
-
-        if password is not None:
-            update_password = True
+        # A user can only change their own password or a super user can
+        update_password = password is not None and (
+            request.user.id == obj.pk or request.user.id == 1 or obj.member.secret
+        )
 
         email_changed = controller.instance.email != current_email
-        if email_changed:
-            # User's email needs to be changed in LDAP
-            with tracer.start_span('modifying_LDAP', child_of=request.span):
-
-                add_memberuid = False
-                create_new_ldap = False
-                delete_current_ldap = False
-                remove_memberuid = False
-
-                if ldap_exists(current_email):
-                    if User.objects.filter(email=current_email).exclude(pk=obj.pk).exists():
-                        # If current email is in LDAP and in other members, remove member_id from LDAP entry.
-                        remove_memberuid = True
-                    else:
-                        # If current email is not in other members, LDAP entry will be deleted.
-                        delete_current_ldap = True
-
-                if ldap_exists(controller.instance.email):
-                    # If new email is in LDAP, add member_id to LDAP entry
-                    add_memberuid = True
-                else:
-                    # New email is not in LDAP so a new LDAP entry will be created
-                    create_new_ldap = True
-
-                if create_new_ldap:
-                    if not update_password:
+        # Hash the password before anything is written to LDAP, so that a saturated crypt pool leaves LDAP unchanged
+        crypt_password = None
+        if password is not None and (email_changed or update_password):
+            with tracer.start_span('hashing_password', child_of=request.span):
+                try:
+                    crypt_password = hash_password(password)
+                except CryptPoolSaturated:
+                    return Http503(error_code='membership_user_update_004')
+
+        ldap_round_trips = 0
+        # memberUid changes to write to LDAP after the User is saved, when LDAP_WRITE_BEHIND is set or LDAP is busy
+        outbox: List[Tuple[str, str]] = []
+        try:
+            if email_changed:
+                # User's email needs to be changed in LDAP
+                with tracer.start_span('modifying_LDAP', child_of=request.span):
+                    # Add the Member to the entry for the new email, creating it with the sent password if it doesn't
+                    # exist
+                    with tracer.start_span('upsert_ldap_entry', child_of=request.span) as span:
+                        result = ldap_upsert_member(
+                            controller.instance.email,
+                            obj.member_id,
+                            add_member=not settings.LDAP_WRITE_BEHIND,
+                            crypt_password=crypt_password,
+                        )
+                        span.set_tag('ldap_action', result.action)
+                    ldap_round_trips += result.round_trips
+
+                    if result.action == 'not_found':
+                        # A new LDAP entry cannot be created without a password
                         return Http404(error_code='membership_user_update_002')
-                    with tracer.start_span('create_ldap_entry', child_of=request.span):
-                        success = ldap_create(controller.instance.email, obj.member_id, password)
-                    update_password = False
-
-                    if not success:  # pragma: no cover
+                    if not result.success:  # pragma: no cover
                         return Http400(error_code='membership_user_update_003')
+                    if result.action == 'created':
+                        update_password = False
+                    elif result.action == 'exists':
+                        outbox.append((LDAPOutbox.ADD, controller.instance.email))
 
-                if add_memberuid:
-                    with tracer.start_span('ldap_entry_add_memberuid', child_of=request.span):
-                        ldap_add_memberuid(controller.instance.email, obj.member_id)
-                if remove_memberuid:
-                    with tracer.start_span('ldap_entry_remove_memberuid', child_of=request.span):
-                        ldap_remove_memberuid(current_email, obj.member_id)
-                if delete_current_ldap:
-                    with tracer.start_span('delete_ldap_entry', child_of=request.span):
-                        ldap_delete(current_email)
-
-        if update_password:
-            if request.user.id == obj.pk or request.user.id == 1 or obj.member.secret:
+            if update_password:
+                # If the email is not in LDAP, an entry is created for it
                 with tracer.start_span('updating_password', child_of=request.span):
-                    if ldap_exists(controller.instance.email):
-                        # A user can only change their own password or a super user can
-                        ldap_update_password(controller.instance.email, password)
-                    else:
-                        # Email for password, not in LDAP - create
-                        ldap_create(controller.instance.email, obj.member_id, password)
+                    result = ldap_set_password(controller.instance.email, obj.member_id, crypt_password)
+                ldap_round_trips += result.round_trips
+        except LDAPPoolExhausted:
+            return Http503(error_code='membership_user_update_005')
+
+        if email_changed:
+            # Remove the Member from the entry for the current email last, so that the User can still log in with it if
+            # anything before this failed. If the email is not in other members, the LDAP entry will be deleted.
+            if settings.LDAP_WRITE_BEHIND:
+                outbox.append((LDAPOutbox.REMOVE, current_email))
+            else:
+                delete_current_ldap = not User.objects.with_email(current_email).exclude(pk=obj.pk).exists()
+                with tracer.start_span('remove_ldap_entry', child_of=request.span) as span:
+                    try:
+                        result = ldap_remove_member(current_email, obj.member_id, delete_current_ldap)
+                        span.set_tag('ldap_action', result.action)
+                        ldap_round_trips += result.round_trips
+                    except LDAPPoolExhausted:
+                        # The new entry has already been written, so leave the removal to the ldap_outbox command
+                        span.set_tag('ldap_action', 'deferred')
+                        outbox.append((LDAPOutbox.REMOVE, current_email))
+
+        request.span.set_tag('ldap_round_trips', ldap_round_trips)
 
         send_email_confirmation = request.data.get('send_email_confirmation', None)
         verify_email = False
@@ -454,7 +500,17 @@ class UserResource(APIView):
                     verify_email = True
 
         with tracer.start_span('saving_object', child_of=request.span):
-            controller.instance.save()
+            with transaction.atomic(using='membership'):
+                controller.instance.save()
+                # The ldap_outbox command writes these once this is committed
+                for action, email in outbox:
+                    enqueue(action, email, obj.member_id)
+                if current_otp_code is not None:
+                    # Record the code as used only once the new secret is saved
+                    transaction.on_commit(
+                        lambda: verify_totp(obj.pk, current_otp_secret, current_otp_code),
+                        using='membership',
+                    )
 
         # Set up notifications for the User
         with tracer.start_span('adding_notifications_to_user', child_of=request.span):
@@ -507,3 +563,123 @@ class UserResource(APIView):
         Attempt to partially update a User record
         """
         return self.put(request, pk, True)
+
+
+def _bulk_ids(value) -> Optional[List[int]]:
+    """
+    Parse the sent ids, either a comma separated string or a list, into a list of distinct ids in the order they were
+    sent. Returns None if any of them is not an integer.
+    """
+    if isinstance(value, str):
+        value = [pk.strip() for pk in value.split(',') if pk.strip() != '']
+    if not isinstance(value, list):
+        return None
+    ids: List[int] = []
+    for pk in value:
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        if pk not in ids:
+            ids.append(pk)
+    return ids
+
+
+class UserBulkResource(APIView):
+    """
+    Handles reading many User records by id in one request
+    """
+
+    def get(self, request: Request) -> Response:
+        """
+        summary: Read the details of many User records
+
+        description: |
+            Attempt to read the User records with the ids in the `ids` parameter. Each id is checked the same way as
+            reading a single User, and the result for each one is returned in the order the ids were sent.
+
+        parameters:
+            - name: ids
+              in: query
+              description: A comma separated list of the ids of the User records to read
+              required: true
+              type: string
+
+        responses:
+            200:
+                description: |
+                    A list with an entry for each id, with its `status` and either the User's `content` or the
+                    `error_code` and `detail` that reading it on its own would have returned
+            400: {}
+        """
+        return self._read(request, request.GET.get('ids'))
+
+    def post(self, request: Request) -> Response:
+        """
+        summary: Read the details of many User records
+
+        description: |
+            The same as the GET method, with the ids sent as a list in the `ids` key of the request body, for lists
+            too long for a URL.
+
+        responses:
+            200:
+                description: |
+                    A list with an entry for each id, with its `status` and either the User's `content` or the
+                    `error_code` and `detail` that reading it on its own would have returned
+            400: {}
+        """
+        # A body that is not an object, e.g. a bare list, has no ids key and gets the same 400 as missing ids
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        return self._read(request, ids)
+
+    def _read(self, request: Request, ids) -> Response:
+        tracer = settings.TRACER
+
+        with tracer.start_span('validating_ids', child_of=request.span):
+            ids = _bulk_ids(ids)
+            if not ids:
+                return Http400(error_code='membership_user_bulk_read_001')
+            if len(ids) > settings.USER_BULK_READ_LIMIT:
+                return Http400(error_code='membership_user_bulk_read_002')
+
+        with tracer.start_span('retrieving_requested_objects', child_of=request.span):
+            objs = User.objects.filter(pk__in=ids)
+            if settings.LIST_FAST_PATH:
+                objs = user_records.records(user_records.values(objs))
+            users = {obj.pk: obj for obj in objs}
+
+        # Get the requesting User's links to all of the Users' Addresses at once
+        with tracer.start_span('retrieving_address_link_objects', child_of=request.span):
+            links = {
+                link.contra_address_id: link
+                for link in AddressLink.objects.filter(
+                    address_id=request.user.address['id'],
+                    contra_address_id__in={obj.address_id for obj in users.values()},
+                )
+            }
+
+        with tracer.start_span('checking_permissions', child_of=request.span):
+            results = []
+            for pk in ids:
+                obj = users.get(pk)
+                if obj is None:
+                    err = Http404(error_code='membership_user_read_001')
+                    results.append({'id': pk, 'status': err.status_code, **err.data})
+                    continue
+                obj.address.link = links.get(obj.address_id)
+                err = Permissions.read(request, obj)
+                if err is not None:
+                    results.append({'id': pk, 'status': err.status_code, **err.data})
+                    continue
+                obj.address.linked = obj.address.link is not None
+                if not request.user.administrator or request.user.member['id'] != obj.member_id:
+                    obj.first_otp = None
+                results.append({'id': pk, 'status': status.HTTP_200_OK, 'content': obj})
+
+        with tracer.start_span('serializing_data', child_of=request.span):
+            for result in results:
+                if 'content' in result:
+                    result['content'] = UserSerializer(instance=result['content']).data
+
+        return Response({'content': results})
@@ -0,0 +1,97 @@
+"""
+Filters for the Users that can be seen in the User and Notification lists
+
+The views and the PINNED_PLANS of `membership.management.plans` build their queries from these, so that the plans
+checked by the `query_plans` integrity test are the plans of the queries the views send.
+"""
+# stdlib
+from datetime import datetime
+# libs
+from django.db.models import Q, QuerySet
+# local
+from membership.models import AddressLink, Notification
+
+
+__all__ = [
+    'expired_notified_users',
+    'notified_user_ids',
+    'notified_users',
+    'visible_users',
+]
+
+
+def visible_users(address_id: int, member_id: int) -> Q:
+    """
+    The Users in the User list of a User who is not the superuser. These are the Users in the Addresses linked to the
+    User's, who are;
+    a) Administrators
+    b) In the User's Member
+    c) In Members that are not self managed
+    d) Public in self managed Members, and have not expired
+    The linked Addresses are a subquery so the ids never leave the database.
+    :param address_id: The id of the requesting User's Address
+    :param member_id: The id of the requesting User's Member
+    """
+    return Q(address_id__in=AddressLink.objects.linked_address_ids(address_id)) & (Q(
+        administrator=True,
+    ) | Q(
+        member_id=member_id,
+    ) | Q(
+        member__self_managed=False,
+    ) | Q(
+        expiry_date__gte=datetime.utcnow().date(),
+        is_private=False,
+        member__self_managed=True,
+    ))
+
+
+def notified_user_ids(address_id: int, member_id: int, transaction_type_id: int) -> QuerySet:
+    """
+    The ids of the Users who receive the Notifications of a Transaction Type for an Address, as a subquery. These are
+    the Users in the Address and the global active Users in its Member. Deleted Users are left out here, as they are
+    from the User lists, so that the user_live_member_global index can serve the global active Users.
+    :param address_id: The id of the Address
+    :param member_id: The id of the Address' Member
+    :param transaction_type_id: The id of the Transaction Type
+    """
+    return Notification.objects.filter(
+        Q(user__address_id=address_id) | Q(user__global_active=True, user__member_id=member_id),
+        transaction_type_id=transaction_type_id,
+        user__deleted__isnull=True,
+    ).values_list(
+        'user_id',
+        flat=True,
+    )
+
+
+def notified_users(address_id: int, member_id: int, transaction_type_id: int, self_managed: bool) -> Q:
+    """
+    The Users in the Notification list of a Transaction Type for an Address. Administrators, and Users who have not
+    expired, and who are public if the Address' Member is self managed.
+    :param address_id: The id of the Address
+    :param member_id: The id of the Address' Member
+    :param transaction_type_id: The id of the Transaction Type
+    :param self_managed: Whether the Address' Member is self managed
+    """
+    unexpired = Q(expiry_date__gte=datetime.utcnow().date())
+    if self_managed:
+        unexpired &= Q(is_private=False)
+    return Q(pk__in=notified_user_ids(address_id, member_id, transaction_type_id)) & (Q(administrator=True) | unexpired)
+
+
+def expired_notified_users(address_id: int, member_id: int, transaction_type_id: int, self_managed: bool) -> Q:
+    """
+    The Users who would be in the Notification list of a Transaction Type for an Address if they had not expired
+    :param address_id: The id of the Address
+    :param member_id: The id of the Address' Member
+    :param transaction_type_id: The id of the Transaction Type
+    :param self_managed: Whether the Address' Member is self managed
+    """
+    expired = Q(
+        pk__in=notified_user_ids(address_id, member_id, transaction_type_id),
+        administrator=False,
+        expiry_date__lt=datetime.utcnow().date(),
+    )
+    if self_managed:
+        expired &= Q(is_private=False)
+    return expired